@@ -163,13 +163,18 @@ class ControlConfigDialog(PySide.QtGui.QDialog):
         else:
             self.ui.buttonActivation.setEnabled(True)
             module_name = QModelIndex.data()
+            # metadata come from db while app is unchanged, app code is not imported
             if QModelIndex.parent().data() == APPLICATIONS:
-                desc = self.config._get_app_desc(self.config.TransitionAppType.excel_wbapp, module_name)
+                metadata = self.config.get_app_metadata(self.config.TransitionAppType.excel_wbapp, module_name)
                 status = self.config.get_app_status(self.config.TransitionAppType.excel_addin,module_name)
             else:
-                desc = self.config._get_app_desc(self.config.TransitionAppType.excel_addin, module_name)
+                metadata = self.config.get_app_metadata(self.config.TransitionAppType.excel_addin, module_name)
                 status = self.config.get_app_status(self.config.TransitionAppType.excel_addin,module_name)
 
+            desc = ""
+            if metadata is not None and metadata['description'] is not None:
+                desc = metadata['description']
+
             # toggle the button to reflect status and ensure status text is updated
             self.ui.buttonActivation.setChecked(status)
             self.set_button_activation_text(status)
@@ -0,0 +1,133 @@
+# ------------------------------------------------------------------------------
+# Name:        appmetadatatest
+# Purpose:     AppMetadata unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+from transitioncore.appmetadata import AppMetadata
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class AppMetadataTest(unittest.TestCase):
+
+    def setUp(self):
+        import shutil
+        import tests
+        self.test_dir = tests.__path__[0] + '\\test_files'
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print("It shouldn't be a problem : ", repr(e), self.test_dir)
+        sys.modules.pop('tests.test_files', None)
+        os.mkdir(self.test_dir)
+
+    def tearDown(self):
+        import shutil
+        sys.modules.pop('tests.test_files', None)
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print(repr(e))
+
+    def test_find_app_path(self):
+        open(self.test_dir + "\\__init__.py", "w").close()
+        self.assertEqual(self.test_dir, AppMetadata.find_app_path('tests', 'test_files'))
+        self.assertIsNone(AppMetadata.find_app_path('tests', 'unknown'))
+        self.assertIsNone(AppMetadata.find_app_path('com', 'config'))
+
+    def test_get_comments(self):
+        import inspect
+        import addin.config
+        with open(addin.config.__file__, encoding='utf-8-sig') as f:
+            line_list = f.readlines()
+        self.assertEqual(inspect.getcomments(addin.config), AppMetadata.get_comments(line_list))
+        self.assertIsNone(AppMetadata.get_comments(["\n", "import os\n", "# not a header\n"]))
+
+    def test_parse_description(self):
+        description = """
+        #
+        # Author: Jonathan
+        # Author: Besanceney
+        #
+        # Version: 1.0
+        # Version: 2.0
+        """
+        self.assertTupleEqual(("Jonathan\nBesanceney", "1.0"), AppMetadata.parse_description(description))
+        self.assertTupleEqual(('', ''), AppMetadata.parse_description(None))
+
+    def test_extract(self):
+        #app code must not run
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""#
+# Author:      Somebody
+# Version:     2.1
+#
+raise Exception("executed !")
+
+
+class FakeApp():
+    pass
+
+app_class = FakeApp
+com_app = ('excel', 'word')
+app_type = 'tests'
+""")
+        metadata = AppMetadata.extract('tests', 'test_files')
+        self.assertNotIn('tests.test_files', sys.modules)
+        self.assertEqual('Somebody', metadata['author'])
+        self.assertEqual('2.1', metadata['version'])
+        self.assertTupleEqual(('excel', 'word'), metadata['com_app'])
+        self.assertEqual('tests', metadata['app_type'])
+        self.assertEqual('FakeApp', metadata['app_class'])
+        self.assertTrue(metadata['description'].startswith("# Author:"))
+
+        #syntax error
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("com_app = ('excel', \n")
+        self.assertIsNone(AppMetadata.extract('tests', 'test_files', self.test_dir))
+
+        #com_app isn't a literal : only import can tell
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""
+class FakeApp():
+    pass
+
+app_class = FakeApp
+com_app = tuple(['excel'])
+""")
+        metadata = AppMetadata.extract('tests', 'test_files', self.test_dir)
+        self.assertIsNone(metadata['com_app'])
+        self.assertEqual('FakeApp', metadata['app_class'])
+        metadata = AppMetadata.extract('tests', 'test_files', self.test_dir, allow_import=True)
+        self.assertTupleEqual(('excel', ), metadata['com_app'])
+
+        #no package
+        self.assertIsNone(AppMetadata.extract('tests', 'unknown'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+# ------------------------------------------------------------------------------
+# Name:        appwatchertest
+# Purpose:     AppWatcher unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import shutil
+import threading
+from transitioncore.appwatcher import AppWatcher, InotifySource
+from transitioncore.configuration import Configuration
+from transitioncore.configsql import SQL_INSERT_APP_TYPE
+from transitioncore.storagebackend import MemoryBackend
+from transitioncore.eventsinterface.configeventinterface import ConfigEventsInterface
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+APP_SOURCE = """# Author:      Somebody
+#
+# Version:     {}
+#
+
+app_class = None
+com_app = ('excel', )
+"""
+
+
+class WatcherEvt(ConfigEventsInterface):
+    def __init__(self):
+        super(WatcherEvt, self).__init__()
+        self.event_list = ('on_app_add', 'on_app_del', 'on_app_disable', 'on_app_update')
+        self.fired_evt_list = list()
+        self.condition = threading.Condition()
+
+    def _fired(self, event, app_name):
+        with self.condition:
+            self.fired_evt_list.append((event, app_name))
+            self.condition.notify_all()
+
+    def on_app_add(self, app_type, app_name):
+        self._fired('on_app_add', app_name)
+
+    def on_app_del(self, app_type, app_name):
+        self._fired('on_app_del', app_name)
+
+    def on_app_disable(self, app_type, app_name, com_app_tuple):
+        self._fired('on_app_disable', app_name)
+
+    def on_app_update(self, app_type, app_name):
+        self._fired('on_app_update', app_name)
+
+    def wait(self, event, timeout=5.0):
+        """
+        :return: True if event was fired before timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: event in self.fired_evt_list, timeout)
+
+
+class AppWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.app_type_dir = tests.__path__[0] + '\\test_watch'
+        self.app_dir = self.app_type_dir + '\\watched'
+        shutil.rmtree(self.app_type_dir, ignore_errors=True)
+        os.mkdir(self.app_type_dir)
+
+        self.config = Configuration(backend=MemoryBackend())
+        self.config._run_write(lambda cnx: cnx.execute(SQL_INSERT_APP_TYPE, ("tests", self.app_type_dir)))
+        self.config._invalidate_model()
+        self.evt = WatcherEvt()
+        self.config.add_event_listener(self.evt)
+
+    def tearDown(self):
+        self.config.reset()
+        shutil.rmtree(self.app_type_dir, ignore_errors=True)
+
+    def write_app(self, version):
+        if not os.path.exists(self.app_dir):
+            os.mkdir(self.app_dir)
+        with open(self.app_dir + '\\__init__.py', 'w') as f:
+            f.write(APP_SOURCE.format(version))
+
+    def check_watcher(self, polling):
+        watcher = AppWatcher(self.config, ('tests', ), debounce=0.2, max_delay=2.0, poll_interval=0.05,
+                             polling=polling, initial_inventory=False)
+        watcher.start()
+        try:
+            #changes are debounced : app is added once
+            self.write_app('1.0')
+            os.mkdir(self.app_dir + '\\sub')
+            with open(self.app_dir + '\\sub\\data.txt', 'w') as f:
+                f.write('data')
+            self.assertTrue(self.evt.wait(('on_app_add', 'watched')))
+            self.assertEqual('1.0', self.config.get_app_info('tests', 'watched')['version'])
+
+            #change in a sub-directory created after watcher start
+            with open(self.app_dir + '\\sub\\data.txt', 'w') as f:
+                f.write('other data')
+            self.assertTrue(self.evt.wait(('on_app_update', 'watched')))
+
+            #__pycache__ is ignored
+            os.mkdir(self.app_dir + '\\__pycache__')
+            with open(self.app_dir + '\\__pycache__\\watched.pyc', 'wb') as f:
+                f.write(b'0')
+
+            shutil.rmtree(self.app_dir)
+            self.assertTrue(self.evt.wait(('on_app_del', 'watched')))
+            self.assertIsNone(self.config.get_app_info('tests', 'watched'))
+        finally:
+            watcher.stop()
+
+        self.assertListEqual([('on_app_add', 'watched'), ('on_app_update', 'watched'), ('on_app_del', 'watched')],
+                             self.evt.fired_evt_list)
+
+    def test_polling(self):
+        self.check_watcher(True)
+
+    def test_inotify(self):
+        if not InotifySource.available():
+            self.skipTest("inotify is not available")
+        self.check_watcher(False)
+
+    def test_initial_inventory(self):
+        #app added while watcher wasn't running
+        self.write_app('1.0')
+        watcher = AppWatcher(self.config, ('tests', ), debounce=0.2, poll_interval=0.05, polling=True)
+        watcher.start()
+        try:
+            self.assertTrue(self.evt.wait(('on_app_add', 'watched')))
+        finally:
+            watcher.stop()
+
+    def test_failed_inventory(self):
+        #initial inventory fails : watcher keeps running, changes are still refreshed
+        def update_inventory(app_type=None, fire_event=True):
+            raise OSError("inventory failed")
+        self.config.update_inventory = update_inventory
+        watcher = AppWatcher(self.config, ('tests', ), debounce=0.2, poll_interval=0.05, polling=True)
+        watcher.start()
+        try:
+            self.write_app('1.0')
+            self.assertTrue(self.evt.wait(('on_app_add', 'watched')))
+        finally:
+            watcher.stop()
+
+    def test_debounce(self):
+        watcher = AppWatcher(self.config, ('tests', ), debounce=1.0, max_delay=2.0)
+        watcher._add_changes([('tests', 'watched')], 10.0)
+        watcher._add_changes([('tests', 'watched'), ('tests', 'other')], 10.5)
+        self.assertListEqual([], watcher._get_due_list(11.0))
+        self.assertListEqual([('tests', 'other'), ('tests', 'watched')], sorted(watcher._get_due_list(11.5)))
+
+        #changes keep coming : refreshed after max_delay
+        for now in (20.0, 20.5, 21.0, 21.5):
+            watcher._add_changes([('tests', 'watched')], now)
+            self.assertListEqual([], watcher._get_due_list(now))
+        self.assertListEqual([('tests', 'watched')], watcher._get_due_list(22.0))
+
+if __name__ == '__main__':
+    unittest.main()
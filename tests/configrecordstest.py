@@ -0,0 +1,79 @@
+# ------------------------------------------------------------------------------
+# Name:        configrecordstest
+# Purpose:     Configuration records unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import pickle
+from transitioncore.configrecords import AppRecord, AppComAppStatus
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class ConfigRecordsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.values = ('addin', 'config', 'excel', '# description', 'me', '1.0', 1)
+        self.status = AppComAppStatus(*self.values)
+
+    def test_getitem(self):
+        #attributes and sqlite3.Row like access
+        self.assertEqual('config', self.status.app_name)
+        self.assertEqual('config', self.status['app_name'])
+        self.assertEqual('config', self.status[1])
+        self.assertEqual(1, self.status['enabled'])
+        self.assertRaises(IndexError, self.status.__getitem__, 'unknown')
+        self.assertListEqual(list(AppComAppStatus._fields), self.status.keys())
+        self.assertTupleEqual(self.values, tuple(self.status))
+        self.assertEqual(len(self.values), len(self.status))
+
+    def test_immutable(self):
+        self.assertRaises(AttributeError, setattr, self.status, 'enabled', 0)
+        self.assertRaises(AttributeError, delattr, self.status, 'enabled')
+        self.assertRaises(AttributeError, setattr, self.status, 'other', 0)
+        #no instance dict
+        self.assertFalse(hasattr(self.status, '__dict__'))
+        self.assertRaises(TypeError, AppComAppStatus, 'addin')
+
+    def test_to_tuple(self):
+        #values cross rpyc as plain tuple
+        self.assertTupleEqual(self.values, self.status.to_tuple())
+        self.assertEqual(self.status, AppComAppStatus.from_tuple(self.status.to_tuple()))
+        self.assertEqual(hash(self.status), hash(AppComAppStatus(*self.values)))
+        #same values, different record types
+        self.assertNotEqual(self.status, AppRecord(*(range(len(AppRecord._fields)))))
+
+    def test_pickle(self):
+        record = AppRecord(1, 'config', 'me', '1.0', '# description', 'c:\\addin\\config', 'a', 'b', 'c',
+                           'ConfigApp', 'addin', 'c:\\addin')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(record, protocol))
+            self.assertIsInstance(copy, AppRecord)
+            self.assertEqual(record, copy)
+            self.assertEqual('ConfigApp', copy.app_class)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# ------------------------------------------------------------------------------
+# Name:        configstatstest
+# Purpose:     ConfigurationStats unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import threading
+from transitioncore.configstats import ConfigurationStats, StatsConnection, STATS_API, STATS_SQL
+from transitioncore.configsql import SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE, SQL_SELECT_ALL_COM_APP
+from transitioncore.connectionmanager import ConnectionManager
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class ConfigurationStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.db_path = tests.__path__[0] + '\\test.s3db'
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.stats = ConfigurationStats()
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def test_statement_name(self):
+        self.assertEqual('SQL_SELECT_ALL_COM_APP', self.stats.statement_name(SQL_SELECT_ALL_COM_APP))
+        self.assertEqual('SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE',
+                         self.stats.statement_name(SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE.format("1 = 1")))
+        self.assertEqual('BEGIN IMMEDIATE', self.stats.statement_name("BEGIN IMMEDIATE"))
+        self.assertEqual('SELECT 1', self.stats.statement_name("\nSELECT 1\nFROM t\n"))
+
+    def test_record(self):
+        for i in range(1, 101):
+            self.stats.record(STATS_API, 'get_app_list', i / 1000, 2)
+        self.stats.record(STATS_SQL, 'SQL_SELECT_ALL_APP', 0.5, 1)
+        #rows fetch is added to last call
+        self.stats.record(STATS_SQL, 'SQL_SELECT_ALL_APP', 0.25, 3, 0)
+        self.stats.count_open()
+
+        open_count, entry_list = self.stats.get_stats()
+        self.assertEqual(1, open_count)
+        self.assertEqual(2, len(entry_list))
+        kind, name, count, total, p50, p90, p99, max_latency, rows = entry_list[0]
+        self.assertEqual((STATS_API, 'get_app_list', 100, 200), (kind, name, count, rows))
+        self.assertAlmostEqual(5.05, total)
+        self.assertAlmostEqual(0.051, p50)
+        self.assertAlmostEqual(0.091, p90)
+        self.assertAlmostEqual(0.1, p99)
+        self.assertAlmostEqual(0.1, max_latency)
+        self.assertEqual((STATS_SQL, 'SQL_SELECT_ALL_APP', 1, 0.75, 0.75, 0.75, 0.75, 0.75, 4), entry_list[1])
+
+        self.assertIn('get_app_list', ConfigurationStats.format_stats(self.stats.get_stats()))
+        self.stats.reset()
+        self.assertEqual((0, ()), self.stats.get_stats())
+
+    def test_connection(self):
+        manager = ConnectionManager(self.db_path)
+        plain_cnx = manager.get()
+        self.assertNotIsInstance(plain_cnx, StatsConnection)
+
+        #connections are opened again, instrumented. Opened ones are still usable meanwhile.
+        thread_cnx_list = list()
+        thread = threading.Thread(target=lambda: thread_cnx_list.append(manager.get()))
+        thread.start()
+        thread.join()
+        manager.set_stats(self.stats)
+        self.assertEqual(1, plain_cnx.execute("SELECT 1").fetchone()[0])
+        self.assertEqual(1, thread_cnx_list[0].execute("SELECT 1").fetchone()[0])
+        cnx = manager.get()
+        self.assertIsInstance(cnx, StatsConnection)
+        self.assertIsNot(plain_cnx, cnx)
+        manager.run_write(lambda cnx: cnx.execute("CREATE TABLE t (value INT)"))
+        manager.run_write(lambda cnx: cnx.executemany("INSERT INTO t VALUES (?)", [(i, ) for i in range(5)]))
+        self.assertEqual(5, len(cnx.execute("SELECT value FROM t").fetchall()))
+        self.assertEqual(2, len([row for row in cnx.execute("SELECT value FROM t WHERE value < 2")]))
+        cursor = cnx.cursor()
+        cursor.execute("SELECT value FROM t")
+        cursor.fetchone()
+        self.assertEqual(2, len(cursor.fetchmany(2)))
+
+        open_count, entry_list = self.stats.get_stats()
+        self.assertEqual(1, open_count)
+        entry_dict = {name: (count, rows) for kind, name, count, total, p50, p90, p99, max_latency, rows
+                      in entry_list}
+        self.assertEqual((1, 5), entry_dict['INSERT INTO t VALUES (?)'])
+        self.assertEqual((2, 8), entry_dict['SELECT value FROM t'])
+        self.assertEqual((1, 2), entry_dict['SELECT value FROM t WHERE value < 2'])
+        self.assertEqual((2, 0), entry_dict['BEGIN IMMEDIATE'])
+
+        #not instrumented anymore
+        manager.set_stats(None)
+        self.assertNotIsInstance(manager.get(), StatsConnection)
+        manager.close_all()
+
+if __name__ == '__main__':
+    unittest.main()
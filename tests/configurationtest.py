@@ -28,17 +28,35 @@ import unittest
 import sys
 import os
 from transitioncore.configuration import Configuration
+from transitioncore.storagebackend import SQLiteBackend, MemoryBackend, SnapshotBackend
 from transitioncore.eventsinterface.configeventinterface import ConfigEventsInterface
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 
+def toggle_app(com_app, count):
+    """
+    Process pool worker : enables and disables config app for com_app, reads status meanwhile
+    """
+    config = Configuration()
+    try:
+        for i in range(count):
+            config.enable_apps([('addin', 'config', com_app)])
+            assert 'config' in config.get_enabled_app_list('addin', com_app)
+            config.get_app_list(app_type='addin')
+            config.disable_app('addin', 'config', com_app)
+    finally:
+        config.close()
+
+
 class ConfigEvt(ConfigEventsInterface):
     def __init__(self):
         super(ConfigEvt, self).__init__()
         self.last_fired_evt = ''
         self.last_fired_evt_args = dict()
-        self.event_list = ('on_app_add', 'on_app_del', 'on_app_disable', 'on_app_enable', 'on_app_update')
+        self.event_list = ('on_app_add', 'on_app_del', 'on_app_disable', 'on_app_enable', 'on_app_update',
+                           'on_apps_disable', 'on_apps_enable')
+        self.fired_evt_count = 0
 
     def on_app_add(self, app_type, app_name):
         self.last_fired_evt = 'on_app_add'
@@ -60,6 +78,18 @@ class ConfigEvt(ConfigEventsInterface):
         self.last_fired_evt_args = {'app_type': app_type, 'app_name': app_name, 'com_app_tuple': com_app_tuple}
         print('fired event', self.last_fired_evt, self.last_fired_evt_args)
 
+    def on_apps_disable(self, app_status_tuple):
+        self.last_fired_evt = 'on_apps_disable'
+        self.last_fired_evt_args = {'app_status_tuple': app_status_tuple}
+        self.fired_evt_count += 1
+        print('fired event', self.last_fired_evt, self.last_fired_evt_args)
+
+    def on_apps_enable(self, app_status_tuple):
+        self.last_fired_evt = 'on_apps_enable'
+        self.last_fired_evt_args = {'app_status_tuple': app_status_tuple}
+        self.fired_evt_count += 1
+        print('fired event', self.last_fired_evt, self.last_fired_evt_args)
+
     def on_app_update(self, app_type, app_name):
         self.last_fired_evt = 'on_app_update'
         self.last_fired_evt_args = {'app_type': app_type, 'app_name': app_name}
@@ -67,13 +97,22 @@ class ConfigEvt(ConfigEventsInterface):
 
 
 class ConfigurationTest(unittest.TestCase):
+    """
+    Runs on in-memory backend. ConfigurationSQLiteTest runs same tests on db file.
+    """
+
+    @staticmethod
+    def make_backend():
+        return MemoryBackend()
 
     def setUp(self):
         import shutil
         import tests
         self.test_dir = tests.__path__[0] + '\\test_files'
-        self.config = Configuration()
+        self.config = Configuration(backend=self.make_backend())
         self.config.reset()
+        #fake app of a previous test may have been imported
+        sys.modules.pop('tests.test_files', None)
         self.evt = ConfigEvt()
         self.config.add_event_listener(self.evt)
         try:
@@ -83,6 +122,7 @@ class ConfigurationTest(unittest.TestCase):
 
     def tearDown(self):
         import shutil
+        self.config.close()
         self.config = None
         try:
             shutil.rmtree(self.test_dir)
@@ -317,7 +357,8 @@ print("Hello World")
             print("table =>", row["tbl_name"])
             expected_table_list.append(row["tbl_name"])
 
-        for table in expected_table_list:
+        #referencing tables first
+        for table in reversed(expected_table_list):
             sqlite_cnx.cursor().execute("DROP TABLE {}".format(table))
         sqlite_cnx.commit()
 
@@ -374,8 +415,8 @@ print("Hello World")
         app_id = self.config._get_app_id('addin', 'config')
         cnx = self.config._sqlite
         cursor = cnx.cursor()
-        cursor.execute("SELECT rowid FROM app WHERE name = ?", ('config', ))
-        expected_app_id = cursor.fetchone()['rowid']
+        cursor.execute("SELECT id FROM app WHERE name = ?", ('config', ))
+        expected_app_id = cursor.fetchone()['id']
         self.assertEqual(expected_app_id, app_id)
         cursor.close()
         self.config._close_sqlite()
@@ -449,29 +490,169 @@ print("Hello World")
         for key in digests.keys():
             self.assertEqual(expected_digests[key], digests[key])
 
+        #legacy format must give digests of the zip archive formerly written in %TMP%
+        import zipfile
+        import hashlib
+        import whirlpool
+        from transitioncore.digestengine import DIGEST_FORMAT_LEGACY
+        source_path = self.test_dir + '\\..\\transition_app_source.zip'
+        zipf_source = zipfile.ZipFile(source_path, 'w')
+        for root, dirs, files in os.walk(config_path):
+            if "__pycache__" not in root:
+                for file in files:
+                    if file not in ("Manifest",):
+                        zipf_source.write(os.path.join(root, file))
+        zipf_source.close()
+        with open(source_path, 'rb') as f:
+            source_content = f.read()
+        os.remove(source_path)
+
+        expected_digests = {'SHA256': hashlib.sha3_256(source_content).hexdigest(),
+                            'SHA512': hashlib.sha3_512(source_content).hexdigest(),
+                            'WHIRLPOOL': whirlpool.new(source_content).hexdigest()}
+        digests = self.config._generate_app_digests(config_path, DIGEST_FORMAT_LEGACY)
+        self.assertDictEqual(expected_digests, digests)
+
+    def test__file_digest_cache(self):
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + '\\__init__.py', 'w') as f:
+            f.write("print('Hello world!')")
+        with open(self.test_dir + '\\other.py', 'w') as f:
+            f.write("print('Hello other world!')")
+
+        cache = self.config._file_digest_cache
+        #db creation runs an inventory which uses cache too
+        self.config._sqlite
+        self.config._close_sqlite()
+        cache.miss_count = 0
+        cache.hit_count = 0
+
+        #first pass hashes all files, digests are the same as without cache
+        expected_digests = self.config._generate_app_digests(self.test_dir)
+        digests = self.config._generate_app_digests(self.test_dir, file_cache=cache)
+        self.assertDictEqual(expected_digests, digests)
+        self.assertEqual(2, cache.miss_count)
+        self.assertEqual(0, cache.hit_count)
+
+        #nothing changed, nothing is hashed
+        digests = self.config._generate_app_digests(self.test_dir, file_cache=cache)
+        self.assertDictEqual(expected_digests, digests)
+        self.assertEqual(2, cache.miss_count)
+        self.assertEqual(2, cache.hit_count)
+
+        #only changed file is hashed
+        with open(self.test_dir + '\\other.py', 'w') as f:
+            f.write("print('Hello another world!')")
+        expected_digests = self.config._generate_app_digests(self.test_dir)
+        digests = self.config._generate_app_digests(self.test_dir, file_cache=cache)
+        self.assertDictEqual(expected_digests, digests)
+        self.assertEqual(3, cache.miss_count)
+        self.assertEqual(3, cache.hit_count)
+
+        #removed files are forgotten
+        os.remove(self.test_dir + '\\other.py')
+        expected_digests = self.config._generate_app_digests(self.test_dir)
+        digests = self.config._generate_app_digests(self.test_dir, file_cache=cache)
+        self.assertDictEqual(expected_digests, digests)
+        cursor = self.config._sqlite.cursor()
+        cursor.execute("SELECT count(*) FROM file_digest WHERE path = ?", (self.test_dir + '\\other.py', ))
+        self.assertEqual(0, cursor.fetchone()[0])
+        cursor.close()
+        self.config._close_sqlite()
+
     def test__get_sqlite(self):
         import sqlite3
         import os
         sqlite_cnx = self.config._sqlite
         #database must exist now
-        self.assertTrue(os.path.exists(os.getenv("USERPROFILE") + "\\.transition.s3db"))
+        self.assertTrue(self.config._connection_manager.exists())
         #no events
         self.assertEqual('', self.evt.last_fired_evt)
         self.assertDictEqual({}, self.evt.last_fired_evt_args)
         #be connected :p
-        self.assertEqual(self.config._sqlite_cnx_usage_count, 1)
         self.assertIsInstance(sqlite_cnx, sqlite3.Connection)
-        #close cnx
+        #connection is long-lived
         self.config._close_sqlite()
+        self.assertIs(sqlite_cnx, self.config._sqlite_cnx)
+        self.assertIs(sqlite_cnx, self.config._sqlite)
+        self.config.get_com_app_list()
+        self.assertEqual(1, self.config._connection_manager.open_count)
+
+        #each thread has its own connection
+        import threading
+        thread_cnx_list = list()
+        thread = threading.Thread(target=lambda: thread_cnx_list.append(
+            (self.config._sqlite, self.config.get_com_app_list())))
+        thread.start()
+        thread.join()
+        self.assertIsNot(sqlite_cnx, thread_cnx_list[0][0])
+        self.assertListEqual(self.config.get_com_app_list(), thread_cnx_list[0][1])
+        self.assertEqual(2, self.config._connection_manager.open_count)
+
+        #close cnx
+        self.config.close()
         self.assertIsNone(self.config._sqlite_cnx)
-        self.assertEqual(self.config._sqlite_cnx_usage_count, 0)
+        self.assertEqual(0, self.config._connection_manager.get_connection_count())
+        self.assertIsNot(sqlite_cnx, self.config._sqlite)
+
+    def test__get_model(self):
+        model = self.config._model
+        #kept while nothing is written
+        self.assertIs(model, self.config._model)
+        self.assertListEqual(self.config.get_com_app_list(), model.com_app_list)
+        self.assertIn('config', model.get_available_app_list('addin'))
+        self.assertEqual(self.config.get_app_info('addin', 'config')['rowid'], model.get_app_id('addin', 'config'))
+
+        #write methods outdate it
+        self.config.enable_app('addin', 'config', 'excel')
+        self.assertIsNot(model, self.config._model)
+        model = self.config._model
+        self.assertListEqual(['config'], model.get_status_app_list('addin', 'excel', True))
+
+        #another connection commits
+        other_cnx = self.config._connection_manager.connect()
+        other_cnx.execute("UPDATE app_works_with_com_app SET enabled = 0")
+        other_cnx.commit()
+        other_cnx.close()
+        self.assertIsNot(model, self.config._model)
+        self.assertListEqual([], self.config.get_enabled_app_list('addin', 'excel'))
+
+        #each thread has its own model
+        import threading
+        thread_model_list = list()
+        thread = threading.Thread(target=lambda: thread_model_list.append(self.config._model))
+        thread.start()
+        thread.join()
+        self.assertIsNot(self.config._model, thread_model_list[0])
+
+    def test_get_app_status_matrix(self):
+        import addin.config
+        self.config.enable_app('addin', 'config', 'excel')
+        self.config.enable_app('addin', 'config', 'word')
+
+        com_app_tuple, app_status_tuple = self.config.get_app_status_matrix()
+        self.assertTupleEqual(tuple(self.config.get_com_app_list()), com_app_tuple)
+        status_dict = dict(((app_type, app_name), (available, enabled))
+                           for app_type, app_name, available, enabled in app_status_tuple)
+        available, enabled = status_dict[('addin', 'config')]
+        self.assertEqual(set(addin.config.com_app),
+                         set(com_app for i, com_app in enumerate(com_app_tuple) if available >> i & 1))
+        self.assertEqual(1 << com_app_tuple.index('excel') | 1 << com_app_tuple.index('word'), enabled)
+
+        #rebuilt on write
+        self.config.disable_app('addin', 'config', 'word')
+        self.assertListEqual(['excel'], self.config.get_app_com_app_list('addin', 'config', True))
+        self.assertNotIn('excel', self.config.get_app_com_app_list('addin', 'config', False))
+        self.assertIn('word', self.config.get_app_com_app_list('addin', 'config', False))
+        self.assertListEqual(list(addin.config.com_app), self.config.get_app_com_app_list('addin', 'config'))
+        self.assertListEqual([], self.config.get_app_com_app_list('addin', 'onfig'))
 
     def test__get_app_type_id(self):
         import tests
         #prepare test
         app_type = "tests"
         cursor = self.config._sqlite.cursor()
-        cursor.execute("INSERT INTO app_type VALUES (?, ?)", (app_type, tests.__path__[0]))
+        cursor.execute("INSERT INTO app_type (name, path) VALUES (?, ?)", (app_type, tests.__path__[0]))
         self.config._sqlite_cnx.commit()
         expected_app_type_id = cursor.lastrowid
 
@@ -487,7 +668,7 @@ print("Hello World")
         #prepare test
         app_type = "unknown com app"
         cursor = self.config._sqlite.cursor()
-        cursor.execute("INSERT INTO com_app VALUES (?)", (app_type, ))
+        cursor.execute("INSERT INTO com_app (short_name) VALUES (?)", (app_type, ))
         self.config._sqlite_cnx.commit()
         expected_app_type_id = cursor.lastrowid
 
@@ -524,20 +705,33 @@ print("Hello World")
         self.assertEqual(128, len(digests["SHA512"]))
         self.assertEqual(128, len(digests["WHIRLPOOL"]))
 
-        #check for invalid Manifest, invalid length in WHIRLPOOL hash, raise ConfigurationException
-        with open(module.__path__[0] + '\\Manifest', 'rb') as f:
-            digests = pickle.load(f)
-            digests["WHIRLPOOL"] = digests["WHIRLPOOL"][:127]
+        #check for invalid Manifest, Merkle root mismatch, raise ConfigurationException
+        with open(module.__path__[0] + '\\Manifest', 'r') as f:
+            lines = f.readlines()
+        fields = lines[1].split(' ', 5)
+        fields[2] = '0' * 64
+        lines[1] = ' '.join(fields)
+        with open(module.__path__[0] + '\\Manifest', 'w') as f:
+            f.writelines(lines)
+
+        self.assertRaises(ConfigurationException, self.config._read_app_manifest, module.__path__[0] + '\\')
+
+        #check for valid pickled Manifest
+        digests = self.config._generate_app_digests(module.__path__[0] + '\\')
+        digests["FORMAT"] = 2
         with open(module.__path__[0] + '\\Manifest', 'wb') as f:
             pickle.dump(digests, f)
+        self.assertDictEqual(digests, self.config._read_app_manifest(module.__path__[0] + '\\'))
 
-        self.assertRaises(ConfigurationException, self.config._read_app_manifest, module.__path__[0] + '\\')
+        #check for invalid pickled Manifest, invalid length in WHIRLPOOL hash, raise ConfigurationException
+        digests["WHIRLPOOL"] = digests["WHIRLPOOL"][:127]
+        with open(module.__path__[0] + '\\Manifest', 'wb') as f:
+            pickle.dump(digests, f)
 
-        #check for invalid Manifest, invalid key, raise ConfigurationException
-        self.config.write_app_manifest(module.__path__[0] + '\\')
-        with open(module.__path__[0] + '\\Manifest', 'rb') as f:
-            digests = pickle.load(f)
+        self.assertRaises(ConfigurationException, self.config._read_app_manifest, module.__path__[0] + '\\')
 
+        #check for invalid pickled Manifest, invalid key, raise ConfigurationException
+        digests = self.config._generate_app_digests(module.__path__[0] + '\\')
         digests["WHIRLPOO"] = digests["WHIRLPOOL"]
         del digests["WHIRLPOOL"]
 
@@ -657,16 +851,35 @@ print("Hello World")
         self.assertTrue(status)
         self.assertDictEqual(expected_digests, digests)
 
-        #Valid dir with __init__.py, Manifest mismatch
+        #Valid dir with __init__.py, file changed since Manifest was written
+        with open(self.test_dir + '\\__init__.py', 'a') as f:
+            f.write("\n")
+        status, digests = self.config._verify_manifest_digests(self.test_dir)
+        self.assertFalse(status)
+        self.assertDictEqual(self.config._generate_app_digests(self.test_dir), digests)
+        self.assertListEqual([('__init__.py', 'changed')], self.config.verify_app_manifest(self.test_dir))
+
+        #Valid dir with __init__.py, pickled Manifest mismatch
         import pickle
-        with open(self.test_dir + '\\Manifest', 'rb') as f:
-            digests = pickle.load(f)
-            digests["WHIRLPOOL"] = digests["WHIRLPOOL"][:127]
+        expected_digests = self.config.write_app_manifest(self.test_dir)
+        digests = dict(expected_digests, FORMAT=2)
+        digests["WHIRLPOOL"] = digests["SHA512"]
         with open(self.test_dir + '\\Manifest', 'wb') as f:
             pickle.dump(digests, f)
 
         status, digests = self.config._verify_manifest_digests(self.test_dir)
         self.assertFalse(status)
+        self.assertDictEqual(expected_digests, digests)
+
+        #Valid dir with __init__.py, legacy Manifest (without FORMAT key) OK
+        from transitioncore.digestengine import DIGEST_FORMAT_LEGACY
+        expected_digests = self.config._generate_app_digests(self.test_dir, DIGEST_FORMAT_LEGACY)
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            pickle.dump(expected_digests, f)
+
+        status, digests = self.config._verify_manifest_digests(self.test_dir)
+        self.assertTrue(status)
+        self.assertDictEqual(expected_digests, digests)
 
     def test_disable_app(self):
         #prepare test
@@ -730,6 +943,40 @@ print("Hello World")
         self.assertRaises(ConfigurationException, self.config.disable_app, 'addin', 'onfig')
         self.assertRaises(ConfigurationException, self.config.disable_app, 'contraption', 'config')
 
+    def test_enable_apps(self):
+        import addin.config
+        from transitioncore.exceptions.configurationexception import ConfigurationException
+        self.evt.fired_evt_count = 0
+
+        #one app for all com_app, another change for the same app is merged
+        change_list = [('addin', 'config', None), ('addin', 'config', 'excel')]
+        app_status_tuple = self.config.enable_apps(change_list)
+        self.assertTupleEqual((('addin', 'config', tuple(addin.config.com_app)), ), app_status_tuple)
+        #one batched event
+        self.assertEqual(1, self.evt.fired_evt_count)
+        self.assertEqual('on_apps_enable', self.evt.last_fired_evt)
+        self.assertTupleEqual(app_status_tuple, self.evt.last_fired_evt_args['app_status_tuple'])
+        for item in self.config.get_app_list(app_type='addin', app_name='config'):
+            self.assertTrue(item['enabled'])
+
+        #nothing to change, no event
+        self.assertTupleEqual((), self.config.enable_apps(iter(change_list)))
+        self.assertEqual(1, self.evt.fired_evt_count)
+
+        #change set is checked before any change
+        self.assertRaises(ConfigurationException, self.config.disable_apps,
+                          [('addin', 'config', 'excel'), ('addin', 'onfig', None)])
+        self.assertRaises(ConfigurationException, self.config.disable_apps, [('contraption', 'config', None)])
+        self.assertIsNone(self.config.get_app_list(app_name='config', enabled=False))
+
+        #disable some com_app
+        app_status_tuple = self.config.disable_apps([('addin', 'config', 'excel'), ('addin', 'config', 'word')])
+        self.assertTupleEqual((('addin', 'config', ('excel', 'word')), ), app_status_tuple)
+        self.assertEqual('on_apps_disable', self.evt.last_fired_evt)
+        self.assertEqual(2, self.evt.fired_evt_count)
+        self.assertListEqual(['config'], self.config.get_disabled_app_list('addin', 'excel'))
+        self.assertListEqual(['config'], self.config.get_enabled_app_list('addin', 'outlook'))
+
     def test_enable_app(self):
         #evt cleanup
         self.evt.last_fired_evt = ''
@@ -807,9 +1054,30 @@ print("Hello World")
 
         #with known path
         import addin.config
-        import sqlite3
+        from transitioncore.configrecords import AppRecord
         app_infos = self.config.get_app_info_by_path(addin.config.__path__[0])
-        self.assertIsInstance(app_infos, sqlite3.Row)
+        self.assertIsInstance(app_infos, AppRecord)
+        self.assertEqual('config', app_infos.name)
+        self.assertEqual(app_infos.app_type, app_infos['app_type'])
+
+    def test__get_app_list_query(self):
+        from transitioncore.configsql import SQL_SELECT_APP_WORKS_WITH_COM_APP
+        #no filter
+        sql, params = self.config._get_app_list_query()
+        self.assertEqual(SQL_SELECT_APP_WORKS_WITH_COM_APP, sql)
+        self.assertTupleEqual((), params)
+
+        #None filters are left out, values are bound
+        sql, params = self.config._get_app_list_query(app_type='addin', app_name=None, com_app='excel',
+                                                      enabled=False)
+        self.assertTupleEqual(('addin', 'excel', False), params)
+        self.assertIn("app_type.name = ?", sql)
+        self.assertNotIn("app.name = ?", sql)
+        self.assertEqual(3, sql.count('?'))
+
+        #filters use indexes
+        plan = ' '.join(row[-1] for row in self.config._sqlite.execute("EXPLAIN QUERY PLAN " + sql, params))
+        self.assertNotIn("SCAN app_works_with_com_app", plan)
 
     def test_get_app_list(self):
         #make fake app, registered with excel only
@@ -903,6 +1171,63 @@ app_type = 'tests'
             self.assertTrue(item['com_app'] in addin.config.com_app)
             self.assertEqual("config", item['app_name'])
 
+    def test_get_app_metadata(self):
+        from transitioncore.configsql import SQL_INSERT_APP_TYPE
+        from transitioncore.appmetadata import AppMetadata
+        import tests
+
+        #unknown app
+        self.assertIsNone(self.config.get_app_metadata("tests", "test_files"))
+
+        #make a fake app
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""# Author:      Somebody
+# Version:     1.0
+#
+class FakeApp():
+    pass
+
+app_class = FakeApp
+com_app = ('excel', 'word')
+app_type = 'tests'
+""")
+        sqlitecnx = self.config._sqlite
+        cursor = sqlitecnx.cursor()
+        cursor.execute(SQL_INSERT_APP_TYPE, ("tests", tests.__path__[0]))
+        sqlitecnx.commit()
+        self.config._app_add("tests", "test_files")
+
+        #unchanged app : metadata come from db, source isn't read
+        extract = AppMetadata.extract
+        try:
+            AppMetadata.extract = None
+            metadata = self.config.get_app_metadata("tests", "test_files")
+        finally:
+            AppMetadata.extract = extract
+
+        self.assertEqual('Somebody', metadata['author'])
+        self.assertEqual('1.0', metadata['version'])
+        self.assertTupleEqual(('excel', 'word'), metadata['com_app'])
+        self.assertEqual('FakeApp', metadata['app_class'])
+        self.assertEqual(self.config._get_app_desc("tests", "test_files"), metadata['description'])
+
+        #changed app : metadata come from source
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""# Author:      Somebody
+# Version:     1.1
+#
+class FakeApp():
+    pass
+
+app_class = FakeApp
+com_app = ('excel', )
+app_type = 'tests'
+""")
+        metadata = self.config.get_app_metadata("tests", "test_files")
+        self.assertEqual('1.1', metadata['version'])
+        self.assertTupleEqual(('excel', ), metadata['com_app'])
+
     def test_get_app_mode(self):
         self.assertIsNone(self.config.get_app_mode("tests", "test_files"))
 
@@ -1010,6 +1335,17 @@ app_type = 'tests'
         #must return 1 (updated)
         self.assertEqual(1, self.config.get_app_state("tests", "test_files"))
 
+        #within a session, app is hashed once for Manifest, db and update
+        from transitioncore.verificationsession import VerificationSession
+        with VerificationSession(self.config._file_digest_cache) as session:
+            self.assertEqual(1, self.config.get_app_state("tests", "test_files", session))
+            self.assertEqual(1, session.hit_count)
+            self.config._app_update("tests", "test_files", session=session)
+            self.assertEqual(2, session.hit_count)
+            self.assertListEqual([self.test_dir], [path for path, _ in session.get_timings()])
+
+        self.assertEqual(0, self.config.get_app_state("tests", "test_files"))
+
         #update app
         self.config._app_update("tests", "test_files", self.config._generate_app_digests(self.test_dir))
         self.assertEqual(0, self.config.get_app_state("tests", "test_files"))
@@ -1080,6 +1416,16 @@ app_type = 'tests'
         self.assertTrue("test_files" not in app_list)
         self.assertTrue("config" in app_list)
 
+        #any iterable of com_app, apps are listed once
+        app_list = self.config.get_available_app_list("tests", (name for name in self.config.get_com_app_list()))
+        self.assertListEqual(["test_files"], app_list)
+        self.assertListEqual(["test_files"], self.config.get_available_app_list("tests", {'excel', 'word', 'x'}))
+        self.assertListEqual([], self.config.get_available_app_list("tests", ['word']))
+        self.assertListEqual([], self.config.get_available_app_list("tests", []))
+        #values are bound, not quoted into sql
+        self.assertListEqual([], self.config.get_available_app_list("tests", ("excel') OR ('1' = '1", )))
+        self.assertRaises(ConfigurationException, self.config.get_available_app_list, "tests", 7)
+
     def test_get_com_app_list(self):
         expectedList = list()
         for com_app in self.config.com_app_list:
@@ -1119,8 +1465,17 @@ app_type = 'tests'
     def test_reset(self):
         #reset is already called in setUp
         #config db must not exist
-        import os
-        self.assertFalse(os.path.exists(os.getenv("USERPROFILE") + "\\.transition.s3db"))
+        self.assertFalse(self.config._connection_manager.exists())
+        #created again on next access
+        self.assertIn('config', self.config.get_available_app_list('addin'))
+        self.assertTrue(self.config._connection_manager.exists())
+        self.config.reset()
+        self.assertFalse(self.config._connection_manager.exists())
+
+        #empty db file, created by another process which didn't create tables yet
+        open(self.config._connection_manager.db_path, 'w').close()
+        self.assertIn('config', self.config.get_available_app_list('addin'))
+        self.config.reset()
 
     def test_update_inventory(self):
         import shutil
@@ -1209,6 +1564,369 @@ app_type = 'tests'
         self.assertEqual('tests', self.evt.last_fired_evt_args['app_type'])
         self.assertEqual('test_files', self.evt.last_fired_evt_args['app_name'])
 
+    def test_update_inventory_incremental(self):
+        from transitioncore.configsql import SQL_SELECT_APP_DIR_FINGERPRINT
+        from transitioncore import digestengine
+        #app files may have just been copied
+        racy_delay = digestengine.FINGERPRINT_RACY_DELAY
+        digestengine.FINGERPRINT_RACY_DELAY = 0
+        self.addCleanup(setattr, digestengine, 'FINGERPRINT_RACY_DELAY', racy_delay)
+
+        self.config.update_inventory(fire_event=False)
+        fingerprint_dict = {row['name']: row['dir_fingerprint']
+                            for row in self.config._sqlite.execute(SQL_SELECT_APP_DIR_FINGERPRINT, ('addin', ))}
+        self.assertIsNotNone(fingerprint_dict['config'])
+
+        #stored digests are wrong, but app files didn't change : app is skipped
+        self.config._sqlite.execute("UPDATE app SET SHA256 = 'changed' WHERE name = 'config'")
+        self.config._sqlite.commit()
+        self.evt.last_fired_evt = ''
+        self.config.update_inventory('addin')
+        self.assertEqual('', self.evt.last_fired_evt)
+        self.assertEqual('changed', self.config.get_app_info('addin', 'config')['SHA256'])
+        plan = self.config._get_inventory_plan('addin')
+        self.assertListEqual([], plan['change_list'])
+        plan = self.config._get_inventory_plan('addin', full=True)
+        self.assertListEqual(['config'], [app_name for app_name, _, _ in plan['change_list']])
+
+        #full inventory verifies all apps
+        self.config.update_inventory('addin', full=True)
+        self.assertEqual('on_app_update', self.evt.last_fired_evt)
+        self.assertEqual('config', self.evt.last_fired_evt_args['app_name'])
+        self.assertNotEqual('changed', self.config.get_app_info('addin', 'config')['SHA256'])
+
+        #an app whose fingerprint changed is verified
+        self.config._sqlite.execute("UPDATE app SET SHA256 = 'changed', dir_fingerprint = 'old' "
+                                    "WHERE name = 'config'")
+        self.config._sqlite.commit()
+        self.evt.last_fired_evt = ''
+        self.config.update_inventory('addin')
+        self.assertEqual('on_app_update', self.evt.last_fired_evt)
+        stored = self.config._sqlite.execute(SQL_SELECT_APP_DIR_FINGERPRINT, ('addin', )).fetchall()
+        self.assertEqual(fingerprint_dict['config'], {row['name']: row['dir_fingerprint'] for row in stored}['config'])
+
+        #an app which can't be updated is not marked as verified : it is verified again on next pass
+        from transitioncore.configsql import SQL_INSERT_APP_TYPE
+        import tests
+        self.config._sqlite.execute(SQL_INSERT_APP_TYPE, ("tests", tests.__path__[0]))
+        self.config._sqlite.commit()
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("app_class = None\ncom_app = ('excel', )\n")
+        self.config.update_inventory('tests')
+        fingerprint = self.config._sqlite.execute(SQL_SELECT_APP_DIR_FINGERPRINT, ('tests', )).fetchone()[
+            'dir_fingerprint']
+        self.assertIsNotNone(fingerprint)
+        #com_app can't be read anymore
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("app_class = None\n")
+        self.evt.last_fired_evt = ''
+        self.config.update_inventory('tests')
+        self.assertEqual('', self.evt.last_fired_evt)
+        self.assertEqual(fingerprint, self.config._sqlite.execute(SQL_SELECT_APP_DIR_FINGERPRINT,
+                                                                  ('tests', )).fetchone()['dir_fingerprint'])
+        self.assertListEqual(['test_files'], [app_name for app_name, _, _ in
+                                              self.config._get_inventory_plan('tests')['change_list']])
+
+    def test_inventory_plan(self):
+        #inventory plan is a diff between known apps and app type directory
+        from transitioncore.configsql import SQL_INSERT_APP_TYPE
+        import shutil
+        import tests
+        self.config.update_inventory(fire_event=False)
+        self.config._sqlite.execute(SQL_INSERT_APP_TYPE, ("tests", tests.__path__[0]))
+        self.config._sqlite.commit()
+        plan = self.config._get_inventory_plan('tests')
+        self.assertListEqual([], plan['change_list'])
+        self.assertListEqual([], plan['del_list'])
+
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""
+class FakeApp():
+    pass
+
+app_class = FakeApp
+com_app = ('excel', )
+""")
+        plan = self.config._get_inventory_plan('tests')
+        self.assertListEqual([('test_files', -1)], [(app_name, app_id) for app_name, app_id, _ in plan['change_list']])
+        self.config.update_inventory('tests')
+        self.assertEqual('on_app_add', self.evt.last_fired_evt)
+        app_id = self.config._get_app_id('tests', 'test_files')
+        self.assertLess(0, app_id)
+
+        #all changes of a plan are applied in one transaction
+        shutil.rmtree(self.test_dir)
+        plan = self.config._get_inventory_plan('tests')
+        self.assertListEqual([('test_files', app_id)], plan['del_list'])
+        write_list = list()
+        run_write = self.config._run_write
+        self.config._run_write = lambda write: write_list.append(write) or run_write(write)
+        self.addCleanup(delattr, self.config, '_run_write')
+        self.config._apply_inventory_plan(plan, True, None)
+        self.assertEqual(1, len(write_list))
+        self.assertEqual('on_app_del', self.evt.last_fired_evt)
+        self.assertEqual(-1, self.config._get_app_id('tests', 'test_files'))
+
+        #nothing to apply, no transaction
+        self.config._apply_inventory_plan(self.config._get_inventory_plan('tests'), True, None)
+        self.assertEqual(1, len(write_list))
+
+    def test_verify_app(self):
+        from transitioncore.startupsnapshot import StartupSnapshot
+        from transitioncore.verificationscheduler import VerificationScheduler
+        from transitioncore.exceptions.configurationexception import ConfigurationException
+        from transitioncore import digestengine
+        import shutil
+        import time
+        #app files may have just been copied
+        racy_delay = digestengine.FINGERPRINT_RACY_DELAY
+        digestengine.FINGERPRINT_RACY_DELAY = 0
+        self.addCleanup(setattr, digestengine, 'FINGERPRINT_RACY_DELAY', racy_delay)
+        #verification time is stored, and carried by startup snapshot
+        start = time.time()
+        self.config.update_inventory('addin', full=True)
+        self.config.enable_app('addin', 'config', 'excel')
+        select_verified_at = "SELECT verified_at FROM app WHERE name = 'config'"
+        verified_at = self.config._sqlite.execute(select_verified_at).fetchone()[0]
+        self.assertLessEqual(start, verified_at)
+        self.assertEqual(verified_at, StartupSnapshot(self.config.get_startup_snapshot()).get_app_verification(
+            'addin', 'config')[2])
+
+        #verified whatever its fingerprint
+        self.assertTrue(self.config.verify_app('addin', 'config', 'excel'))
+        self.assertFalse(self.config.verify_app('addin', 'config', 'word'))
+        self.assertLessEqual(verified_at, self.config._sqlite.execute(select_verified_at).fetchone()[0])
+
+        #corrupted app is disabled and can't be launched
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("app_class = None\n")
+        self.config.write_app_manifest(self.test_dir)
+        manifest_path = self.config.get_app_info('addin', 'config')['path'] + "\\Manifest"
+        shutil.move(self.test_dir + "\\Manifest", manifest_path)
+        self.addCleanup(os.remove, manifest_path)
+        self.assertFalse(self.config.verify_app('addin', 'config', 'excel'))
+        self.assertEqual('on_app_disable', self.evt.last_fired_evt)
+        self.assertRaises(ConfigurationException, self.config.verify_app, 'unknown', 'config', 'excel')
+
+        #corrupted app enabled again isn't trusted : it is verified before launch
+        self.config.enable_app('addin', 'config', 'excel')
+        self.assertIsNone(self.config._sqlite.execute(select_verified_at).fetchone()[0])
+        scheduler = VerificationScheduler(lambda app_type, app_name: True, lambda app_type, app_name: None)
+        self.addCleanup(scheduler.stop)
+        scheduler.add_app('addin', 'config', *StartupSnapshot(self.config.get_startup_snapshot()).get_app_verification(
+            'addin', 'config'))
+        self.assertFalse(scheduler.is_trusted('addin', 'config'))
+
+    def test_write_verify_app_manifests(self):
+        from transitioncore.configsql import SQL_INSERT_APP_TYPE
+        from transitioncore.exceptions.configurationexception import ConfigurationException
+        import tests
+        self.config._sqlite.execute(SQL_INSERT_APP_TYPE, ("tests", tests.__path__[0]))
+        self.config._sqlite.commit()
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("app_class = None\n")
+        os.mkdir(self.test_dir + "\\sub")
+        with open(self.test_dir + "\\sub\\data.txt", "w") as f:
+            f.write("data\n")
+        app_list = [('tests', 'test_files'), ('tests', 'missing')]
+
+        #without Manifest, apps are not verified
+        result_list = list(self.config.verify_app_manifests(app_list, processes=2))
+        self.assertListEqual(['missing', 'test_files'], sorted(result['app_name'] for result in result_list))
+        self.assertTrue(all(result['failure_list'] is None for result in result_list))
+
+        #Manifest files are written in worker processes, missing app is reported
+        result_dict = {result['app_name']: result for result in self.config.write_app_manifests(app_list, 2)}
+        self.assertIsNone(result_dict['test_files']['error'])
+        self.assertEqual(2, result_dict['test_files']['file_count'])
+        self.assertEqual(result_dict['test_files']['digests']['SHA256'],
+                         self.config._read_app_manifest(self.test_dir)['SHA256'])
+        self.assertIsNotNone(result_dict['missing']['error'])
+        self.assertEqual(1, Configuration.print_manifest_results(iter(result_dict.values())))
+
+        #changed files are reported
+        with open(self.test_dir + "\\sub\\data.txt", "w") as f:
+            f.write("changed\n")
+        result_list = list(self.config.verify_app_manifests(app_list[:1]))
+        self.assertListEqual([('sub/data.txt', 'changed')], result_list[0]['failure_list'])
+        self.assertEqual(1, Configuration.print_manifest_results(iter(result_list)))
+        self.config.write_app_manifest(self.test_dir)
+        self.assertEqual(0, Configuration.print_manifest_results(self.config.verify_app_manifests(app_list[:1])))
+
+        #all app packages of app types
+        self.assertIn(('addin', 'config'), [(app_type, app_name)
+                                            for app_type, app_name, _ in self.config._get_app_package_list()])
+        self.assertRaises(ConfigurationException, self.config.write_app_manifests, [('unknown', 'test_files')])
+
+    def test_concurrent_processes(self):
+        #ConfigService, transition.py command line and Office instances share the db
+        import multiprocessing
+        if not isinstance(self.config._connection_manager, SQLiteBackend):
+            self.skipTest("processes share a db file")
+        self.assertEqual('wal', self.config._sqlite.execute("PRAGMA journal_mode").fetchone()[0])
+        self.config.enable_app('addin', 'config', 'word')
+        com_app_tuple = ('excel', 'access', 'outlook', 'powerpoint')
+        pool = multiprocessing.Pool(len(com_app_tuple))
+        try:
+            pool.starmap(toggle_app, [(com_app, 20) for com_app in com_app_tuple])
+        finally:
+            pool.close()
+            pool.join()
+
+        #changes made by other processes are seen
+        self.assertListEqual(['word'], self.config.get_app_com_app_list('addin', 'config', True))
+
+    def test_snapshot_backend(self):
+        from transitioncore.exceptions.configurationexception import ConfigurationException
+        self.config.enable_app('addin', 'config', 'excel')
+        snapshot = Configuration(backend=SnapshotBackend(self.config._connection_manager))
+        try:
+            self.assertListEqual(['config'], snapshot.get_enabled_app_list('addin', 'excel'))
+            self.assertEqual(self.config.get_app_info('addin', 'config'), snapshot.get_app_info('addin', 'config'))
+            self.assertEqual(self.config.get_app_status_matrix(), snapshot.get_app_status_matrix())
+            self.assertEqual(0, snapshot.get_app_state('addin', 'config'))
+
+            #read-only
+            self.assertRaises(ConfigurationException, snapshot.enable_app, 'addin', 'config', 'word')
+            self.assertRaises(ConfigurationException, snapshot.disable_apps, [('addin', 'config', None)])
+
+            #source changes are not seen
+            self.config.disable_app('addin', 'config', 'excel')
+            self.assertListEqual(['config'], snapshot.get_enabled_app_list('addin', 'excel'))
+        finally:
+            snapshot.close()
+
+    def test_startup_snapshot(self):
+        from transitioncore.startupsnapshot import StartupSnapshot
+        import tests
+        snapshot_path = tests.__path__[0] + '\\test.snapshot'
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        config = Configuration(backend=self.config._connection_manager, snapshot_path=snapshot_path)
+        try:
+            #written after each write
+            config.enable_app('addin', 'config', 'excel')
+            snapshot = StartupSnapshot.open(snapshot_path)
+            self.assertEqual(config.get_startup_snapshot(), snapshot.data)
+            self.assertListEqual(config.get_com_app_list(), snapshot.get_com_app_list())
+            self.assertListEqual(['config'], snapshot.get_enabled_app_list('addin', 'excel'))
+            self.assertListEqual([], snapshot.get_enabled_app_list('addin', 'word'))
+            self.assertEqual(config.get_app_type_path('addin'), snapshot.get_app_type_path('addin'))
+            app_info = config.get_app_info('addin', 'config')
+            self.assertEqual(app_info.path, snapshot.get_app_path('addin', 'config'))
+            self.assertDictEqual({'SHA256': app_info.SHA256, 'SHA512': app_info.SHA512,
+                                  'WHIRLPOOL': app_info.WHIRLPOOL}, snapshot.get_app_digests('addin', 'config'))
+            snapshot.close()
+
+            #replaced digests (legacy ones upgraded) too
+            digests = {'SHA256': '0' * 64, 'SHA512': '1' * 128, 'WHIRLPOOL': '2' * 128}
+            config._update_app_digests(app_info['rowid'], digests)
+            snapshot = StartupSnapshot.open(snapshot_path)
+            self.assertDictEqual(digests, snapshot.get_app_digests('addin', 'config'))
+            snapshot.close()
+
+            config.disable_app('addin', 'config', 'excel')
+            snapshot = StartupSnapshot.open(snapshot_path)
+            self.assertListEqual([], snapshot.get_enabled_app_list('addin', 'excel'))
+            snapshot.close()
+
+            #outdated snapshot is found
+            self.config.enable_app('addin', 'config', 'excel')
+            self.assertNotEqual(config.get_startup_snapshot(), StartupSnapshot.open(snapshot_path).data)
+            self.assertTrue(config.write_startup_snapshot())
+            self.assertEqual(config.get_startup_snapshot(), StartupSnapshot.open(snapshot_path).data)
+
+            #no snapshot without path
+            self.assertFalse(self.config.write_startup_snapshot())
+        finally:
+            config.close()
+            os.remove(snapshot_path)
+
+    def test_stats(self):
+        from transitioncore.configstats import STATS_API, STATS_SQL
+        self.assertIsNone(self.config.get_stats())
+        self.config.get_app_list(app_type='addin')
+
+        self.config.enable_stats()
+        self.config.enable_app('addin', 'config', 'excel')
+        self.assertListEqual(['config'], self.config.get_enabled_app_list('addin', 'excel'))
+        self.config.get_app_list(app_type='addin')
+
+        open_count, entry_list = self.config.get_stats()
+        self.assertEqual(1, open_count)
+        entry_dict = {(kind, name): (count, rows) for kind, name, count, total, p50, p90, p99, max_latency, rows
+                      in entry_list}
+        self.assertEqual((1, 1), entry_dict[(STATS_API, 'get_enabled_app_list')])
+        self.assertEqual(1, entry_dict[(STATS_API, 'enable_app')][0])
+        self.assertEqual(1, entry_dict[(STATS_API, 'get_app_list')][0])
+        self.assertEqual((1, 1), entry_dict[(STATS_SQL, 'SQL_UPDATE_APP_WORKS_WITH_COM_APP')])
+        self.assertLessEqual(1, entry_dict[(STATS_SQL, 'SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE')][1])
+
+        self.config.reset_stats()
+        self.assertEqual((0, ()), self.config.get_stats())
+
+        self.config.disable_stats()
+        self.assertIsNone(self.config.get_stats())
+        self.assertListEqual(['config'], self.config.get_enabled_app_list('addin', 'excel'))
+
+    def test_update_inventory_parallel(self):
+        import shutil
+        from transitioncore.configsql import SQL_INSERT_APP_TYPE
+        import tests
+
+        #populate database the usual way. Parallel pass must not find any change
+        self.config.update_inventory(fire_event=False)
+        self.evt.last_fired_evt = ''
+        self.config.update_inventory(parallel=True, processes=2)
+        self.assertEqual('', self.evt.last_fired_evt)
+
+        #make a fake app
+        os.mkdir(self.test_dir)
+        with open(self.test_dir + "\\__init__.py", "w") as f:
+            f.write("""# Author:      Somebody
+#
+# Version:     1.0
+#
+
+app_class = None
+com_app = ('excel', )
+app_type = 'tests'
+""")
+
+        #insert "tests" app_type
+        sqlitecnx = self.config._sqlite
+        cursor = sqlitecnx.cursor()
+        cursor.execute(SQL_INSERT_APP_TYPE, ("tests", tests.__path__[0]))
+        sqlitecnx.commit()
+
+        #metadata extracted by workers are stored by this process
+        self.config.update_inventory(app_type='tests', parallel=True, processes=2)
+        self.assertEqual('on_app_add', self.evt.last_fired_evt)
+        self.assertEqual('test_files', self.evt.last_fired_evt_args['app_name'])
+        app_info = self.config.get_app_info('tests', 'test_files')
+        self.assertEqual('Somebody', app_info['author'])
+        self.assertEqual('1.0', app_info['version'])
+        self.assertEqual(0, self.config.get_app_state('tests', 'test_files'))
+
+        #modify app in user mode, update must fire on_app_update
+        self.config.write_app_manifest(self.test_dir)
+        with open(self.test_dir + "\\data.txt", "w") as f:
+            f.write("data")
+        self.config.write_app_manifest(self.test_dir)
+        self.config.update_inventory(app_type='tests', parallel=True, processes=2)
+        self.assertEqual('on_app_update', self.evt.last_fired_evt)
+        self.assertEqual(0, self.config.get_app_state('tests', 'test_files'))
+
+        #remove fake app, update must fire on_app_del
+        shutil.rmtree(self.test_dir)
+        self.config.update_inventory(app_type='tests', parallel=True)
+        self.assertEqual('on_app_del', self.evt.last_fired_evt)
+        self.assertEqual('test_files', self.evt.last_fired_evt_args['app_name'])
+
     def test_write_app_manifest(self):
         # from transitioncore.exceptions.configurationexception import ConfigurationException
 
@@ -1228,5 +1946,16 @@ app_type = 'tests'
 
         self.assertDictEqual(expected_digests, self.config._generate_app_digests(self.test_dir))
 
+
+class ConfigurationSQLiteTest(ConfigurationTest):
+    """
+    ConfigurationTest on db file
+    """
+
+    @staticmethod
+    def make_backend():
+        return SQLiteBackend(Configuration.cnx_str)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
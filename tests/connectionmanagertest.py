@@ -0,0 +1,176 @@
+# ------------------------------------------------------------------------------
+# Name:        connectionmanagertest
+# Purpose:     ConnectionManager unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import threading
+import sqlite3
+import multiprocessing
+from transitioncore.connectionmanager import ConnectionManager
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+def increment_counter(db_path, count):
+    """
+    Process pool worker : increments counter table count times, reads it between writes
+    :return: retry count
+    """
+    def write(cnx):
+        value = cnx.execute("SELECT value FROM counter").fetchone()[0]
+        cnx.execute("UPDATE counter SET value = ?", (value + 1, ))
+
+    manager = ConnectionManager(db_path)
+    for i in range(count):
+        manager.run_write(write)
+        manager.get().execute("SELECT value FROM counter").fetchone()
+    manager.close_all()
+    return manager.retry_count
+
+
+class ConnectionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.db_path = tests.__path__[0] + '\\test.s3db'
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.open_list = list()
+        self.manager = ConnectionManager(self.db_path, lambda cnx, created: self.open_list.append(created))
+
+    def tearDown(self):
+        self.manager.close_all()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def test_get(self):
+        self.assertIsNone(self.manager.peek())
+        cnx = self.manager.get()
+        #same connection while not closed, opened once
+        self.assertIs(cnx, self.manager.get())
+        self.assertIs(cnx, self.manager.peek())
+        self.assertListEqual([True], self.open_list)
+        #pragmas are applied
+        self.assertEqual(1, cnx.execute("PRAGMA foreign_keys").fetchone()[0])
+
+        #another thread gets its own connection, db exists now
+        thread_cnx_list = list()
+        thread = threading.Thread(target=lambda: thread_cnx_list.append(self.manager.get()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(cnx, thread_cnx_list[0])
+        self.assertListEqual([True, False], self.open_list)
+        self.assertEqual(2, self.manager.get_connection_count())
+
+        #connection of finished thread is closed when a new one is opened
+        self.manager.close()
+        self.assertIsNone(self.manager.peek())
+        self.manager.get()
+        self.assertEqual(1, self.manager.get_connection_count())
+        self.assertEqual(3, self.manager.open_count)
+
+    def test_close_all(self):
+        cnx = self.manager.get()
+        self.manager.close_all()
+        self.assertEqual(0, self.manager.get_connection_count())
+        self.assertIsNone(self.manager.peek())
+        self.assertIsNot(cnx, self.manager.get())
+
+    def test_run_write(self):
+        cnx = self.manager.get()
+        self.assertEqual('wal', cnx.execute("PRAGMA journal_mode").fetchone()[0])
+        self.manager.run_write(lambda cnx: cnx.execute("CREATE TABLE counter (value INT)"))
+        self.assertEqual(1, self.manager.run_write(
+            lambda cnx: cnx.execute("INSERT INTO counter VALUES (0)").rowcount))
+        self.assertFalse(cnx.in_transaction)
+
+        #failed write is rolled back
+        def failing_write(cnx):
+            cnx.execute("UPDATE counter SET value = 1")
+            cnx.execute("SELECT * FROM missing_table")
+        self.assertRaises(sqlite3.OperationalError, self.manager.run_write, failing_write)
+        self.assertEqual(0, cnx.execute("SELECT value FROM counter").fetchone()[0])
+        self.assertEqual(0, self.manager.retry_count)
+
+        #CREATE statement doesn't commit the transaction
+        def failing_create(cnx):
+            cnx.execute("UPDATE counter SET value = 1")
+            cnx.execute("CREATE TEMP TABLE change (id INTEGER PRIMARY KEY)")
+            cnx.execute("SELECT * FROM missing_table")
+        self.assertRaises(sqlite3.OperationalError, self.manager.run_write, failing_create)
+        self.assertEqual(0, cnx.execute("SELECT value FROM counter").fetchone()[0])
+        self.assertFalse(cnx.in_transaction)
+        self.assertEqual('', cnx.isolation_level)
+
+        #other exceptions are rolled back too : write lock is released
+        def raising_write(cnx):
+            cnx.execute("UPDATE counter SET value = 1")
+            raise KeyError('value')
+        self.assertRaises(KeyError, self.manager.run_write, raising_write)
+        self.assertFalse(cnx.in_transaction)
+        self.manager.run_write(lambda cnx: None)
+        self.assertEqual(0, cnx.execute("SELECT value FROM counter").fetchone()[0])
+
+        #another process holds write lock : retried, then raised
+        manager = ConnectionManager(self.db_path, timeout=0.01, retry_count=2, retry_delay=0.01)
+        other_cnx = sqlite3.connect(self.db_path, check_same_thread=False)
+        other_cnx.isolation_level = None
+        other_cnx.execute("BEGIN IMMEDIATE")
+        write = lambda cnx: cnx.execute("UPDATE counter SET value = 2")
+        self.assertRaises(sqlite3.OperationalError, manager.run_write, write)
+        self.assertEqual(2, manager.retry_count)
+
+        #lock is released while retrying
+        timer = threading.Timer(0.05, lambda: other_cnx.execute("COMMIT"))
+        manager = ConnectionManager(self.db_path, timeout=0.01, retry_count=10, retry_delay=0.02)
+        timer.start()
+        manager.run_write(write)
+        timer.join()
+        self.assertLess(0, manager.retry_count)
+        self.assertEqual(2, cnx.execute("SELECT value FROM counter").fetchone()[0])
+        manager.close_all()
+        other_cnx.close()
+
+    def test_run_write_processes(self):
+        #several processes write and read at once, no update is lost
+        self.manager.run_write(lambda cnx: cnx.execute("CREATE TABLE counter (value INT)"))
+        self.manager.run_write(lambda cnx: cnx.execute("INSERT INTO counter VALUES (0)"))
+        process_count = 4
+        count = 50
+        pool = multiprocessing.Pool(process_count)
+        try:
+            pool.starmap(increment_counter, [(self.db_path, count)] * process_count)
+        finally:
+            pool.close()
+            pool.join()
+
+        value = self.manager.get().execute("SELECT value FROM counter").fetchone()[0]
+        self.assertEqual(process_count * count, value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# ------------------------------------------------------------------------------
+# Name:        digestenginetest
+# Purpose:     DigestEngine unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+from transitioncore.digestengine import DigestEngine, DIGEST_FORMAT_LEGACY, DIGEST_ALGORITHMS, CHUNK_SIZE
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class DigestEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        import shutil
+        import tests
+        self.test_dir = tests.__path__[0] + '\\test_files'
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print("It shouldn't be a problem : ", repr(e), self.test_dir)
+
+        os.mkdir(self.test_dir)
+        os.mkdir(self.test_dir + '\\sub')
+        os.mkdir(self.test_dir + '\\__pycache__')
+        with open(self.test_dir + '\\__init__.py', 'w') as f:
+            f.write("print('Hello world!')")
+        with open(self.test_dir + '\\sub\\data.bin', 'wb') as f:
+            f.write(os.urandom(3 * CHUNK_SIZE + 17))
+        with open(self.test_dir + '\\__pycache__\\__init__.cpython-34.pyc', 'wb') as f:
+            f.write(os.urandom(64))
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            f.write(os.urandom(64))
+
+    def tearDown(self):
+        import shutil
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print(repr(e))
+
+    def test_list_app_files(self):
+        file_list = DigestEngine.list_app_files(self.test_dir)
+        #Manifest and pycache are not part of app sources, paths are relative and sorted
+        self.assertListEqual(['__init__.py', 'sub/data.bin'], [rel_path for rel_path, _ in file_list])
+
+    def test_fingerprint(self):
+        import time
+        old_time = time.time() - 3600
+        for root, dirs, files in os.walk(self.test_dir):
+            for name in files:
+                os.utime(os.path.join(root, name), (old_time, old_time))
+
+        fingerprint = DigestEngine.fingerprint(self.test_dir)
+        self.assertTrue(fingerprint.startswith('3:'))
+        self.assertEqual(fingerprint, DigestEngine.fingerprint(self.test_dir))
+        self.assertIsNone(DigestEngine.fingerprint(self.test_dir + '\\missing'))
+
+        #pycache is ignored
+        with open(self.test_dir + '\\__pycache__\\data.cpython-34.pyc', 'wb') as f:
+            f.write(os.urandom(64))
+        self.assertEqual(fingerprint, DigestEngine.fingerprint(self.test_dir))
+
+        #renamed file
+        os.rename(self.test_dir + '\\sub\\data.bin', self.test_dir + '\\sub\\data2.bin')
+        renamed_fingerprint = DigestEngine.fingerprint(self.test_dir)
+        self.assertNotEqual(fingerprint, renamed_fingerprint)
+
+        #written file
+        os.utime(self.test_dir + '\\Manifest', (old_time, old_time + 1))
+        self.assertNotEqual(renamed_fingerprint, DigestEngine.fingerprint(self.test_dir))
+
+        #file written now can't be trusted
+        with open(self.test_dir + '\\sub\\data2.bin', 'ab') as f:
+            f.write(b'0')
+        self.assertIsNone(DigestEngine.fingerprint(self.test_dir))
+
+    def test_legacy_zip_info(self):
+        import io
+        import zipfile
+        #same entry as ZipFile.write() builds
+        full_path = self.test_dir + '\\sub\\data.bin'
+        with zipfile.ZipFile(io.BytesIO(), 'w') as zipf:
+            zipf.write(full_path)
+            expected = zipf.infolist()[0]
+        zinfo = DigestEngine._legacy_zip_info(full_path)
+        for name in ('filename', 'date_time', 'external_attr', 'file_size', 'compress_type', 'create_system'):
+            self.assertEqual(getattr(expected, name), getattr(zinfo, name))
+
+    def test_hash_files(self):
+        full_path_list = [full_path for _, full_path in DigestEngine.list_app_files(self.test_dir)]
+
+        #parallel and serial hashing must give same digests
+        serial_digest_list = DigestEngine.hash_files(full_path_list, parallel=False)
+        parallel_digest_list = DigestEngine.hash_files(full_path_list, parallel=True)
+        self.assertEqual(len(full_path_list), len(serial_digest_list))
+        self.assertListEqual(serial_digest_list, parallel_digest_list)
+        for digests in serial_digest_list:
+            self.assertListEqual(sorted(DIGEST_ALGORITHMS), sorted(digests.keys()))
+
+        #a missing file raises error and stops workers
+        self.assertRaises(IOError, DigestEngine.hash_files, [self.test_dir + '\\missing'], True)
+
+    def test_generate(self):
+        #parallel and serial hashing must give same digests
+        self.assertDictEqual(DigestEngine.generate(self.test_dir, parallel=False),
+                             DigestEngine.generate(self.test_dir, parallel=True))
+        self.assertDictEqual(DigestEngine.generate(self.test_dir, DIGEST_FORMAT_LEGACY, parallel=False),
+                             DigestEngine.generate(self.test_dir, DIGEST_FORMAT_LEGACY, parallel=True))
+
+        #pycache and Manifest don't change digests
+        expected_digests = DigestEngine.generate(self.test_dir)
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            f.write(os.urandom(64))
+        self.assertDictEqual(expected_digests, DigestEngine.generate(self.test_dir))
+
+        #a change in a file does
+        with open(self.test_dir + '\\sub\\data.bin', 'ab') as f:
+            f.write(b'\0')
+        digests = DigestEngine.generate(self.test_dir)
+        for key in digests.keys():
+            self.assertNotEqual(expected_digests[key], digests[key])
+
+        #no files, no digests
+        os.mkdir(self.test_dir + '\\empty')
+        self.assertIsNone(DigestEngine.generate(self.test_dir + '\\empty'))
+
+
+if __name__ == '__main__':
+    unittest.main()
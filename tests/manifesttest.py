@@ -0,0 +1,162 @@
+# ------------------------------------------------------------------------------
+# Name:        manifesttest
+# Purpose:     Manifest unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import pickle
+from transitioncore.manifest import Manifest, MANIFEST_VERSION_LEGACY, MANIFEST_VERSION_MERKLE, FILE_CHANGED, \
+    FILE_MISSING, FILE_ADDED
+from transitioncore.digestengine import DigestEngine, DIGEST_FORMAT_LEGACY
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        import shutil
+        import tests
+        self.test_dir = tests.__path__[0] + '\\test_files'
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print("It shouldn't be a problem : ", repr(e), self.test_dir)
+
+        os.mkdir(self.test_dir)
+        os.mkdir(self.test_dir + '\\sub')
+        os.mkdir(self.test_dir + '\\sub\\deep')
+        os.mkdir(self.test_dir + '\\other')
+        with open(self.test_dir + '\\__init__.py', 'w') as f:
+            f.write("print('Hello world!')")
+        with open(self.test_dir + '\\sub\\data.bin', 'wb') as f:
+            f.write(os.urandom(1024))
+        with open(self.test_dir + '\\sub\\deep\\my file.txt', 'w') as f:
+            f.write("spaces in names are allowed")
+        with open(self.test_dir + '\\other\\data.bin', 'wb') as f:
+            f.write(os.urandom(1024))
+
+    def tearDown(self):
+        import shutil
+        try:
+            shutil.rmtree(self.test_dir)
+        except Exception as e:
+            print(repr(e))
+
+    def test_from_path(self):
+        manifest = Manifest.from_path(self.test_dir)
+        self.assertListEqual(['__init__.py', 'other/data.bin', 'sub/data.bin', 'sub/deep/my file.txt'],
+                             sorted(manifest.entries.keys()))
+        self.assertEqual(1024, manifest.entries['sub/data.bin'][0])
+        #app digests are the streamed ones
+        self.assertDictEqual(DigestEngine.generate(self.test_dir), manifest.digests)
+        #hashing subtrees at the same time gives same Manifest
+        self.assertEqual(manifest.merkle_root, Manifest.from_path(self.test_dir, workers=3).merkle_root)
+
+        sub_manifest = Manifest.from_path(self.test_dir, 'sub')
+        self.assertListEqual(['sub/data.bin', 'sub/deep/my file.txt'], sorted(sub_manifest.entries.keys()))
+
+    def test_read(self):
+        manifest = Manifest.from_path(self.test_dir)
+        manifest.write(self.test_dir)
+
+        read_manifest = Manifest.read(self.test_dir)
+        self.assertEqual(MANIFEST_VERSION_MERKLE, read_manifest.version)
+        self.assertDictEqual(manifest.entries, read_manifest.entries)
+        self.assertEqual(manifest.merkle_root, read_manifest.merkle_root)
+
+        #a tampered entry breaks Merkle root
+        with open(self.test_dir + '\\Manifest', 'r') as f:
+            lines = f.readlines()
+        lines[1] = lines[1].replace('FILE 21 ', 'FILE 22 ')
+        with open(self.test_dir + '\\Manifest', 'w') as f:
+            f.writelines(lines)
+        self.assertRaises(ConfigurationException, Manifest.read, self.test_dir)
+
+        #pickled Manifest are still read
+        digests = DigestEngine.generate(self.test_dir, DIGEST_FORMAT_LEGACY)
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            pickle.dump(digests, f)
+        read_manifest = Manifest.read(self.test_dir)
+        self.assertEqual(MANIFEST_VERSION_LEGACY, read_manifest.version)
+        self.assertEqual(DIGEST_FORMAT_LEGACY, read_manifest.digest_format)
+        self.assertDictEqual(digests, read_manifest.digests)
+        self.assertIsNone(read_manifest.entries)
+
+        #garbage
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            f.write(b'garbage')
+        self.assertRaises(ConfigurationException, Manifest.read, self.test_dir)
+
+    def test_diff(self):
+        expected = Manifest.from_path(self.test_dir)
+        self.assertListEqual([], expected.diff(Manifest.from_path(self.test_dir)))
+
+        with open(self.test_dir + '\\sub\\deep\\my file.txt', 'a') as f:
+            f.write("!")
+        os.remove(self.test_dir + '\\other\\data.bin')
+        with open(self.test_dir + '\\sub\\new.py', 'w') as f:
+            f.write("pass")
+
+        actual = Manifest.from_path(self.test_dir)
+        self.assertListEqual([('other/data.bin', FILE_MISSING),
+                              ('sub/deep/my file.txt', FILE_CHANGED),
+                              ('sub/new.py', FILE_ADDED)], expected.diff(actual))
+        self.assertListEqual([('sub/deep/my file.txt', FILE_CHANGED),
+                              ('sub/new.py', FILE_ADDED)], expected.diff(actual, 'sub'))
+        self.assertListEqual([], expected.diff(actual, '__init__.py'))
+
+    def test_verify(self):
+        Manifest.from_path(self.test_dir).write(self.test_dir)
+        manifest = Manifest.read(self.test_dir)
+        _, failure_list = manifest.verify(self.test_dir)
+        self.assertListEqual([], failure_list)
+
+        with open(self.test_dir + '\\sub\\data.bin', 'ab') as f:
+            f.write(b'\0')
+
+        actual, failure_list = manifest.verify(self.test_dir)
+        self.assertListEqual([('sub/data.bin', FILE_CHANGED)], failure_list)
+        self.assertDictEqual(DigestEngine.generate(self.test_dir), actual.digests)
+
+        #subtrees are verified alone
+        _, failure_list = manifest.verify(self.test_dir, 'other')
+        self.assertListEqual([], failure_list)
+        _, failure_list = manifest.verify(self.test_dir, 'sub', workers=2)
+        self.assertListEqual([('sub/data.bin', FILE_CHANGED)], failure_list)
+
+        #pickled Manifest can only verify the whole app
+        with open(self.test_dir + '\\Manifest', 'wb') as f:
+            pickle.dump(DigestEngine.generate(self.test_dir, DIGEST_FORMAT_LEGACY), f)
+        manifest = Manifest.read(self.test_dir)
+        _, failure_list = manifest.verify(self.test_dir)
+        self.assertListEqual([], failure_list)
+        self.assertRaises(ConfigurationException, manifest.verify, self.test_dir, 'sub')
+
+
+if __name__ == '__main__':
+    unittest.main()
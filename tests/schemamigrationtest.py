@@ -0,0 +1,142 @@
+# ------------------------------------------------------------------------------
+# Name:        schemamigrationtest
+# Purpose:     SchemaMigration unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import sqlite3
+from transitioncore.schemamigration import SchemaMigration
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+# schema of first release, without versioning
+LEGACY_SCHEMA = ("CREATE TABLE app (name TEXT, author TEXT, version TEXT, description TEXT, path TEXT, "
+                 "id_app_type INT, SHA256 VARCHAR(64), SHA512 VARCHAR(128), WHIRLPOOL VARCHAR(128))",
+                 "CREATE TABLE app_type (name TEXT NOT NULL UNIQUE, path TEXT NOT NULL UNIQUE)",
+                 "CREATE TABLE com_app (short_name TEXT NOT NULL UNIQUE)",
+                 "CREATE TABLE app_works_with_com_app (id_app INT, id_com_app INT, enabled BOOL DEFAULT 0)")
+
+
+class SchemaMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cnx = sqlite3.connect(':memory:')
+        self.cnx.row_factory = sqlite3.Row
+        self.cnx.execute("PRAGMA foreign_keys = ON")
+        for sql in LEGACY_SCHEMA:
+            self.cnx.execute(sql)
+        self.cnx.execute("INSERT INTO app_type VALUES ('addin', 'c:\\addin')")
+        self.cnx.execute("INSERT INTO com_app VALUES ('excel')")
+        self.cnx.execute("INSERT INTO com_app VALUES ('word')")
+        app_sql = "INSERT INTO app (name, path, id_app_type) VALUES (?, ?, ?)"
+        self.cnx.execute(app_sql, ('first', 'c:\\addin\\first', 1))
+        self.cnx.execute(app_sql, ('second', 'c:\\addin\\second', 1))
+        #duplicated app and app of unknown type
+        self.cnx.execute(app_sql, ('first', 'c:\\addin\\first', 1))
+        self.cnx.execute(app_sql, ('lost', 'c:\\lost', 7))
+        link_sql = "INSERT INTO app_works_with_com_app VALUES (?, ?, ?)"
+        self.cnx.execute(link_sql, (1, 1, 1))
+        self.cnx.execute(link_sql, (2, 2, 0))
+        #duplicated link, links to dropped apps and to unknown com app
+        self.cnx.execute(link_sql, (1, 1, 0))
+        self.cnx.execute(link_sql, (3, 1, 1))
+        self.cnx.execute(link_sql, (4, 1, 1))
+        self.cnx.execute(link_sql, (2, 9, 1))
+        self.cnx.commit()
+
+    def tearDown(self):
+        self.cnx.close()
+
+    def test_get_version(self):
+        self.assertEqual(0, SchemaMigration.get_version(self.cnx))
+        SchemaMigration.set_version(self.cnx, 1)
+        self.assertEqual(1, SchemaMigration.get_version(self.cnx))
+
+    def test_upgrade(self):
+        applied_list = SchemaMigration.upgrade(self.cnx)
+        self.assertListEqual([1, 2, 3, 4], applied_list)
+        self.assertEqual(SchemaMigration.get_schema_version(), SchemaMigration.get_version(self.cnx))
+        #connection settings are restored
+        self.assertEqual(1, self.cnx.execute("PRAGMA foreign_keys").fetchone()[0])
+        self.assertEqual('', self.cnx.isolation_level)
+
+        #ids are kept, duplicates and orphans are dropped
+        app_list = [tuple(row) for row in self.cnx.execute("SELECT id, name, app_class FROM app ORDER BY id")]
+        self.assertListEqual([(1, 'first', None), (2, 'second', None)], app_list)
+        column_list = [row[1] for row in self.cnx.execute("PRAGMA table_info(app)")]
+        self.assertIn('dir_fingerprint', column_list)
+        self.assertIn('verified_at', column_list)
+        link_list = [tuple(row) for row in self.cnx.execute(
+            "SELECT id_app, id_com_app, enabled FROM app_works_with_com_app ORDER BY id")]
+        self.assertListEqual([(1, 1, 1), (2, 2, 0)], link_list)
+
+        #file digests cache and indexes exist, no v1 table left
+        name_list = [row[0] for row in self.cnx.execute("SELECT name FROM sqlite_master")]
+        self.assertIn('file_digest', name_list)
+        self.assertIn('app_path_idx', name_list)
+        self.assertIn('app_works_with_com_app_status_idx', name_list)
+        self.assertNotIn('app_v1', name_list)
+
+        #lookups use indexes
+        plan = ' '.join(row[-1] for row in self.cnx.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM app WHERE path = ?", ('c:\\addin\\first', )))
+        self.assertIn('app_path_idx', plan)
+
+        #constraints are enforced
+        self.assertRaises(sqlite3.IntegrityError, self.cnx.execute,
+                          "INSERT INTO app (name, id_app_type) VALUES ('first', 1)")
+        self.assertRaises(sqlite3.IntegrityError, self.cnx.execute,
+                          "INSERT INTO app (name, id_app_type) VALUES ('other', 5)")
+        #links are deleted with app
+        self.cnx.execute("DELETE FROM app WHERE id = 1")
+        self.assertEqual(1, self.cnx.execute("SELECT count(*) FROM app_works_with_com_app").fetchone()[0])
+        self.cnx.rollback()
+
+        #nothing to do once up to date
+        self.assertListEqual([], SchemaMigration.upgrade(self.cnx))
+
+    def test_upgrade_newer(self):
+        SchemaMigration.set_version(self.cnx, SchemaMigration.get_schema_version() + 1)
+        self.assertRaises(ConfigurationException, SchemaMigration.upgrade, self.cnx)
+
+    def test_upgrade_failure(self):
+        #failed step is rolled back, completed ones are kept
+        def broken(cnx):
+            cnx.execute("DROP TABLE app")
+            cnx.execute("SELECT * FROM missing_table")
+
+        migration_list = SchemaMigration.migration_list
+        SchemaMigration.migration_list = (migration_list[0], (2, broken))
+        try:
+            self.assertRaises(ConfigurationException, SchemaMigration.upgrade, self.cnx)
+        finally:
+            SchemaMigration.migration_list = migration_list
+        self.assertEqual(1, SchemaMigration.get_version(self.cnx))
+        self.assertEqual(2, self.cnx.execute("SELECT count(*) FROM app WHERE name = 'first'").fetchone()[0])
+
+if __name__ == '__main__':
+    unittest.main()
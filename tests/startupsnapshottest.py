@@ -0,0 +1,107 @@
+# ------------------------------------------------------------------------------
+# Name:        startupsnapshottest
+# Purpose:     StartupSnapshot unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+from transitioncore.startupsnapshot import StartupSnapshot, HEADER
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class StartupSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.snapshot_path = tests.__path__[0] + '\\test.snapshot'
+        self.data = StartupSnapshot.build(
+            [('docapp', 'C:\\docapp'), ('addin', 'C:\\addin')],
+            ['excel', 'word', 'powerpoint'],
+            [('addin', 'config', 'C:\\addin\\config', {'SHA256': 'a' * 64, 'SHA512': 'b' * 128, 'WHIRLPOOL': None},
+              0b011, 0b001, '12:' + 'e' * 40, 1500000000.5),
+             ('addin', 'tracer', 'C:\\addin\\tracer', {'SHA256': 'c' * 64, 'SHA512': 'd' * 128, 'WHIRLPOOL': 'é'},
+              0b111, 0b110, None, None),
+             ('docapp', 'sheet', 'C:\\docapp\\sheet', {}, 0b001, 0b101, None, None)])
+
+    def tearDown(self):
+        if os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+
+    def test_read(self):
+        snapshot = StartupSnapshot(self.data)
+        self.assertEqual(self.data, snapshot.data)
+        self.assertListEqual(['excel', 'word', 'powerpoint'], snapshot.get_com_app_list())
+        self.assertEqual('C:\\addin', snapshot.get_app_type_path('addin'))
+        self.assertIsNone(snapshot.get_app_type_path('unknown'))
+
+        self.assertListEqual(['config'], snapshot.get_enabled_app_list('addin', 'excel'))
+        self.assertListEqual(['tracer'], snapshot.get_enabled_app_list('addin', 'word'))
+        self.assertListEqual([], snapshot.get_enabled_app_list('addin', 'unknown'))
+        #enabled but not available
+        self.assertListEqual([], snapshot.get_enabled_app_list('docapp', 'powerpoint'))
+        self.assertListEqual(['sheet'], snapshot.get_enabled_app_list('docapp', 'excel'))
+
+        self.assertEqual('C:\\addin\\tracer', snapshot.get_app_path('addin', 'tracer'))
+        self.assertIsNone(snapshot.get_app_path('docapp', 'tracer'))
+        self.assertDictEqual({'SHA256': 'a' * 64, 'SHA512': 'b' * 128, 'WHIRLPOOL': None},
+                             snapshot.get_app_digests('addin', 'config'))
+        self.assertEqual('é', snapshot.get_app_digests('addin', 'tracer')['WHIRLPOOL'])
+        self.assertIsNone(snapshot.get_app_digests('addin', 'unknown'))
+
+        self.assertTupleEqual(('C:\\addin\\config', '12:' + 'e' * 40, 1500000000.5),
+                              snapshot.get_app_verification('addin', 'config'))
+        self.assertTupleEqual(('C:\\addin\\tracer', None, None), snapshot.get_app_verification('addin', 'tracer'))
+        self.assertIsNone(snapshot.get_app_verification('addin', 'unknown'))
+
+    def test_invalid(self):
+        self.assertRaises(ConfigurationException, StartupSnapshot, self.data[:HEADER.size - 1])
+        self.assertRaises(ConfigurationException, StartupSnapshot, b'X' + self.data[1:])
+        self.assertRaises(ConfigurationException, StartupSnapshot, self.data[:-1] + b'X')
+        self.assertRaises(ConfigurationException, StartupSnapshot.build, [], ['excel'] * 33, [])
+
+    def test_write_open(self):
+        self.assertIsNone(StartupSnapshot.open(self.snapshot_path))
+
+        StartupSnapshot.write(self.snapshot_path, self.data)
+        snapshot = StartupSnapshot.open(self.snapshot_path)
+        self.assertEqual(self.data, snapshot.data)
+        self.assertListEqual(['config'], snapshot.get_enabled_app_list('addin', 'excel'))
+        snapshot.close()
+
+        #invalid files are ignored
+        with open(self.snapshot_path, 'wb') as snapshot_file:
+            snapshot_file.write(self.data[:-1])
+        self.assertIsNone(StartupSnapshot.open(self.snapshot_path))
+        with open(self.snapshot_path, 'wb'):
+            pass
+        self.assertIsNone(StartupSnapshot.open(self.snapshot_path))
+        self.assertListEqual(['test.snapshot'],
+                             [name for name in os.listdir(os.path.dirname(self.snapshot_path))
+                              if name.startswith('test.snapshot')])
+
+if __name__ == '__main__':
+    unittest.main()
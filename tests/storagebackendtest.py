@@ -0,0 +1,110 @@
+# ------------------------------------------------------------------------------
+# Name:        storagebackendtest
+# Purpose:     Storage backends unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import threading
+from transitioncore.storagebackend import SQLiteBackend, MemoryBackend, SnapshotBackend
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class StorageBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.db_path = tests.__path__[0] + '\\test.s3db'
+        self.open_list = list()
+
+    def tearDown(self):
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def fill(self, backend):
+        backend.run_write(lambda cnx: cnx.execute("CREATE TABLE t (value INT)"))
+        backend.run_write(lambda cnx: cnx.execute("INSERT INTO t VALUES (1)"))
+
+    def test_memory_backend(self):
+        backend = MemoryBackend(lambda cnx, created: self.open_list.append(created))
+        self.assertFalse(backend.exists())
+        self.fill(backend)
+        self.assertTrue(backend.exists())
+        self.assertFalse(os.path.exists(backend.db_path))
+
+        #threads share the same db
+        value_list = list()
+        thread = threading.Thread(target=lambda: value_list.append(
+            backend.get().execute("SELECT value FROM t").fetchone()[0]))
+        thread.start()
+        thread.join()
+        self.assertListEqual([1], value_list)
+        self.assertListEqual([True, False], self.open_list)
+
+        #another backend has its own db
+        other = MemoryBackend()
+        self.assertRaises(Exception, other.get().execute, "SELECT value FROM t")
+        other.remove()
+
+        #db is dropped
+        backend.remove()
+        self.assertFalse(backend.exists())
+        self.assertRaises(Exception, backend.get().execute, "SELECT value FROM t")
+        self.assertListEqual([True, False, True], self.open_list)
+        backend.remove()
+
+    def test_snapshot_backend(self):
+        #missing source
+        self.assertRaises(ConfigurationException, SnapshotBackend(self.db_path).get)
+
+        backend = SQLiteBackend(self.db_path)
+        self.fill(backend)
+        backend.get().execute("PRAGMA user_version = 3")
+        snapshot = SnapshotBackend(self.db_path)
+        self.assertTrue(snapshot.read_only)
+        self.assertEqual(1, snapshot.get().execute("SELECT value FROM t").fetchone()[0])
+        #schema version is copied
+        self.assertEqual(3, snapshot.get().execute("PRAGMA user_version").fetchone()[0])
+
+        #read-only, source changes are not seen
+        self.assertRaises(ConfigurationException, snapshot.run_write,
+                          lambda cnx: cnx.execute("UPDATE t SET value = 2"))
+        self.assertRaises(Exception, snapshot.get().execute, "UPDATE t SET value = 2")
+        backend.run_write(lambda cnx: cnx.execute("UPDATE t SET value = 3"))
+        self.assertEqual(1, snapshot.get().execute("SELECT value FROM t").fetchone()[0])
+
+        #snapshot of another backend
+        snapshot2 = SnapshotBackend(backend)
+        self.assertEqual(3, snapshot2.get().execute("SELECT value FROM t").fetchone()[0])
+
+        snapshot.remove()
+        snapshot2.remove()
+        backend.remove()
+        self.assertFalse(os.path.exists(self.db_path))
+
+if __name__ == '__main__':
+    unittest.main()
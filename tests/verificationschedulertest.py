@@ -0,0 +1,150 @@
+# ------------------------------------------------------------------------------
+# Name:        verificationschedulertest
+# Purpose:     VerificationScheduler unit tests
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import unittest
+import sys
+import os
+import shutil
+import threading
+import time
+from transitioncore.verificationscheduler import VerificationScheduler
+from transitioncore.digestengine import DigestEngine
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+
+class VerificationSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        import tests
+        self.app_dir = tests.__path__[0] + '\\test_scheduler'
+        os.mkdir(self.app_dir)
+        with open(self.app_dir + "\\__init__.py", "w") as f:
+            f.write("app_class = None\n")
+        #files written just now can't be trusted
+        for path in (self.app_dir + "\\__init__.py", self.app_dir):
+            os.utime(path, (time.time() - 60, time.time() - 60))
+        self.fingerprint = DigestEngine.fingerprint(self.app_dir)
+        self.verified_list = list()
+        self.corrupted_list = list()
+        self.result_dict = dict()
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        shutil.rmtree(self.app_dir)
+
+    def verify(self, app_type, app_name):
+        self.release.wait()
+        self.verified_list.append(app_name)
+        result = self.result_dict.get(app_name, True)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def new_scheduler(self, start_delay=60.0):
+        scheduler = VerificationScheduler(self.verify, lambda app_type, app_name: self.corrupted_list.append(app_name),
+                                          start_delay=start_delay, interval=0)
+        self.addCleanup(scheduler.stop)
+        return scheduler
+
+    def test_trust(self):
+        scheduler = self.new_scheduler()
+        now = time.time()
+        scheduler.add_app('addin', 'trusted', self.app_dir, self.fingerprint, now)
+        scheduler.add_app('addin', 'old', self.app_dir, self.fingerprint, now - 30 * 24 * 3600)
+        scheduler.add_app('addin', 'changed', self.app_dir, '0:' + '0' * 40, now)
+        scheduler.add_app('addin', 'unknown')
+        self.assertTrue(scheduler.is_trusted('addin', 'trusted'))
+        self.assertFalse(scheduler.is_trusted('addin', 'old'))
+        self.assertFalse(scheduler.is_trusted('addin', 'changed'))
+        self.assertFalse(scheduler.is_trusted('addin', 'unknown'))
+        self.assertFalse(scheduler.is_trusted('addin', 'not added'))
+
+        #trusted app is launched without verification, others are verified first, one at a time
+        scheduler.start()
+        self.assertTrue(scheduler.wait('addin', 'trusted'))
+        self.assertListEqual([], self.verified_list)
+        self.result_dict['changed'] = False
+        self.assertFalse(scheduler.wait('addin', 'changed'))
+        self.assertTrue(scheduler.wait('addin', 'unknown'))
+        self.assertListEqual(['changed', 'unknown'], self.verified_list)
+        #result is kept
+        self.assertFalse(scheduler.wait('addin', 'changed'))
+        self.assertEqual(2, scheduler.verify_count)
+        #untrusted app isn't reported as corrupted : it wasn't launched
+        self.assertListEqual([], self.corrupted_list)
+
+    def test_background(self):
+        scheduler = self.new_scheduler(start_delay=0)
+        now = time.time()
+        for app_name in ('first', 'second', 'third'):
+            scheduler.add_app('addin', app_name, self.app_dir, self.fingerprint, now)
+        self.result_dict['second'] = False
+        self.result_dict['third'] = OSError("ConfigService is gone")
+
+        #launched on trust, corrupted app is reported once verified in background
+        self.assertTrue(scheduler.wait('addin', 'second'))
+        scheduler.start()
+        deadline = time.monotonic() + 5
+        while scheduler.verify_count < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertListEqual(['first', 'second', 'third'], self.verified_list)
+        self.assertTrue(scheduler.get_result('addin', 'first'))
+        self.assertFalse(scheduler.get_result('addin', 'second'))
+        self.assertListEqual(['second'], self.corrupted_list)
+        #background failure doesn't block app
+        self.assertIsNone(scheduler.get_result('addin', 'third'))
+
+    def test_priority(self):
+        #waited app is verified before background ones
+        scheduler = self.new_scheduler(start_delay=0)
+        for app_name in ('first', 'second', 'third'):
+            scheduler.add_app('addin', app_name)
+        self.release.clear()
+        scheduler.start()
+        result_list = list()
+        thread = threading.Thread(target=lambda: result_list.append(scheduler.wait('addin', 'third')))
+        thread.start()
+        time.sleep(0.05)
+        self.release.set()
+        thread.join(5)
+        self.assertListEqual([True], result_list)
+        #at most one background verification ran before
+        self.assertIn(self.verified_list.index('third'), (0, 1))
+
+        #unreachable verification blocks waited app
+        self.result_dict['fourth'] = OSError("ConfigService is gone")
+        self.assertFalse(scheduler.wait('addin', 'fourth'))
+
+        #not started scheduler verifies in caller thread
+        scheduler.stop()
+        self.assertTrue(self.new_scheduler().wait('addin', 'fifth'))
+        self.assertEqual('fifth', self.verified_list[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
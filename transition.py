@@ -168,6 +168,10 @@ if __name__ == '__main__':
         group.add_argument("--unregister", help="unregisters register Transition Excel Add-in in debug mode.",
                            action="store_true")
 
+        parser.add_argument("--stats", help="""prints configuration calls and SQL statements statistics once
+                                          command is done.""",
+                            action="store_true")
+
         #create sub-parser
         subparsers = parser.add_subparsers(title="subcommands", description="valid subcommands", dest="subcommand")
 
@@ -203,6 +207,40 @@ if __name__ == '__main__':
                                 help="specify optionally for which com app disable given app.")
         parse_disable.set_defaults(func=config.disable_app)
 
+        # create parser for the 'manifest' command
+        parse_manifest = subparsers.add_parser('manifest',
+                                               help="""writes Manifest file of given app, or of all apps found in
+                                               application type directories with --all. Apps are hashed in parallel
+                                               processes. Exits with status 1 if a Manifest can't be written.""")
+        parse_manifest.add_argument('--all', action="store_true",
+                                    help="writes Manifest files of all apps.")
+        parse_manifest.add_argument('--processes', type=int,
+                                    help="number of worker processes. Cpu count per default.")
+        parse_manifest.add_argument('app_type', nargs="?", choices=list(config.app_type_list),
+                                    help="application type of app to sign.")
+        parse_manifest.add_argument('app_name', nargs="?",
+                                    help="application name to sign.")
+        parse_manifest.set_defaults(func=config.write_app_manifests)
+
+        # create parser for the 'verify' command
+        parse_verify = subparsers.add_parser('verify',
+                                             help="""verifies enabled apps files against their Manifest, or all apps
+                                             found in application type directories with --all. Apps are hashed in
+                                             parallel processes. Exits with status 1 on mismatch.""")
+        parse_verify.add_argument('--all', action="store_true",
+                                  help="verifies all apps.")
+        parse_verify.add_argument('--processes', type=int,
+                                  help="number of worker processes. Cpu count per default.")
+        parse_verify.set_defaults(func=config.verify_app_manifests)
+
+        # create parser for the 'stats' command
+        parse_stats = subparsers.add_parser('stats',
+                                            help="""prints configuration statistics of running config service.
+                                            Service records them when enabled, or launched with TRANSITION_STATS
+                                            environment variable set.""")
+        parse_stats.add_argument('action', nargs="?", default='show', choices=('show', 'enable', 'disable', 'reset'),
+                                 help="show (default), enable, disable or reset config service statistics.")
+
         #TODO search for app
 
         #TODO status (registered/unregistered) for com app or all
@@ -210,10 +248,49 @@ if __name__ == '__main__':
         #TODO unregister on com_app or on all
 
         args = parser.parse_args()
+        if args.stats:
+            config.enable_stats()
+
+        exit_status = 0
+
         if args.subcommand == 'list':
             args.func(args.app_type)
         elif args.subcommand in ('enable', 'disable'):
             args.func(args.app_type[0], args.app_name[0], args.com_app)
+        elif args.subcommand in ('manifest', 'verify'):
+            app_list = None
+            if args.subcommand == 'manifest':
+                if args.all == (args.app_name is not None):
+                    parse_manifest.error("give either --all or app_type and app_name")
+                if not args.all:
+                    app_list = [(args.app_type, args.app_name)]
+            elif not args.all:
+                _, app_status_tuple = config.get_app_status_matrix()
+                app_list = [(app_type, app_name) for app_type, app_name, available, enabled in app_status_tuple
+                            if available & enabled]
+            if config.print_manifest_results(args.func(app_list, args.processes)) > 0:
+                exit_status = 1
+        elif args.subcommand == 'stats':
+            import rpyc
+            from transitioncore.configstats import ConfigurationStats
+            try:
+                config_service = rpyc.connect("localhost", port=22).root
+            except ConnectionRefusedError:
+                print("Config service is not running")
+            else:
+                if args.action == 'show':
+                    stats = config_service.get_stats()
+                    if stats is None:
+                        print("Config service stats are disabled. Enable them with 'stats enable'.")
+                    else:
+                        print(ConfigurationStats.format_stats(stats))
+                else:
+                    getattr(config_service, args.action + "_stats")()
+
+        if args.stats:
+            config.print_stats()
+        if exit_status != 0:
+            sys.exit(exit_status)
         # if args.unregister:
         #     TransitionKernel.transition_unregister(TransitionCOMEventsListener)
         # else:
@@ -50,6 +50,9 @@ class AppManager():
 
     com_app_event_class = {"excel": AppManagerExcelEventListener, }
 
+    # app types launched by AppManager. Known without asking ConfigService.
+    app_type_dict = {"app": "docapp", "addin": "addin"}
+
     def __init__(self, kernel):
         """
         Set up Application Manager.
@@ -65,11 +68,9 @@ class AppManager():
             # Retrieve stuff relative to COM Application
             self.com_app_events = self.com_app_event_class[self._kernel.com_app_type]
 
-            self.app_list["app"] = self._kernel.config.get_enabled_app_list(
-                self._kernel.config.transition_app_type_tree[self._kernel.com_app_type]["app"])
+            self.app_list["app"] = self._kernel.get_enabled_app_list(self.app_type_dict["app"])
 
-            self.app_list["addin"] = self._kernel.config.get_enabled_app_list(
-                self._kernel.config.transition_app_type_tree[self._kernel.com_app_type]["addin"])
+            self.app_list["addin"] = self._kernel.get_enabled_app_list(self.app_type_dict["addin"])
 
     def run_app(self, app_type, app_name, document=None):
         """
@@ -81,10 +82,15 @@ class AppManager():
         #TODO make it works for document apps
         #TODO generate pycache before launching app. https://docs.python.org/3/library/compileall.html#module-compileall
 
-        print("AppManager.run_app({}, {})".format(app_type.value, app_name))
+        print("AppManager.run_app({}, {})".format(app_type, app_name))
+        # only this app is waited for, others are verified in background
+        if not self._kernel.wait_app_verified(app_type, app_name):
+            print("AppManager.run_app() : {}.{} failed verification, it is not launched".format(app_type, app_name))
+            return
+
         # Import app module
         try:
-            excel_addin_module = inspect.importlib.import_module("{}.{}".format(app_type.value, app_name))
+            excel_addin_module = inspect.importlib.import_module("{}.{}".format(app_type, app_name))
 
             if document is None:
                 # Init addin
@@ -134,7 +140,7 @@ class AppManager():
         if self.com_app_events is not None:
             #launch COM App Addins
             for addin in self.app_list["addin"]:
-                self.run_app(self._kernel.config.transition_app_type_tree[self._kernel.com_app_type]["addin"], addin)
+                self.run_app(self.app_type_dict["addin"], addin)
 
             #TODO See for already opened documents. Are they handled ?
 
@@ -148,7 +154,7 @@ class AppManager():
     def terminate(self):
         import copy
         print("AppManager : terminating...")
-        app_type = self._kernel.config.transition_app_type_tree[self._kernel.com_app_type]["addin"]
+        app_type = self.app_type_dict["addin"]
         if app_type in self.started_app_dict.keys():
             addin_dict = copy.copy(self.started_app_dict[app_type])
             for addin in addin_dict.keys():
@@ -0,0 +1,226 @@
+# ------------------------------------------------------------------------------
+# Name:        appmetadata
+# Purpose:     Read app metadata from its package source, without importing it
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import ast
+import os
+import re
+import tokenize
+import importlib
+import importlib.util
+
+
+class AppMetadata():
+    """
+    Static app metadata extraction.
+
+    App package __init__.py is read with tokenize (encoding, BOM) and parsed with ast. Nothing is executed :
+        * description : top comments of the package, as inspect.getcomments() gives them
+        * author, version : "Author:" and "Version:" fields of description
+        * com_app, app_type : module level literals
+        * app_class : name of the class assigned to app_class
+    Importing the package is only an opt-in fallback, when com_app can't be read statically.
+    """
+
+    @staticmethod
+    def find_app_path(app_type, app_name):
+        """
+        Find app package directory without importing app_type package
+        :param app_type: app type (top level package)
+        :param app_name: app name (sub-package)
+        :return: app path or None if not found
+        """
+        try:
+            spec = importlib.util.find_spec(app_type)
+        except (ImportError, ValueError):
+            spec = None
+
+        if spec is None or spec.submodule_search_locations is None:
+            return None
+
+        for location in spec.submodule_search_locations:
+            app_path = location + "\\" + app_name
+            if os.path.exists(app_path + "\\__init__.py"):
+                return app_path
+
+        return None
+
+    @staticmethod
+    def get_comments(line_list):
+        """
+        Top comments block of module source. Same result as inspect.getcomments(module).
+        :param line_list: source lines
+        :return: comments or None if there is no comment block
+        """
+        start = 0
+        if line_list and line_list[0][:2] == '#!':
+            start = 1
+        while start < len(line_list) and line_list[start].strip() in ('', '#'):
+            start += 1
+
+        if start < len(line_list) and line_list[start][:1] == '#':
+            comment_list = list()
+            end = start
+            while end < len(line_list) and line_list[end][:1] == '#':
+                comment_list.append(line_list[end].expandtabs())
+                end += 1
+            return ''.join(comment_list)
+
+        return None
+
+    @staticmethod
+    def parse_description(desc):
+        """Extract author and version from app_description
+        :param desc: application description
+        :return: author, version
+        """
+        author = ''
+        version = ''
+
+        if isinstance(desc, str):
+            matches = re.finditer("Author:\s+(.+)+\n", desc, re.M)
+            for m in matches:
+                if m is not None:
+                    if author == '':
+                        author = m.group(1)
+                    else:
+                        author += '\n' + m.group(1)
+
+            m = re.search("Version:\s+(.+)\n", desc)
+            if m is not None:
+                version = m.group(1)
+
+        return author, version
+
+    @staticmethod
+    def _literal(node, expected_type):
+        try:
+            value = ast.literal_eval(node)
+        except (ValueError, TypeError, SyntaxError):
+            return None
+
+        if expected_type is tuple:
+            if isinstance(value, (tuple, list)) and all(isinstance(item, str) for item in value):
+                return tuple(value)
+            return None
+
+        if isinstance(value, expected_type):
+            return value
+
+        return None
+
+    @staticmethod
+    def _class_name(node):
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            owner = AppMetadata._class_name(node.value)
+            if owner is not None:
+                return owner + '.' + node.attr
+        return None
+
+    @staticmethod
+    def _read_assignments(tree, metadata):
+        for node in tree.body:
+            if not isinstance(node, ast.Assign):
+                continue
+            for target in node.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == 'com_app':
+                    metadata['com_app'] = AppMetadata._literal(node.value, tuple)
+                elif target.id == 'app_type':
+                    metadata['app_type'] = AppMetadata._literal(node.value, str)
+                elif target.id == 'app_class':
+                    metadata['app_class'] = AppMetadata._class_name(node.value)
+
+    @staticmethod
+    def _import_fallback(app_type, app_name, metadata):
+        print("AppMetadata.extract() : importing {}.{} to read its metadata".format(app_type, app_name))
+        try:
+            module = importlib.import_module("{}.{}".format(app_type, app_name))
+        except Exception as e:
+            print("AppMetadata.extract() : ERROR : can't import {}.{} : {}".format(app_type, app_name, repr(e)))
+            return False
+
+        com_app = getattr(module, 'com_app', None)
+        if isinstance(com_app, (tuple, list)):
+            metadata['com_app'] = tuple(com_app)
+        if isinstance(getattr(module, 'app_type', None), str):
+            metadata['app_type'] = module.app_type
+        app_class = getattr(module, 'app_class', None)
+        if app_class is not None:
+            metadata['app_class'] = getattr(app_class, '__name__', None)
+
+        return True
+
+    @staticmethod
+    def extract(app_type, app_name, app_path=None, allow_import=False):
+        """
+        Read app metadata from its package source
+        :param app_type: app type
+        :param app_name: app name
+        :param app_path: application path. Searched from app_type package if None.
+        :param allow_import: import app package when its source can't be parsed or com_app isn't a literal
+        :return: dict {description, author, version, com_app, app_type, app_class} or None if package can't be
+        read. com_app, app_type and app_class are None when not found.
+        """
+        if app_path is None:
+            app_path = AppMetadata.find_app_path(app_type, app_name)
+            if app_path is None:
+                return None
+
+        init_file = app_path + "\\__init__.py"
+        try:
+            with tokenize.open(init_file) as f:
+                source = f.read()
+        except (IOError, SyntaxError, UnicodeDecodeError) as e:
+            # tokenize raises SyntaxError on invalid encoding declaration
+            print("AppMetadata.extract() : ERROR : can't read {} : {}".format(init_file, repr(e)))
+            return None
+
+        description = AppMetadata.get_comments(source.splitlines(True))
+        author, version = AppMetadata.parse_description(description)
+        metadata = {'description': description,
+                    'author': author,
+                    'version': version,
+                    'com_app': None,
+                    'app_type': None,
+                    'app_class': None}
+
+        try:
+            tree = ast.parse(source, init_file)
+        except SyntaxError as se:
+            print("AppMetadata.extract() : ERROR : {}.{} is not registerable".format(app_type, app_name))
+            print("AppMetadata.extract() :", se.msg, se.filename, se.lineno, se.text)
+            if allow_import and AppMetadata._import_fallback(app_type, app_name, metadata):
+                return metadata
+            return None
+
+        AppMetadata._read_assignments(tree, metadata)
+        if metadata['com_app'] is None and allow_import:
+            AppMetadata._import_fallback(app_type, app_name, metadata)
+
+        return metadata
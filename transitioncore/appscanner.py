@@ -0,0 +1,207 @@
+# ------------------------------------------------------------------------------
+# Name:        appscanner
+# Purpose:     Hash apps and extract their metadata in a process pool
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from transitioncore.manifest import Manifest, MANIFEST_FILE
+from transitioncore.appmetadata import AppMetadata
+
+
+def scan_app(app_type, app_name, app_path, file_cache=None, stored_digests=None):
+    """
+    Hash one app and read its metadata. Runs in a worker process : no db access, no event, app code is not
+    executed (see AppMetadata).
+    :param app_type: app type
+    :param app_name: app name
+    :param app_path: application path
+    :param file_cache: detached FileDigestCache of app (see FileDigestCache.detach())
+    :param stored_digests: app digests stored in db. Metadata are not read when app digests still match.
+    :return: dict {app_type, app_name, path, digests, hash_time, manifest_status, metadata, file_cache}.
+    manifest_status is None without Manifest, metadata is None if app is unchanged or if it can't be read.
+    """
+    # imported here : configuration imports this module
+    from transitioncore.configuration import Configuration
+    from transitioncore.verificationsession import VerificationSession
+
+    scan = {'app_type': app_type,
+            'app_name': app_name,
+            'path': app_path,
+            'digests': None,
+            'hash_time': 0.0,
+            'manifest_status': None,
+            'metadata': None,
+            'file_cache': file_cache}
+
+    with VerificationSession(file_cache) as session:
+        start = time.perf_counter()
+        if os.path.exists(app_path + "\\" + MANIFEST_FILE):
+            scan['manifest_status'], _ = Configuration._verify_manifest_digests(app_path, file_cache, session)
+        scan['digests'] = Configuration._generate_app_digests(app_path, file_cache=file_cache, session=session)
+        scan['hash_time'] = time.perf_counter() - start
+
+    if scan['digests'] is not None and scan['digests'] != stored_digests:
+        metadata = AppMetadata.extract(app_type, app_name, app_path, Configuration.import_fallback)
+        if metadata is not None and metadata['com_app'] is not None:
+            scan['metadata'] = metadata
+
+    return scan
+
+
+def write_manifest(app_type, app_name, app_path):
+    """
+    Hash app files and write its Manifest. Runs in a worker process. Files are hashed from disk, without cache.
+    :param app_type: app type
+    :param app_name: app name
+    :param app_path: application path
+    :return: dict {app_type, app_name, path, digests, file_count, time, error}. digests is None and error holds a
+    message if Manifest can't be written.
+    """
+    result = {'app_type': app_type,
+              'app_name': app_name,
+              'path': app_path,
+              'digests': None,
+              'file_count': 0,
+              'time': 0.0,
+              'error': None}
+
+    start = time.perf_counter()
+    try:
+        # apps are spread across processes, files of one app are hashed by one of them
+        manifest = Manifest.from_path(app_path, workers=1)
+        if len(manifest.entries) == 0:
+            result['error'] = "no files found"
+        else:
+            manifest.write(app_path)
+            result['digests'] = manifest.digests
+            result['file_count'] = len(manifest.entries)
+    except Exception as e:
+        result['error'] = repr(e)
+    result['time'] = time.perf_counter() - start
+
+    return result
+
+
+def verify_manifest(app_type, app_name, app_path):
+    """
+    Verify app files against its Manifest. Runs in a worker process. Files are hashed from disk, without cache.
+    :param app_type: app type
+    :param app_name: app name
+    :param app_path: application path
+    :return: dict {app_type, app_name, path, failure_list, time, error}. failure_list is a list of (relative path,
+    'changed'|'missing'|'added'), empty when app matches its Manifest, None if app has no Manifest or if Manifest
+    can't be read (see error).
+    """
+    result = {'app_type': app_type,
+              'app_name': app_name,
+              'path': app_path,
+              'failure_list': None,
+              'time': 0.0,
+              'error': None}
+
+    start = time.perf_counter()
+    if os.path.exists(app_path + "\\" + MANIFEST_FILE):
+        try:
+            _, result['failure_list'] = Manifest.read(app_path).verify(app_path, workers=1)
+        except Exception as e:
+            result['error'] = repr(e)
+    result['time'] = time.perf_counter() - start
+
+    return result
+
+
+class AppScanner():
+    """
+    Spread app hashing and metadata extraction across a process pool.
+
+    Results are handed back in submission order to the caller, which stays the single db writer :
+        scanner = AppScanner(processes)
+        for scan in scanner.scan(app_list, file_cache):
+            ...
+
+    run() hands results back as soon as each app is done, to stream bulk commands progress :
+        for result in scanner.run(verify_manifest, app_list):
+            ...
+    """
+
+    def __init__(self, processes=None):
+        """
+        :param processes: number of worker processes. Cpu count if None.
+        """
+        self.processes = processes or os.cpu_count() or 1
+
+    def scan(self, app_list, file_cache=None):
+        """
+        Scan apps in worker processes.
+        :param app_list: list of (app_type, app_name, app_path, stored digests or None)
+        :param file_cache: optional FileDigestCache. Detached for each app, changes are written back here.
+        :return: list of scan dict (see scan_app()), in app_list order. Apps whose scan failed are missing.
+        """
+        scan_list = list()
+        if len(app_list) == 0:
+            return scan_list
+
+        with ProcessPoolExecutor(max_workers=min(self.processes, len(app_list))) as executor:
+            future_list = list()
+            for app_type, app_name, app_path, stored_digests in app_list:
+                detached = file_cache.detach(app_path) if file_cache is not None else None
+                future_list.append(executor.submit(scan_app, app_type, app_name, app_path, detached, stored_digests))
+
+            for (app_type, app_name, _, _), future in zip(app_list, future_list):
+                try:
+                    scan = future.result()
+                except Exception as e:
+                    print("AppScanner.scan() : ERROR : can't scan {}.{} : {}".format(app_type, app_name, repr(e)))
+                    continue
+
+                if file_cache is not None and scan['file_cache'] is not None:
+                    file_cache.attach(scan['file_cache'])
+                scan_list.append(scan)
+
+        return scan_list
+
+    def run(self, func, app_list):
+        """
+        Call func on apps in worker processes. Results are handed back as soon as each app is done, fastest first.
+        :param func: module level function(app_type, app_name, app_path) returning a dict, eg. write_manifest() or
+        verify_manifest()
+        :param app_list: list of (app_type, app_name, app_path)
+        :return: generator of func results. An app whose worker failed gives {app_type, app_name, path, error}.
+        """
+        if len(app_list) == 0:
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.processes, len(app_list))) as executor:
+            future_dict = {executor.submit(func, app_type, app_name, app_path): (app_type, app_name, app_path)
+                           for app_type, app_name, app_path in app_list}
+
+            for future in as_completed(future_dict):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    app_type, app_name, app_path = future_dict[future]
+                    yield {'app_type': app_type, 'app_name': app_name, 'path': app_path, 'error': repr(e)}
@@ -0,0 +1,396 @@
+# ------------------------------------------------------------------------------
+# Name:        appwatcher
+# Purpose:     Watch app type directories and refresh changed apps
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from transitioncore.digestengine import DigestEngine, EXCLUDED_DIRS
+
+# seconds without event before a changed app is refreshed
+DEBOUNCE_DELAY = 1.0
+# seconds after first event an app is refreshed, even if events keep coming
+MAX_DELAY = 10.0
+# seconds between two polls of PollingSource
+POLL_INTERVAL = 2.0
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+IN_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                 IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+# changes list meaning "anything may have changed"
+RESCAN = None
+
+
+class PollingSource():
+    """
+    Portable change source : app directories fingerprints (see DigestEngine.fingerprint()) are compared every
+    interval seconds.
+    """
+
+    def __init__(self, app_type_dict, interval=POLL_INTERVAL):
+        """
+        :param app_type_dict: dict {app_type: app type path}
+        :param interval: seconds between two polls
+        """
+        self._app_type_dict = app_type_dict
+        self._interval = interval
+        self._fingerprint_dict = dict()
+        self._next_poll = 0.0
+
+    def _poll(self):
+        """
+        :return: dict {(app_type, app_name): fingerprint} of app type sub-directories
+        """
+        fingerprint_dict = dict()
+        for app_type, app_type_path in self._app_type_dict.items():
+            try:
+                for name in os.listdir(app_type_path):
+                    path = os.path.join(app_type_path, name)
+                    if name not in EXCLUDED_DIRS and os.path.isdir(path):
+                        # files written just now are seen too : no racy delay
+                        fingerprint_dict[(app_type, name)] = DigestEngine.fingerprint(path, 0)
+            except OSError:
+                pass
+
+        return fingerprint_dict
+
+    def start(self):
+        self._fingerprint_dict = self._poll()
+        self._next_poll = time.monotonic() + self._interval
+
+    def wait(self, timeout):
+        """
+        Wait for changes
+        :param timeout: seconds
+        :return: list of changed (app_type, app_name), maybe empty
+        """
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return list()
+        if delay > 0:
+            time.sleep(delay)
+
+        fingerprint_dict = self._poll()
+        self._next_poll = time.monotonic() + self._interval
+        change_list = [key for key in set(fingerprint_dict.keys()).union(self._fingerprint_dict.keys())
+                       if fingerprint_dict.get(key) != self._fingerprint_dict.get(key)]
+        self._fingerprint_dict = fingerprint_dict
+        return change_list
+
+    def close(self):
+        pass
+
+
+class InotifySource():
+    """
+    Linux change source : app type directories and their sub-directories are watched with inotify(7). Events tell
+    which app changed at once, nothing is polled.
+    """
+
+    _libc = None
+
+    @staticmethod
+    def _get_libc():
+        if InotifySource._libc is None:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1.argtypes = (ctypes.c_int, )
+            libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+            InotifySource._libc = libc
+
+        return InotifySource._libc
+
+    @staticmethod
+    def available():
+        """
+        :return: True if inotify can be used
+        """
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            return hasattr(InotifySource._get_libc(), 'inotify_init1')
+        except OSError:
+            return False
+
+    def __init__(self, app_type_dict):
+        """
+        :param app_type_dict: dict {app_type: app type path}
+        """
+        self._app_type_dict = app_type_dict
+        self._fd = None
+        # watch descriptor : (app_type, app_name or None for app type directory)
+        self._watch_dict = dict()
+
+    def _add_watch(self, path, app_type, app_name):
+        """
+        Watch path and its sub-directories
+        :param path: directory
+        :param app_type: app type
+        :param app_name: app of path, None for app type directory
+        """
+        wd = self._get_libc().inotify_add_watch(self._fd, os.fsencode(path), IN_WATCH_MASK)
+        if wd < 0:
+            # removed meanwhile, or watches limit reached
+            print("InotifySource : can't watch {} : {}".format(path, os.strerror(ctypes.get_errno())))
+            return
+        self._watch_dict[wd] = (app_type, app_name, path)
+
+        try:
+            for name in os.listdir(path):
+                sub_path = os.path.join(path, name)
+                if name not in EXCLUDED_DIRS and os.path.isdir(sub_path) and not os.path.islink(sub_path):
+                    self._add_watch(sub_path, app_type, app_name or name)
+        except OSError:
+            pass
+
+    def start(self):
+        self._fd = self._get_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        for app_type, app_type_path in self._app_type_dict.items():
+            self._add_watch(app_type_path, app_type, None)
+
+    def wait(self, timeout):
+        """
+        Wait for changes
+        :param timeout: seconds
+        :return: list of changed (app_type, app_name), maybe empty. RESCAN if events were lost.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if len(readable) == 0:
+            return list()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return list()
+
+        change_list = list()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0'))
+            offset += INOTIFY_EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return RESCAN
+            if wd not in self._watch_dict:
+                continue
+            app_type, app_name, path = self._watch_dict[wd]
+            if mask & IN_IGNORED:
+                # directory removed
+                del self._watch_dict[wd]
+                continue
+            if name in EXCLUDED_DIRS:
+                continue
+
+            if app_name is None:
+                # app type directory : only packages are apps
+                if not mask & IN_ISDIR:
+                    continue
+                app_name = name
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch(os.path.join(path, name), app_type, app_name)
+            if (app_type, app_name) not in change_list:
+                change_list.append((app_type, app_name))
+
+        return change_list
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watch_dict = dict()
+
+
+class AppWatcher():
+    """
+    Watch app type directories in a thread, and refresh changed apps only (see Configuration.refresh_app()) :
+    new packages are added, changed ones updated (or disabled when corrupted), removed ones deleted.
+    Configuration fires on_app_* events to its listeners.
+
+    Changes are read from InotifySource on Linux, PollingSource elsewhere. Events are debounced per app : an app is
+    refreshed debounce seconds after its last change, or max_delay seconds after its first one. Refresh latency is
+    bounded by max_delay, plus poll interval with PollingSource.
+
+        watcher = AppWatcher(config)
+        watcher.start()
+        ...
+        watcher.stop()
+    """
+
+    def __init__(self, config, app_type_list=None, debounce=DEBOUNCE_DELAY, max_delay=MAX_DELAY,
+                 poll_interval=POLL_INTERVAL, polling=None, initial_inventory=True):
+        """
+        :param config: Configuration
+        :param app_type_list: app types to watch, Configuration.app_type_list if None
+        :param debounce: seconds without change before an app is refreshed
+        :param max_delay: seconds after first change an app is refreshed at last
+        :param poll_interval: PollingSource interval
+        :param polling: True to use PollingSource, False to use InotifySource. Inotify when available if None.
+        :param initial_inventory: run update_inventory() once watching, to catch changes made while not running
+        """
+        self._config = config
+        self._app_type_list = app_type_list or config.app_type_list
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._poll_interval = poll_interval
+        self._polling = polling
+        self._initial_inventory = initial_inventory
+
+        self._stop_event = threading.Event()
+        self._started_event = threading.Event()
+        self._thread = None
+        # (app_type, app_name) : [first change time, last change time]
+        self._pending_dict = dict()
+        self.refresh_count = 0
+
+    def _new_source(self):
+        app_type_dict = dict()
+        for app_type in self._app_type_list:
+            app_type_path = self._config.get_app_type_path(app_type)
+            if app_type_path is not None:
+                app_type_dict[app_type] = app_type_path
+
+        polling = self._polling
+        if polling is None:
+            polling = not InotifySource.available()
+        if polling:
+            return PollingSource(app_type_dict, self._poll_interval)
+
+        return InotifySource(app_type_dict)
+
+    def start(self):
+        """
+        Launch watcher thread. Returns once directories are watched.
+        """
+        self._stop_event.clear()
+        self._started_event.clear()
+        self._thread = threading.Thread(target=self._run, name="AppWatcher", daemon=True)
+        self._thread.start()
+        self._started_event.wait()
+
+    def stop(self):
+        """
+        Stop watcher thread. Pending changes are dropped.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _add_changes(self, change_list, now):
+        for key in change_list:
+            if key in self._pending_dict:
+                self._pending_dict[key][1] = now
+            else:
+                self._pending_dict[key] = [now, now]
+
+    def _get_due_list(self, now):
+        """
+        :return: pending apps to refresh now
+        """
+        due_list = [key for key, (first, last) in self._pending_dict.items()
+                    if now - last >= self._debounce or now - first >= self._max_delay]
+        for key in due_list:
+            del self._pending_dict[key]
+
+        return due_list
+
+    def _refresh(self, app_type, app_name):
+        try:
+            self._config.refresh_app(app_type, app_name)
+            self.refresh_count += 1
+        except Exception as e:
+            # watcher must survive a broken app
+            print("AppWatcher : ERROR : can't refresh {}.{} : {}".format(app_type, app_name, repr(e)))
+
+    def _update_inventory(self):
+        for app_type in self._app_type_list:
+            try:
+                self._config.update_inventory(app_type)
+            except Exception as e:
+                # watcher must survive a failed inventory, next changes are still refreshed
+                print("AppWatcher : ERROR : can't update {} inventory : {}".format(app_type, repr(e)))
+
+    def _run(self):
+        source = self._new_source()
+        try:
+            source.start()
+        finally:
+            self._started_event.set()
+
+        try:
+            if self._initial_inventory:
+                self._update_inventory()
+
+            while not self._stop_event.is_set():
+                timeout = self._debounce
+                if len(self._pending_dict) > 0:
+                    now = time.monotonic()
+                    timeout = min(max(0.0, min(last + self._debounce - now, first + self._max_delay - now))
+                                  for first, last in self._pending_dict.values())
+                change_list = source.wait(min(timeout, self._debounce))
+
+                if change_list is RESCAN:
+                    print("AppWatcher : events were lost, updating inventory")
+                    self._pending_dict = dict()
+                    self._update_inventory()
+                    continue
+
+                now = time.monotonic()
+                self._add_changes(change_list, now)
+                for app_type, app_name in self._get_due_list(now):
+                    self._refresh(app_type, app_name)
+        finally:
+            source.close()
+            # one connection per thread
+            self._config._connection_manager.close()
@@ -0,0 +1,213 @@
+# ------------------------------------------------------------------------------
+# Name:        configmodel
+# Purpose:     In-memory copy of configuration tables
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+from transitioncore.configsql import SQL_SELECT_ALL_APP_TYPE, SQL_SELECT_ALL_COM_APP, SQL_SELECT_ALL_APP, \
+    SQL_SELECT_APP_WORKS_WITH_COM_APP, SQL_PRAGMA_DATA_VERSION
+
+
+class ConfigurationModel():
+    """
+    In-memory copy of configuration tables : app types, com apps, apps and app/com_app status.
+
+    load() reads tables in a few queries, then reads are dict lookups. App/com_app status is a matrix of
+    bitmasks : each app gets an available mask (com apps it works with) and an enabled mask, where bit i stands for
+    i-th com_app of com_app_list. A model belongs to the connection which
+    loaded it. It is outdated when :
+        * Configuration generation changed : a write was made by this process
+        * PRAGMA data_version of its connection changed : another connection committed (transition.py
+        command line, another thread)
+        * total_changes of its connection changed : rows were written with this connection outside of
+        Configuration write methods
+    """
+
+    def __init__(self, cnx=None, generation=None, data_version=None):
+        """
+        :param cnx: connection used to load model
+        :param generation: Configuration generation when model was loaded
+        :param data_version: connection data_version when model was loaded
+        """
+        self.cnx = cnx
+        self.generation = generation
+        self.data_version = data_version
+        self.total_changes = None if cnx is None else cnx.total_changes
+
+        # app_type name : (id, path)
+        self.app_type_dict = dict()
+        # com_app short_name : id, in com_app table order
+        self.com_app_dict = dict()
+        self.com_app_list = list()
+        # com_app short_name : com_app bit
+        self.com_app_bit_dict = dict()
+        # (app_type, app_name) : id
+        self.app_dict = dict()
+        # app_type : app names, in app table order
+        self.available_app_dict = dict()
+        # (app_type, app_name) : [available mask, enabled mask]
+        self.app_mask_dict = dict()
+
+    @staticmethod
+    def get_data_version(cnx):
+        """
+        :param cnx: sqlite3 connection
+        :return: data_version of connection
+        """
+        return cnx.execute(SQL_PRAGMA_DATA_VERSION).fetchone()[0]
+
+    @staticmethod
+    def load(cnx, generation):
+        """
+        Read configuration tables
+        :param cnx: sqlite3 connection
+        :param generation: actual Configuration generation
+        :return: ConfigurationModel
+        """
+        # taken first, changes made while loading are seen on next is_current()
+        model = ConfigurationModel(cnx, generation, ConfigurationModel.get_data_version(cnx))
+
+        for row in cnx.execute(SQL_SELECT_ALL_APP_TYPE):
+            model.app_type_dict[row['name']] = (row['rowid'], row['path'])
+            model.available_app_dict[row['name']] = list()
+
+        for row in cnx.execute(SQL_SELECT_ALL_COM_APP):
+            model.com_app_dict[row['short_name']] = row['rowid']
+            model.com_app_bit_dict[row['short_name']] = 1 << len(model.com_app_list)
+            model.com_app_list.append(row['short_name'])
+
+        for row in cnx.execute(SQL_SELECT_ALL_APP):
+            model.app_dict[(row['app_type'], row['name'])] = row['rowid']
+            model.available_app_dict[row['app_type']].append(row['name'])
+            model.app_mask_dict[(row['app_type'], row['name'])] = [0, 0]
+
+        for row in cnx.execute(SQL_SELECT_APP_WORKS_WITH_COM_APP):
+            masks = model.app_mask_dict[(row['app_type'], row['app_name'])]
+            bit = model.com_app_bit_dict[row['com_app']]
+            masks[0] |= bit
+            if row['enabled']:
+                masks[1] |= bit
+
+        return model
+
+    def is_current(self, cnx, generation):
+        """
+        :param cnx: connection of current thread
+        :param generation: actual Configuration generation
+        :return: True if model can be used
+        """
+        return (cnx is self.cnx
+                and generation == self.generation
+                and cnx.total_changes == self.total_changes
+                and ConfigurationModel.get_data_version(cnx) == self.data_version)
+
+    def get_app_type_id(self, app_type):
+        """
+        :return: app_type id, -1 if app_type doesn't exist
+        """
+        return self.app_type_dict.get(app_type, (-1, None))[0]
+
+    def get_app_type_path(self, app_type):
+        """
+        :return: app_type path, None if app_type doesn't exist
+        """
+        return self.app_type_dict.get(app_type, (-1, None))[1]
+
+    def get_com_app_id(self, com_app):
+        """
+        :return: com_app id, -1 if com_app doesn't exist
+        """
+        return self.com_app_dict.get(com_app, -1)
+
+    def get_app_id(self, app_type, app_name):
+        """
+        :return: app id, -1 if app doesn't exist
+        """
+        return self.app_dict.get((app_type, app_name), -1)
+
+    def get_available_app_list(self, app_type):
+        """
+        :return: names of app_type apps
+        """
+        return list(self.available_app_dict.get(app_type, list()))
+
+    def get_com_app_mask(self, com_app_list):
+        """
+        :param com_app_list: com_app names. Unknown ones are ignored.
+        :return: mask of com_app_list
+        """
+        mask = 0
+        for com_app in com_app_list:
+            mask |= self.com_app_bit_dict.get(com_app, 0)
+
+        return mask
+
+    def get_com_app_list_from_mask(self, mask):
+        """
+        :param mask: com_app mask
+        :return: com_app names of mask, in com_app_list order
+        """
+        return [com_app for i, com_app in enumerate(self.com_app_list) if mask >> i & 1]
+
+    def get_app_masks(self, app_type, app_name):
+        """
+        :return: (available mask, enabled mask) of app. (0, 0) if app doesn't exist.
+        """
+        return tuple(self.app_mask_dict.get((app_type, app_name), (0, 0)))
+
+    def get_status_app_list(self, app_type, com_app, enabled):
+        """
+        :return: names of app_type apps enabled (or disabled) for com_app
+        """
+        bit = self.com_app_bit_dict.get(com_app, 0)
+        app_list = list()
+        for app_name in self.available_app_dict.get(app_type, list()):
+            available, enabled_mask = self.app_mask_dict[(app_type, app_name)]
+            if available & bit and bool(enabled_mask & bit) == bool(enabled):
+                app_list.append(app_name)
+
+        return app_list
+
+    def get_app_com_app_list(self, app_type, app_name, enabled=None):
+        """
+        :param enabled: None for all com_app app works with, True/False for com_app where app is enabled/disabled
+        :return: com_app names
+        """
+        available, enabled_mask = self.get_app_masks(app_type, app_name)
+        if enabled is None:
+            mask = available
+        elif enabled:
+            mask = enabled_mask
+        else:
+            mask = available & ~enabled_mask
+
+        return self.get_com_app_list_from_mask(mask)
+
+    def get_status_matrix(self):
+        """
+        Whole app/com_app status. Only made of tuples, ints and strings, so rpyc sends it by value.
+        :return: (com_app tuple, tuple of (app_type, app_name, available mask, enabled mask))
+        """
+        return (tuple(self.com_app_list),
+                tuple((app_type, app_name) + tuple(self.app_mask_dict[(app_type, app_name)])
+                      for app_type, app_name in self.app_dict.keys()))
@@ -0,0 +1,121 @@
+# ------------------------------------------------------------------------------
+# Name:        configrecords
+# Purpose:     Immutable records returned by Configuration
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+
+class Record():
+    """
+    Immutable record with __slots__ fields. Built from a plain tuple, in _fields order.
+
+    Fields are read as attributes (record.name) or as sqlite3.Row items (record['name'], record[1]), so
+    code written for sqlite3.Row keeps working. Records are picklable. to_tuple() gives a value rpyc brine can
+    send as is, from_tuple() builds record back on the other side.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self._fields):
+            raise TypeError("{} expects {} values, got {}".format(type(self).__name__, len(self._fields),
+                                                                  len(values)))
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                # same as sqlite3.Row
+                raise IndexError("No item with that key")
+            return getattr(self, key)
+
+        return getattr(self, self._fields[key])
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __iter__(self):
+        return iter(self.to_tuple())
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_tuple() == other.to_tuple()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={}".format(name, repr(getattr(self, name))) for name in self._fields))
+
+    def __reduce__(self):
+        return type(self), self.to_tuple()
+
+    def keys(self):
+        """
+        :return: field names, as sqlite3.Row.keys()
+        """
+        return list(self._fields)
+
+    def to_tuple(self):
+        """
+        :return: field values tuple
+        """
+        return tuple(getattr(self, name) for name in self._fields)
+
+    @classmethod
+    def from_tuple(cls, values):
+        """
+        :param values: field values, in _fields order
+        :return: record
+        """
+        return cls(*values)
+
+
+class AppRecord(Record):
+    """
+    app table record, with its app_type. Returned by Configuration.get_app_info() and get_app_info_by_path().
+    """
+
+    _fields = ('rowid', 'name', 'author', 'version', 'description', 'path', 'SHA256', 'SHA512', 'WHIRLPOOL',
+               'app_class', 'app_type', 'app_type_path')
+    __slots__ = _fields
+
+
+class AppComAppStatus(Record):
+    """
+    Status of an app in one com app. Returned by Configuration.get_app_list().
+    """
+
+    _fields = ('app_type', 'app_name', 'com_app', 'description', 'author', 'version', 'enabled')
+    __slots__ = _fields
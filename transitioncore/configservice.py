@@ -32,6 +32,7 @@ import rpyc
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 from transitioncore.configuration import Configuration
+from transitioncore.appwatcher import AppWatcher
 from transitioncore.eventdispatcher import TransitionEventDispatcher
 from transitioncore.eventsinterface.configeventinterface import ConfigEventsInterface
 
@@ -53,7 +54,6 @@ class ConfigService(rpyc.Service, ConfigEventsInterface, TransitionEventDispatch
 
     def on_disconnect(self):
         ConfigService._config.del_event_listener(self)
-        ConfigService._config = None
 
     def on_app_add(self, app_type, app_name):
         print('on_app_add')
@@ -71,15 +71,45 @@ class ConfigService(rpyc.Service, ConfigEventsInterface, TransitionEventDispatch
     def on_app_enable(self, app_type, app_name, com_app_tuple):
         print('on_app_enable')
 
+    def on_apps_enable(self, app_status_tuple):
+        print('on_apps_enable', len(app_status_tuple))
+
+    def on_apps_disable(self, app_status_tuple):
+        print('on_apps_disable', len(app_status_tuple))
+
     def add_event_listener(self, listener):
         pass
 
     def del_event_listener(self, listener):
         pass
 
+    @staticmethod
+    def _record_values(record):
+        """
+        Records are sent by value, as plain tuples brine can serialize. Client side, Record.from_tuple() builds them
+        back.
+        :param record: Record, list of Record or None
+        """
+        if record is None:
+            return None
+        if isinstance(record, list):
+            return tuple(item.to_tuple() for item in record)
+
+        return record.to_tuple()
+
     @staticmethod
     def exposed_get_app_list(app_type=None):
-        return ConfigService._config.get_app_list(app_type)
+        """
+        :return: tuple of AppComAppStatus values, None if there is no app
+        """
+        return ConfigService._record_values(ConfigService._config.get_app_list(app_type))
+
+    @staticmethod
+    def exposed_get_app_info(app_type, app_name):
+        """
+        :return: AppRecord values, None if app doesn't exist
+        """
+        return ConfigService._record_values(ConfigService._config.get_app_info(app_type, app_name))
 
     @staticmethod
     def exposed_disable_app(app_type, app_name):
@@ -89,9 +119,65 @@ class ConfigService(rpyc.Service, ConfigEventsInterface, TransitionEventDispatch
     def exposed_enable_app(app_type, app_name):
         return ConfigService._config.enable_app(app_type, app_name)
 
+    @staticmethod
+    def exposed_disable_apps(change_list):
+        return ConfigService._config.disable_apps(change_list)
+
+    @staticmethod
+    def exposed_enable_apps(change_list):
+        return ConfigService._config.enable_apps(change_list)
+
     @staticmethod
     def exposed_get_app_desc(app_type, app_name):
-        return ConfigService._config._get_app_desc(app_type, app_name)
+        metadata = ConfigService._config.get_app_metadata(app_type, app_name)
+        if metadata is None:
+            # not registered yet
+            return ConfigService._config._get_app_desc(app_type, app_name)
+
+        return metadata['description']
+
+    @staticmethod
+    def exposed_get_app_metadata(app_type, app_name):
+        return ConfigService._config.get_app_metadata(app_type, app_name)
+
+    @staticmethod
+    def exposed_get_app_status_matrix():
+        return ConfigService._config.get_app_status_matrix()
+
+    @staticmethod
+    def exposed_get_app_com_app_list(app_type, app_name, enabled=None):
+        return tuple(ConfigService._config.get_app_com_app_list(app_type, app_name, enabled))
+
+    @staticmethod
+    def exposed_get_startup_snapshot():
+        return ConfigService._config.get_startup_snapshot()
+
+    @staticmethod
+    def exposed_write_startup_snapshot():
+        return ConfigService._config.write_startup_snapshot()
+
+    @staticmethod
+    def exposed_enable_stats():
+        ConfigService._config.enable_stats()
+
+    @staticmethod
+    def exposed_disable_stats():
+        ConfigService._config.disable_stats()
+
+    @staticmethod
+    def exposed_reset_stats():
+        ConfigService._config.reset_stats()
+
+    @staticmethod
+    def exposed_get_stats():
+        """
+        :return: see ConfigurationStats.get_stats(), None if stats are disabled
+        """
+        return ConfigService._config.get_stats()
+
+    @staticmethod
+    def exposed_verify_app(app_type, app_name, com_app):
+        return ConfigService._config.verify_app(app_type, app_name, com_app)
 
     @staticmethod
     def exposed_get_disabled_app_list(app_type, com_app):
@@ -119,5 +205,15 @@ if __name__ == "__main__":
                                                             'import_custom_exceptions': True})
     print(repr(ts.service))
     config = Configuration()
+    if os.getenv("TRANSITION_STATS"):
+        config.enable_stats()
     ts.service.config(config)
-    ts.start()
+    # apps changed on disk are refreshed, connected kernels get on_app_* events
+    watcher = AppWatcher(config)
+    watcher.start()
+    try:
+        ts.start()
+    finally:
+        watcher.stop()
+        # worker threads connections
+        config.close()
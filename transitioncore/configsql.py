@@ -28,28 +28,68 @@
 #                       SQL CREATE STATEMENTS
 # ------------------------------------------------------------------------------
 
+"""
+Schema version 2. Tables are created in this order : app_type, com_app, app, app_works_with_com_app, file_digest.
+id columns are rowid aliases, so rowid based statements keep working. Selected rowid must be named
+"AS rowid", sqlite names it after its alias otherwise. Tables of older db are upgraded by schemamigration.py.
+"""
+
 """
 app table. Contains apps info.
 
 app signatures are inspired from gentoo portage ebuilds
 - see Lib/hashlib +  pysha3 for SHA 256 / 512
 - see whirlpool on pypi
+
+UNIQUE (id_app_type, name) index is used by SQL_SELECT_APP and SQL_SELECT_APP_ID
 """
 SQL_CREATE_APP = """
 CREATE TABLE app
 (
-    name TEXT,
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
     author TEXT,
     version TEXT,
     description TEXT,
     path TEXT,
-    id_app_type INT,
+    id_app_type INTEGER NOT NULL REFERENCES app_type (id),
     SHA256 VARCHAR(64),
     SHA512 VARCHAR(128),
-    WHIRLPOOL VARCHAR(128)
+    WHIRLPOOL VARCHAR(128),
+    app_class TEXT,
+    dir_fingerprint TEXT,
+    verified_at REAL,
+    UNIQUE (id_app_type, name)
 )
 """
 
+"""
+app_class column was added after first release. Existing db are altered on opening.
+"""
+SQL_ALTER_APP_ADD_APP_CLASS = """
+ALTER TABLE app ADD COLUMN app_class TEXT
+"""
+
+"""
+Directory fingerprint of app when inventory last checked it, see DigestEngine.fingerprint(). Added by schema
+version 3.
+"""
+SQL_ALTER_APP_ADD_DIR_FINGERPRINT = """
+ALTER TABLE app ADD COLUMN dir_fingerprint TEXT
+"""
+
+"""
+Time (seconds since epoch) of last app verification. Kernel trusts recently verified apps whose fingerprint didn't
+change, see verificationscheduler.py. Added by schema version 4.
+"""
+SQL_ALTER_APP_ADD_VERIFIED_AT = """
+ALTER TABLE app ADD COLUMN verified_at REAL
+"""
+
+SQL_PRAGMA_APP_COLUMNS = """
+PRAGMA table_info(app)
+"""
+
 """
 app_type table
 app_type.name :
@@ -60,6 +100,7 @@ app_type.path refers to package
 SQL_CREATE_APP_TYPE = """
 CREATE TABLE app_type
 (
+    id INTEGER PRIMARY KEY,
     name TEXT NOT NULL UNIQUE,
     path TEXT NOT NULL UNIQUE
 )
@@ -71,6 +112,7 @@ com_app table. Known com application inventory
 SQL_CREATE_COM_APP = """
 CREATE TABLE com_app
 (
+    id INTEGER PRIMARY KEY,
     short_name TEXT NOT NULL UNIQUE
 )
 """
@@ -79,13 +121,119 @@ CREATE TABLE com_app
 Link between Transition apps and Office COM Applications.
 enabled property is used to make available (or not)
 Transition app in considered Office COM Application
+UNIQUE (id_app, id_com_app) index is used by joins from app and by SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID
 """
 SQL_CREATE_APP_WORKS_WITH_COM_APP = """
 CREATE TABLE app_works_with_com_app
 (
-    id_app INT,
-    id_com_app INT,
-    enabled BOOL DEFAULT 0
+    id INTEGER PRIMARY KEY,
+    id_app INTEGER NOT NULL REFERENCES app (id) ON DELETE CASCADE,
+    id_com_app INTEGER NOT NULL REFERENCES com_app (id),
+    enabled BOOL NOT NULL DEFAULT 0,
+    UNIQUE (id_app, id_com_app)
+)
+"""
+
+"""
+Per-file digests cache. A file whose stat signature (size, mtime_ns, inode) is
+unchanged since last hash reuses its stored digests.
+Created on existing db too, so it must be "IF NOT EXISTS".
+"""
+SQL_CREATE_FILE_DIGEST = """
+CREATE TABLE IF NOT EXISTS file_digest
+(
+    path TEXT NOT NULL UNIQUE,
+    size INT,
+    mtime_ns INT,
+    inode INT,
+    SHA256 VARCHAR(64),
+    SHA512 VARCHAR(128),
+    WHIRLPOOL VARCHAR(128)
+)
+"""
+
+"""
+Indexes which are not created by UNIQUE constraints.
+app.path : SQL_SELECT_APP_BY_PATH
+app_works_with_com_app (id_com_app, enabled) : apps available in one com app
+"""
+SQL_CREATE_INDEX_APP_PATH = """
+CREATE INDEX IF NOT EXISTS app_path_idx ON app (path)
+"""
+
+SQL_CREATE_INDEX_APP_WORKS_WITH_COM_APP_STATUS = """
+CREATE INDEX IF NOT EXISTS app_works_with_com_app_status_idx ON app_works_with_com_app (id_com_app, enabled)
+"""
+
+"""
+Schema version is stored in db header. 0 for db created before versioning.
+"""
+SQL_GET_USER_VERSION = """
+PRAGMA user_version
+"""
+
+SQL_SET_USER_VERSION = """
+PRAGMA user_version = {:d}
+"""
+
+"""
+Any table. Tells an empty db from a db created before versioning, both have user_version 0.
+"""
+SQL_SELECT_ANY_TABLE = """
+SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1
+"""
+
+SQL_PRAGMA_FOREIGN_KEY_CHECK = """
+PRAGMA foreign_key_check
+"""
+
+"""
+Schema version 1 to 2 : tables are renamed, created again with constraints and filled back. Rows ids are kept.
+Duplicated apps and links are dropped (first one is kept), as are links and apps which refer to a missing row.
+"""
+SQL_MIGRATE_V2_RENAME_TABLE = """
+ALTER TABLE {0} RENAME TO {0}_v1
+"""
+
+SQL_MIGRATE_V2_DROP_TABLE = """
+DROP TABLE {0}_v1
+"""
+
+SQL_MIGRATE_V2_COPY_APP_TYPE = """
+INSERT OR IGNORE INTO app_type (id, name, path)
+SELECT rowid, name, path FROM app_type_v1
+"""
+
+SQL_MIGRATE_V2_COPY_COM_APP = """
+INSERT OR IGNORE INTO com_app (id, short_name)
+SELECT rowid, short_name FROM com_app_v1
+"""
+
+SQL_MIGRATE_V2_COPY_APP = """
+INSERT OR IGNORE INTO app (id, name, author, version, description, path, id_app_type, SHA256, SHA512, WHIRLPOOL,
+    app_class)
+SELECT rowid, name, author, version, description, path, id_app_type, SHA256, SHA512, WHIRLPOOL, app_class
+FROM app_v1
+WHERE name IS NOT NULL
+AND id_app_type IN (SELECT id FROM app_type)
+ORDER BY rowid
+"""
+
+SQL_MIGRATE_V2_COPY_APP_WORKS_WITH_COM_APP = """
+INSERT OR IGNORE INTO app_works_with_com_app (id, id_app, id_com_app, enabled)
+SELECT rowid, id_app, id_com_app, COALESCE(enabled, 0) FROM app_works_with_com_app_v1
+WHERE id_app IN (SELECT id FROM app)
+AND id_com_app IN (SELECT id FROM com_app)
+ORDER BY rowid
+"""
+
+"""
+Links whose status is changed by Configuration.enable_apps() / disable_apps(). Lives in connection temp store.
+"""
+SQL_CREATE_TEMP_APP_STATUS_CHANGE = """
+CREATE TEMP TABLE IF NOT EXISTS app_status_change
+(
+    id INTEGER PRIMARY KEY
 )
 """
 
@@ -94,19 +242,31 @@ CREATE TABLE app_works_with_com_app
 # ------------------------------------------------------------------------------
 
 SQL_INSERT_APP = """
-INSERT INTO app VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+INSERT INTO app (name, author, version, description, path, id_app_type, SHA256, SHA512, WHIRLPOOL, app_class)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """
 
 SQL_INSERT_APP_TYPE = """
-INSERT INTO app_type VALUES (?, ?)
+INSERT INTO app_type (name, path) VALUES (?, ?)
 """
 
 SQL_INSERT_COM_APP = """
-INSERT INTO com_app VALUES (?)
+INSERT INTO com_app (short_name) VALUES (?)
 """
 
+"""
+An app may declare the same com app twice
+"""
 SQL_INSERT_APP_WORKS_WITH_COM_APP = """
-INSERT INTO app_works_with_com_app VALUES (?, ?, ?)
+INSERT OR IGNORE INTO app_works_with_com_app (id_app, id_com_app, enabled) VALUES (?, ?, ?)
+"""
+
+SQL_INSERT_APP_STATUS_CHANGE = """
+INSERT OR IGNORE INTO temp.app_status_change (id) VALUES (?)
+"""
+
+SQL_REPLACE_FILE_DIGEST = """
+INSERT OR REPLACE INTO file_digest VALUES (?, ?, ?, ?, ?, ?, ?)
 """
 
 # ------------------------------------------------------------------------------
@@ -118,25 +278,32 @@ version TEXT,
 description TEXT,
 SHA256 VARCHAR(64),
 SHA512 VARCHAR(128),
-WHIRLPOOL VARCHAR(128)
+WHIRLPOOL VARCHAR(128),
+app_class TEXT
 """
 SQL_UPDATE_APP = """
-UPDATE app SET author = ?, version = ?, description = ?, SHA256 = ?, SHA512 = ?, WHIRLPOOL = ?
+UPDATE app SET author = ?, version = ?, description = ?, SHA256 = ?, SHA512 = ?, WHIRLPOOL = ?, app_class = ?
 WHERE app.rowid = ?
 """
 
+SQL_UPDATE_APP_VERIFIED = """
+UPDATE app SET dir_fingerprint = ?, verified_at = ?
+WHERE id_app_type = (SELECT id FROM app_type WHERE name = ?)
+AND name = ?
+"""
+
+SQL_UPDATE_APP_DIGESTS = """
+UPDATE app SET SHA256 = ?, SHA512 = ?, WHIRLPOOL = ?
+WHERE app.rowid = ?
+"""
+
+"""
+Bulk app/com_app status change. Links to change are put in app_status_change temp table, then updated at once.
+"""
 SQL_UPDATE_APP_WORKS_WITH_COM_APP = """
 UPDATE app_works_with_com_app
 SET enabled = ?
-WHERE app_works_with_com_app.rowid = (
-SELECT app_works_with_com_app.rowid
-FROM app_works_with_com_app
-    INNER JOIN app ON app_works_with_com_app.id_app =  app.rowid
-    INNER JOIN app_type ON app.id_app_type = app_type.rowid
-    INNER JOIN com_app ON app_works_with_com_app.id_com_app = com_app.rowid
-WHERE  app_type.name = ?
-AND app.name = ?
-AND com_app.short_name = ?)
+WHERE app_works_with_com_app.rowid IN (SELECT id FROM temp.app_status_change)
 """
 
 
@@ -151,6 +318,22 @@ SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID = """
 DELETE FROM app_works_with_com_app WHERE id_app = ?
 """
 
+SQL_DELETE_APP_STATUS_CHANGE = """
+DELETE FROM temp.app_status_change
+"""
+
+SQL_DELETE_FILE_DIGEST = """
+DELETE FROM file_digest WHERE path = ?
+"""
+
+"""
+Application files are selected by path range [app_path + sep, app_path + next(sep)[
+to use path unique index.
+"""
+SQL_DELETE_FILE_DIGEST_BY_PATH_RANGE = """
+DELETE FROM file_digest WHERE path >= ? AND path < ?
+"""
+
 # ------------------------------------------------------------------------------
 #                       SQL SELECT STATEMENTS
 # ------------------------------------------------------------------------------
@@ -161,8 +344,12 @@ FROM app
 WHERE app_type.name = ?
 """
 
+"""
+IN list is made of bound parameters. Their count is rounded up to a power of two and padded with NULL, so that
+few statements are prepared whatever the number of com_app is.
+"""
 SQL_SELECT_APP_LIST_BY_TYPE_AND_COM_APP = """
-SELECT app_type.name as app_type, app.name as name, com_app.short_name as com_app, app_works_with_com_app.enabled
+SELECT DISTINCT app.name as name
 FROM app
     INNER JOIN app_type ON app.id_app_type = app_type.rowid
     INNER JOIN app_works_with_com_app ON app.rowid = app_works_with_com_app.id_app
@@ -183,7 +370,7 @@ AND com_app.short_name IN ({})
 """
 
 SQL_SELECT_APP_BY_PATH = """
-SELECT app.rowid, app.name, author, version, description, app.path, SHA256, SHA512, WHIRLPOOL,
+SELECT app.rowid AS rowid, app.name, author, version, description, app.path, SHA256, SHA512, WHIRLPOOL, app_class,
     app_type.name as app_type, app_type.path as app_type_path
 FROM app
     INNER JOIN app_type ON app.id_app_type = app_type.rowid
@@ -191,7 +378,7 @@ WHERE app.path = ?
 """
 
 SQL_SELECT_APP = """
-SELECT app.rowid, app.name, author, version, description, app.path, SHA256, SHA512, WHIRLPOOL,
+SELECT app.rowid AS rowid, app.name, author, version, description, app.path, SHA256, SHA512, WHIRLPOOL, app_class,
     app_type.name as app_type, app_type.path as app_type_path
 FROM app
  INNER JOIN app_type ON app.id_app_type = app_type.rowid
@@ -199,8 +386,15 @@ WHERE app_type.name = ?
  AND app.name = ?
 """
 
+SQL_SELECT_APP_DIR_FINGERPRINT = """
+SELECT app.rowid AS rowid, app.name, app.dir_fingerprint
+FROM app
+ INNER JOIN app_type ON app.id_app_type = app_type.rowid
+WHERE app_type.name = ?
+"""
+
 SQL_SELECT_APP_ID = """
-SELECT app.rowid
+SELECT app.rowid AS rowid
 FROM app
  INNER JOIN app_type ON app.id_app_type = app_type.rowid
 WHERE app_type.name = ?
@@ -208,32 +402,110 @@ AND app.name = ?
 """
 
 SQL_SELECT_APP_TYPE_ID = """
-SELECT app_type.rowid
+SELECT app_type.rowid AS rowid
 FROM app_type
 WHERE app_type.name = ?
 """
 
 SQL_SELECT_APP_WORKS_WITH_COM_APP = """
 SELECT app_type.name as app_type, app.name as app_name, com_app.short_name as com_app, app.description,
-    app_works_with_com_app.enabled
+    app.author, app.version, app_works_with_com_app.enabled
+FROM app
+    INNER JOIN app_type ON app.id_app_type = app_type.rowid
+    INNER JOIN app_works_with_com_app ON app.rowid = app_works_with_com_app.id_app
+    INNER JOIN com_app ON app_works_with_com_app.id_com_app = com_app.rowid
+ORDER BY app_type.name, app.name
+"""
+
+"""
+Filtered SQL_SELECT_APP_WORKS_WITH_COM_APP. WHERE clause is made of SQL_APP_LIST_FILTER conditions, joined with AND.
+Each condition is on an indexed column.
+"""
+SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE = """
+SELECT app_type.name as app_type, app.name as app_name, com_app.short_name as com_app, app.description,
+    app.author, app.version, app_works_with_com_app.enabled
 FROM app
     INNER JOIN app_type ON app.id_app_type = app_type.rowid
     INNER JOIN app_works_with_com_app ON app.rowid = app_works_with_com_app.id_app
     INNER JOIN com_app ON app_works_with_com_app.id_com_app = com_app.rowid
+WHERE {}
 ORDER BY app_type.name, app.name
 """
 
+"""
+Same filters, gives link ids. Used to change app/com_app status.
+"""
+SQL_SELECT_APP_STATUS_WHERE = """
+SELECT app_works_with_com_app.rowid AS id, app_type.name as app_type, app.name as app_name,
+    com_app.short_name as com_app, app_works_with_com_app.enabled
+FROM app
+    INNER JOIN app_type ON app.id_app_type = app_type.rowid
+    INNER JOIN app_works_with_com_app ON app.rowid = app_works_with_com_app.id_app
+    INNER JOIN com_app ON app_works_with_com_app.id_com_app = com_app.rowid
+WHERE {}
+ORDER BY app_works_with_com_app.rowid
+"""
+
+SQL_APP_LIST_FILTER = (('app_type', "app_type.name = ?"),
+                       ('app_name', "app.name = ?"),
+                       ('com_app', "com_app.short_name = ?"),
+                       ('enabled', "app_works_with_com_app.enabled = ?"))
+
+SQL_SELECT_COM_APP_BY_APP_ID = """
+SELECT com_app.short_name
+FROM app_works_with_com_app
+    INNER JOIN com_app ON app_works_with_com_app.id_com_app = com_app.rowid
+WHERE app_works_with_com_app.id_app = ?
+ORDER BY app_works_with_com_app.rowid
+"""
+
 SQL_SELECT_APP_TYPE_PATH = """
 SELECT path FROM app_type WHERE name = ?
 """
 
 SQL_SELECT_COM_APP = """
-SELECT rowid, short_name
+SELECT com_app.rowid AS rowid, short_name
 FROM com_app
 WHERE short_name = ?
 """
 
 SQL_SELECT_ALL_COM_APP = """
-SELECT rowid, short_name
+SELECT com_app.rowid AS rowid, short_name
 FROM com_app
+"""
+
+SQL_SELECT_ALL_APP_TYPE = """
+SELECT app_type.rowid AS rowid, name, path
+FROM app_type
+"""
+
+SQL_SELECT_ALL_APP = """
+SELECT app.rowid AS rowid, app.name, app_type.name as app_type
+FROM app
+    INNER JOIN app_type ON app.id_app_type = app_type.rowid
+ORDER BY app.rowid
+"""
+
+"""
+App paths and digests written in startup snapshot, see startupsnapshot.py
+"""
+SQL_SELECT_STARTUP_APP = """
+SELECT app_type.name as app_type, app.name, app.path, app.SHA256, app.SHA512, app.WHIRLPOOL, app.dir_fingerprint,
+    app.verified_at
+FROM app
+    INNER JOIN app_type ON app.id_app_type = app_type.rowid
+ORDER BY app.rowid
+"""
+
+"""
+Changed when another connection commits. Used to detect outdated in-memory configuration.
+"""
+SQL_PRAGMA_DATA_VERSION = """
+PRAGMA data_version
+"""
+
+SQL_SELECT_FILE_DIGEST_BY_PATH_RANGE = """
+SELECT path, size, mtime_ns, inode, SHA256, SHA512, WHIRLPOOL
+FROM file_digest
+WHERE path >= ? AND path < ?
 """
\ No newline at end of file
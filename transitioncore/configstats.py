@@ -0,0 +1,304 @@
+# ------------------------------------------------------------------------------
+# Name:        configstats
+# Purpose:     Configuration API and SQL statements instrumentation
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import collections
+import functools
+import inspect
+import sqlite3
+import threading
+import time
+
+from transitioncore import configsql
+
+# stats kinds
+STATS_API = 'api'
+STATS_SQL = 'sql'
+
+# latencies kept per entry to compute percentiles
+SAMPLE_COUNT = 1024
+
+PERCENTILE_LIST = (50, 90, 99)
+
+
+class StatsEntry():
+    """
+    Stats of one Configuration method or SQL statement
+    """
+
+    __slots__ = ('count', 'total', 'max', 'rows', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = collections.deque(maxlen=SAMPLE_COUNT)
+
+    def percentile(self, percent):
+        """
+        :param percent: 0 to 100
+        :return: latency percentile of last SAMPLE_COUNT calls, in seconds
+        """
+        if len(self.samples) == 0:
+            return 0.0
+
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, len(samples) * percent // 100)]
+
+
+class ConfigurationStats():
+    """
+    Call count, latency (total, percentiles, max) and rows of Configuration public methods and configsql.py
+    statements, plus db connection opens. Shared by all threads of a Configuration.
+
+    Disabled instrumentation costs one attribute test per Configuration public method call and nothing on SQL
+    statements : connections are only opened with StatsConnection while stats are enabled.
+
+    SQL statement latency covers execute() and rows fetch. Rows are fetched rows of queries and changed rows of
+    other statements. Method rows are length of returned list or tuple.
+
+    get_stats() result is made of tuples, ints, floats and strings, so rpyc sends it by value :
+        (connection opens, ((kind, name, count, total, p50, p90, p99, max, rows), ...))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (kind, name) : StatsEntry
+        self._entry_dict = dict()
+        self.open_count = 0
+        # sql : statement name
+        self._name_dict = dict()
+
+    # configsql.py statements : exact text and formatted templates
+    _statement_dict = None
+    _template_list = None
+
+    @staticmethod
+    def _load_statements():
+        statement_dict = dict()
+        template_list = list()
+        for name, value in vars(configsql).items():
+            if name.startswith('SQL_') and isinstance(value, str):
+                statement_dict[value] = name
+                if '{' in value:
+                    template_list.append((value[:value.index('{')], name))
+        # longest prefix first
+        template_list.sort(key=lambda template: -len(template[0]))
+        ConfigurationStats._template_list = template_list
+        ConfigurationStats._statement_dict = statement_dict
+
+    def statement_name(self, sql):
+        """
+        :param sql: executed statement
+        :return: configsql.py constant name, or statement first line for other statements
+        """
+        name = self._name_dict.get(sql)
+        if name is None:
+            if ConfigurationStats._statement_dict is None:
+                ConfigurationStats._load_statements()
+            name = ConfigurationStats._statement_dict.get(sql)
+            if name is None:
+                for prefix, template_name in ConfigurationStats._template_list:
+                    if sql.startswith(prefix):
+                        name = template_name
+                        break
+            if name is None:
+                name = sql.strip().splitlines()[0][:60] if sql.strip() else sql
+            self._name_dict[sql] = name
+
+        return name
+
+    def record(self, kind, name, elapsed, rows=0, count=1):
+        """
+        :param kind: STATS_API or STATS_SQL
+        :param name: method or statement name
+        :param elapsed: seconds
+        :param rows: returned / changed rows
+        :param count: 1 for a call, 0 to add time and rows to last call (rows fetch)
+        """
+        with self._lock:
+            entry = self._entry_dict.get((kind, name))
+            if entry is None:
+                entry = StatsEntry()
+                self._entry_dict[(kind, name)] = entry
+            entry.total += elapsed
+            entry.rows += rows
+            if count:
+                entry.count += count
+                entry.samples.append(elapsed)
+                if elapsed > entry.max:
+                    entry.max = elapsed
+            elif len(entry.samples) > 0:
+                entry.samples[-1] += elapsed
+                entry.max = max(entry.max, entry.samples[-1])
+
+    def count_open(self):
+        with self._lock:
+            self.open_count += 1
+
+    def reset(self):
+        with self._lock:
+            self._entry_dict = dict()
+            self.open_count = 0
+
+    def get_stats(self):
+        """
+        :return: (connection opens, ((kind, name, count, total, p50, p90, p99, max, rows), ...)), sorted on total
+        latency
+        """
+        with self._lock:
+            entry_list = [(kind, name, entry.count, entry.total)
+                          + tuple(entry.percentile(percent) for percent in PERCENTILE_LIST)
+                          + (entry.max, entry.rows)
+                          for (kind, name), entry in self._entry_dict.items()]
+            open_count = self.open_count
+
+        entry_list.sort(key=lambda entry: (entry[0], -entry[3]))
+        return open_count, tuple(entry_list)
+
+    @staticmethod
+    def format_stats(stats):
+        """
+        :param stats: get_stats() result
+        :return: printable stats table
+        """
+        open_count, entry_list = stats
+        line_list = ["connection opens : {}".format(open_count),
+                     "{:4} {:48} {:>8} {:>10} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+                         'kind', 'name', 'count', 'total ms', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'rows')]
+        for kind, name, count, total, p50, p90, p99, max_latency, rows in entry_list:
+            line_list.append("{:4} {:48} {:>8} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>8}".format(
+                kind, name[:48], count, total * 1000, p50 * 1000, p90 * 1000, p99 * 1000, max_latency * 1000, rows))
+
+        return "\n".join(line_list)
+
+    @staticmethod
+    def instrument(klass, interface):
+        """
+        Wrap public methods of interface in klass. Calls are recorded while instance stats attribute is set.
+        Static methods are left as is.
+        :param klass: class to instrument
+        :param interface: class listing public methods
+        """
+        for name in vars(interface).keys():
+            if name.startswith('_') or isinstance(inspect.getattr_static(klass, name), (staticmethod, classmethod)):
+                continue
+            setattr(klass, name, ConfigurationStats._instrument_method(name, getattr(klass, name)))
+
+    @staticmethod
+    def _instrument_method(name, method):
+        @functools.wraps(method)
+        def instrumented(self, *args, **kwargs):
+            stats = self.stats
+            if stats is None:
+                return method(self, *args, **kwargs)
+
+            start = time.perf_counter()
+            result = None
+            try:
+                result = method(self, *args, **kwargs)
+                return result
+            finally:
+                stats.record(STATS_API, name, time.perf_counter() - start,
+                             len(result) if isinstance(result, (list, tuple)) else 0)
+
+        return instrumented
+
+
+class StatsCursor(sqlite3.Cursor):
+    """
+    Cursor recording its statements in connection stats
+    """
+
+    def __init__(self, connection):
+        super(StatsCursor, self).__init__(connection)
+        self._stats = connection.stats
+        self._name = None
+
+    def _record_execute(self, sql, execute, parameters):
+        if self._stats is None:
+            return execute(sql, parameters)
+
+        name = self._stats.statement_name(sql)
+        start = time.perf_counter()
+        try:
+            return execute(sql, parameters)
+        finally:
+            self._name = name
+            self._stats.record(STATS_SQL, name, time.perf_counter() - start, max(self.rowcount, 0))
+
+    def _record_fetch(self, fetch, *args):
+        if self._stats is None or self._name is None:
+            return fetch(*args)
+
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = fetch(*args)
+            if isinstance(result, list):
+                rows = len(result)
+            elif result is not None:
+                rows = 1
+            return result
+        finally:
+            self._stats.record(STATS_SQL, self._name, time.perf_counter() - start, rows, 0)
+
+    def execute(self, sql, parameters=()):
+        return self._record_execute(sql, super(StatsCursor, self).execute, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._record_execute(sql, super(StatsCursor, self).executemany, seq_of_parameters)
+
+    def fetchone(self):
+        return self._record_fetch(super(StatsCursor, self).fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        return self._record_fetch(super(StatsCursor, self).fetchmany, size)
+
+    def fetchall(self):
+        return self._record_fetch(super(StatsCursor, self).fetchall)
+
+    def __next__(self):
+        return self._record_fetch(super(StatsCursor, self).__next__)
+
+
+class StatsConnection(sqlite3.Connection):
+    """
+    sqlite3 connection factory recording statements of its cursors, see ConnectionManager.set_stats()
+    """
+
+    stats = None
+
+    def cursor(self, factory=StatsCursor):
+        return super(StatsConnection, self).cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -26,14 +26,11 @@
 
 import inspect
 import os
+import time
+import threading
 
 import pkgutil
 import sys
-import zipfile
-import hashlib
-import sha3
-import whirlpool
-import pickle
 import sqlite3
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
@@ -42,31 +39,61 @@ from transitioncore.eventdispatcher import TransitionEventDispatcher
 from transitioncore.eventsinterface.configeventinterface import ConfigEventsInterface
 from transitioncore.exceptions.configurationexception import ConfigurationException
 from transitioncore.configsql import *
+from transitioncore.digestengine import DigestEngine, DIGEST_FORMAT_LEGACY, DIGEST_FORMAT_STREAM
+from transitioncore.filedigestcache import FileDigestCache
+from transitioncore.manifest import Manifest
+from transitioncore.verificationsession import VerificationSession
+from transitioncore.appscanner import AppScanner, write_manifest, verify_manifest
+from transitioncore.appmetadata import AppMetadata
+from transitioncore.storagebackend import SQLiteBackend
+from transitioncore.schemamigration import SchemaMigration
+from transitioncore.configmodel import ConfigurationModel
+from transitioncore.configrecords import AppRecord, AppComAppStatus
+from transitioncore.startupsnapshot import StartupSnapshot
+from transitioncore.configstats import ConfigurationStats
 
 
 class IConfiguration:
     def available(self):
         pass
 
+    def close(self):
+        pass
+
     def disable_app(self, app_type, app_name, com_app):
         pass
 
+    def disable_apps(self, change_list):
+        pass
+
     def enable_app(self, app_type, app_name, com_app):
         pass
 
+    def enable_apps(self, change_list):
+        pass
+
     def get_app_info(self, app_type, app_name):
         pass
 
     def get_app_info_by_path(self, path):
         pass
 
+    def get_app_com_app_list(self, app_type, app_name, enabled=None):
+        pass
+
     def get_app_list(self, app_type, app_name, com_app, enabled):
         pass
 
+    def get_app_metadata(self, app_type, app_name, session=None):
+        pass
+
     def get_app_mode(self, app_type, app_name):
         pass
 
-    def get_app_state(self, app_type, app_name):
+    def get_app_state(self, app_type, app_name, session=None):
+        pass
+
+    def get_app_status_matrix(self):
         pass
 
     def get_app_type_path(self, app_type):
@@ -84,19 +111,45 @@ class IConfiguration:
     def get_enabled_app_list(self, app_type, com_app):
         pass
 
+    def get_startup_snapshot(self):
+        pass
+
     def print_app_list(self, app_type=None):
         pass
 
+    @staticmethod
+    def print_manifest_results(result_iterator):
+        pass
+
+    def refresh_app(self, app_type, app_name, fire_event=True):
+        pass
+
     def reset(self):
         pass
 
-    def update_inventory(self, app_type=None, fire_event=True):
+    def update_inventory(self, app_type=None, fire_event=True, parallel=False, processes=None, full=False):
+        pass
+
+    def verify_app(self, app_type, app_name, com_app):
+        pass
+
+    @staticmethod
+    def verify_app_manifest(path, subtree=None, workers=None):
+        pass
+
+    def verify_app_manifests(self, app_list=None, processes=None):
         pass
 
     @staticmethod
     def write_app_manifest(path):
         pass
 
+    def write_app_manifests(self, app_list=None, processes=None):
+        pass
+
+    def write_startup_snapshot(self):
+        pass
+
 
 class Configuration(IConfiguration, TransitionEventDispatcher):
     """ Deals with Transition configuration.
@@ -144,6 +197,12 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         When db digests differs from generated app digests, configuration updates db digests and fire on_app_update
         event
 
+        * Digests format
+        Digests are streamed from app files by DigestEngine (see digestengine.py). Manifest files and db rows
+        holding digests of the former zip archive (legacy format) are still verified.
+        Manifest files hold per-file digests and a Merkle root (see manifest.py), so a corrupted app reports
+        the files that changed. Pickled Manifest files are still read.
+
         Notes about hash :
         * The Whirlpool hashing algorithm (http://www.larc.usp.br/~pbarreto/WhirlpoolPage.html),
         written by Vincent Rijmen and Paulo S. L. M. Barreto is a secure, modern hash which is as yet unbroken and
@@ -152,19 +211,36 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         among non-NSA designers. It supports the same hash lengths as SHA-2, and its internal structure
         differs significantly from the rest of the SHA family.
 
+    Startup snapshot
+        After each write, enabled apps per com_app, app paths and digests are written to snapshot_path (see
+        startupsnapshot.py). Kernel boots from it without db connection and checks it against db afterwards.
+        Snapshot also holds app fingerprints and last verification times : kernel launches recently verified apps
+        at once and verifies them in background, others are verified before launch (see verificationscheduler.py
+        and verify_app()).
+
     Events
         * on_app_add
         * on_app_del
         * on_app_enable
+        * on_apps_enable
+        * on_apps_disable
         * on_app_disable
         * on_app_update
     """
 
     cnx_str = os.getenv("USERPROFILE") + "\\.transition.s3db"
 
-    create_tables = (SQL_CREATE_APP, SQL_CREATE_APP_TYPE, SQL_CREATE_COM_APP, SQL_CREATE_APP_WORKS_WITH_COM_APP)
+    # startup snapshot read by kernel, see startupsnapshot.py
+    snapshot_path = os.getenv("USERPROFILE") + "\\.transition.snapshot"
+
+    # referenced tables first
+    create_tables = (SQL_CREATE_APP_TYPE, SQL_CREATE_COM_APP, SQL_CREATE_APP, SQL_CREATE_APP_WORKS_WITH_COM_APP,
+                     SQL_CREATE_FILE_DIGEST)
 
     app_type_list = ('docapp', 'addin')
+
+    # import app packages when their metadata can't be read from source (see appmetadata.py)
+    import_fallback = False
     com_app_list = ('Excel', 'Access', 'MS Project', 'OneNote', 'Outlook', 'PowerPoint', 'Word')
 
     def available(self):
@@ -177,82 +253,266 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
 
         return ret_val
 
-    def _create_tables(self):
+    def _create_tables(self, if_empty=False):
         """
-        Creates configuration tables and populates them
+        Creates configuration tables and populates them, in one write transaction
+        :param if_empty: only if db is still empty once write lock is held (another process may be creating it)
+        :return: True if tables were created
         """
-        cnx = self._sqlite_cnx
-        cursor = cnx.cursor()
-        sql = ""
-        try:
-            for sql in Configuration.create_tables:
-                print(sql)
-                cursor.execute(sql)
+        app_type_path_list = list()
+        for app_type in Configuration.app_type_list:
+            module = inspect.importlib.import_module(app_type)
+            app_type_path_list.append((app_type, module.__path__[0]))
 
-            for com_app in Configuration.com_app_list:
-                print(SQL_INSERT_COM_APP)
-                cursor.execute(SQL_INSERT_COM_APP, (com_app.lower(), ))
+        def write(cnx):
+            if if_empty and not SchemaMigration.is_empty(cnx):
+                return False
 
-            for app_type in Configuration.app_type_list:
-                module = inspect.importlib.import_module(app_type)
-                print(SQL_INSERT_APP_TYPE)
-                cursor.execute(SQL_INSERT_APP_TYPE, (app_type, module.__path__[0]))
+            cursor = cnx.cursor()
+            try:
+                for sql in Configuration.create_tables:
+                    print(sql)
+                    cursor.execute(sql)
+
+                for sql in SchemaMigration.create_indexes:
+                    cursor.execute(sql)
+                SchemaMigration.set_version(cnx, SchemaMigration.get_schema_version())
+
+                for com_app in Configuration.com_app_list:
+                    print(SQL_INSERT_COM_APP)
+                    cursor.execute(SQL_INSERT_COM_APP, (com_app.lower(), ))
+
+                for app_type, app_type_path in app_type_path_list:
+                    print(SQL_INSERT_APP_TYPE)
+                    cursor.execute(SQL_INSERT_APP_TYPE, (app_type, app_type_path))
+            finally:
+                cursor.close()
+            return True
 
-            cnx.commit()
+        try:
+            created = self._connection_manager.run_write(write)
         except sqlite3.OperationalError as oe:
-            print("Configuration._create_tables :", sql, oe)
-        finally:
-            cursor.close()
+            print("Configuration._create_tables :", oe)
+            return False
+
+        if created:
+            self._invalidate_model()
+        return created
 
     def reset(self):
-        if self._sqlite_cnx is not None:
-            self._sqlite_cnx.close()
+        """
+        Drop configuration db. It is created again on next db access.
+        """
+        self._connection_manager.remove()
 
-        if os.path.exists(self.cnx_str):
-            os.remove(self.cnx_str)
+    def close(self):
+        """
+        Close db connections of all threads. They are opened again on next db access.
+        """
+        self._connection_manager.close_all()
 
-    def __init__(self, com_app=None):
+    def __init__(self, com_app=None, backend=None, snapshot_path=None):
         """
         Configuration
         :param com_app: if set, tells config we are linked to this com_app.
+        :param backend: storage backend, see storagebackend.py. SQLiteBackend on cnx_str file if None.
+        :param snapshot_path: startup snapshot file written after each write. Defaults to snapshot_path with
+        default backend, no snapshot is written with another backend.
         :return:
         """
         super(Configuration, self).__init__(ConfigEventsInterface)
 
         self.com_app = com_app
-        self._sqlite_cnx = None
-        self._sqlite_cnx_usage_count = 0
+
+        # one long-lived db connection per thread
+        backend_is_default = backend is None
+        if backend_is_default:
+            backend = SQLiteBackend(Configuration.cnx_str)
+        backend.set_on_open(self._on_sqlite_open)
+        self._connection_manager = backend
+
+        if snapshot_path is None and backend_is_default:
+            snapshot_path = Configuration.snapshot_path
+        self._snapshot_path = snapshot_path
+        # last written snapshot
+        self._snapshot_data = None
+
+        # thread data : per-file digests cache, avoids hashing unchanged files again, configuration model
+        self._local = threading.local()
+
+        # incremented by each write. Outdates in-memory configuration models.
+        self._generation = 0
+
+        # ConfigurationStats while instrumentation is enabled, see enable_stats()
+        self.stats = None
 
         #events listeners
         self._event_listener_list = list()
 
+    def _on_sqlite_open(self, cnx, created):
+        """
+        Called once per new connection. Creates DB if empty.
+        :param cnx: new connection
+        :param created: True if db file didn't exist. Not used : another process may have created db file and
+        not its tables yet. Db content tells instead.
+        """
+        if self._connection_manager.read_only:
+            return
+
+        if SchemaMigration.is_empty(cnx) and self._create_tables(if_empty=True):
+            self.update_inventory(fire_event=False)
+        else:
+            # db created by an older release
+            SchemaMigration.upgrade(cnx)
+
     def _get_sqlite(self):
         """
-        Make SQLite connection. Creates DB if not exists.
+        Get SQLite connection of current thread. Creates DB if not exists.
         :return: DB2API sqlite connection
         """
-        self._sqlite_cnx_usage_count += 1
-        db_create = False
-        if not os.path.exists(Configuration.cnx_str):
-            self._sqlite_cnx = None
-            db_create = True
+        return self._connection_manager.get()
+
+    _sqlite = property(_get_sqlite)
 
-        if self._sqlite_cnx is None:
-            self._sqlite_cnx = sqlite3.connect(Configuration.cnx_str)
-            self._sqlite_cnx.row_factory = sqlite3.Row
-            if db_create:
-                self._create_tables()
-                self.update_inventory(fire_event=False)
+    def _get_sqlite_cnx(self):
+        """
+        :return: SQLite connection of current thread if opened, None instead
+        """
+        return self._connection_manager.peek()
 
-        return self._sqlite_cnx
+    _sqlite_cnx = property(_get_sqlite_cnx)
 
-    _sqlite = property(_get_sqlite)
+    def _get_model(self):
+        """
+        In-memory configuration of current thread. Loaded again after a write of this process or a commit made
+        by another connection.
+        :return: ConfigurationModel
+        """
+        cnx = self._sqlite
+        model = getattr(self._local, 'model', None)
+        if model is None or not model.is_current(cnx, self._generation):
+            model = ConfigurationModel.load(cnx, self._generation)
+            self._local.model = model
+
+        return model
+
+    _model = property(_get_model)
+
+    def _run_write(self, write):
+        """
+        Run write(cnx) in a short write transaction of current thread connection, retried while db is locked by
+        another process. See ConnectionManager.run_write().
+        :param write: callable(cnx). Must only change db.
+        :return: write(cnx) result
+        """
+        return self._connection_manager.run_write(write)
+
+    def _invalidate_model(self):
+        """
+        Called after each configuration write
+        """
+        self._generation += 1
+        self.write_startup_snapshot()
+
+    def get_startup_snapshot(self):
+        """
+        Encode enabled apps per com_app, app paths and digests. See startupsnapshot.py
+        :return: snapshot bytes
+        """
+        model = self._model
+        app_list = list()
+        for row in self._sqlite.execute(SQL_SELECT_STARTUP_APP):
+            app_list.append((row['app_type'], row['name'], row['path'],
+                             {'SHA256': row['SHA256'], 'SHA512': row['SHA512'], 'WHIRLPOOL': row['WHIRLPOOL']})
+                            + model.get_app_masks(row['app_type'], row['name'])
+                            + (row['dir_fingerprint'], row['verified_at']))
+
+        return StartupSnapshot.build([(app_type, model.get_app_type_path(app_type))
+                                      for app_type in model.app_type_dict.keys()],
+                                     model.com_app_list, app_list)
+
+    def write_startup_snapshot(self):
+        """
+        Write startup snapshot file if it changed. Snapshot is a cache : failures are reported, not raised.
+        :return: True if snapshot file is up to date
+        """
+        if self._snapshot_path is None or self._connection_manager.read_only:
+            return False
+
+        try:
+            data = self.get_startup_snapshot()
+            if data != self._snapshot_data:
+                StartupSnapshot.write(self._snapshot_path, data)
+                self._snapshot_data = data
+        except (OSError, sqlite3.Error, ConfigurationException) as e:
+            print("Configuration.write_startup_snapshot() : can't write {} : {}".format(self._snapshot_path,
+                                                                                      repr(e)))
+            return False
+
+        return True
+
+    def enable_stats(self):
+        """
+        Record calls of public methods, SQL statements and connection opens. See configstats.py
+        :return: ConfigurationStats
+        """
+        if self.stats is None:
+            stats = ConfigurationStats()
+            self._connection_manager.set_stats(stats)
+            self.stats = stats
+
+        return self.stats
+
+    def disable_stats(self):
+        """
+        Stop recording. Recorded stats are dropped.
+        """
+        if self.stats is not None:
+            self.stats = None
+            self._connection_manager.set_stats(None)
+
+    def reset_stats(self):
+        if self.stats is not None:
+            self.stats.reset()
+
+    def get_stats(self):
+        """
+        :return: ConfigurationStats.get_stats() result, None if instrumentation is disabled
+        """
+        if self.stats is None:
+            return None
+
+        return self.stats.get_stats()
+
+    def print_stats(self):
+        stats = self.get_stats()
+        if stats is None:
+            print("Configuration stats are disabled")
+        else:
+            print(ConfigurationStats.format_stats(stats))
 
     def _close_sqlite(self):
-        self._sqlite_cnx_usage_count -= 1
-        if self._sqlite_cnx_usage_count == 0:
-            self._sqlite_cnx.close()
-            self._sqlite_cnx = None
+        """
+        Connections are long-lived and closed by close(). Nothing to do.
+        """
+        pass
+
+    def _get_file_digest_cache(self):
+        """
+        :return: FileDigestCache of current thread
+        """
+        file_digest_cache = getattr(self._local, 'file_digest_cache', None)
+        if file_digest_cache is None:
+            if self._connection_manager.read_only:
+                # detached cache : kept in memory only
+                file_digest_cache = FileDigestCache(None)
+            else:
+                file_digest_cache = FileDigestCache(self)
+            self._local.file_digest_cache = file_digest_cache
+
+        return file_digest_cache
+
+    _file_digest_cache = property(_get_file_digest_cache)
 
 
     def get_app_type_path(self, app_type):
@@ -261,96 +521,61 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :param app_type:
         :return: app type path, None if app_type doesn't exist
         """
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP_TYPE_PATH, (app_type, ))
-        row = cursor.fetchone()
-        if row is None:
-            path = None
-        else:
-            path = row["PATH"]
-        #print("get_app_type_path()", app_type, path)
-        cursor.close()
-        self._close_sqlite()
-        return path
+        return self._model.get_app_type_path(app_type)
 
     @staticmethod
-    def _generate_app_digests(path):
+    def _generate_app_digests(path, digest_format=DIGEST_FORMAT_STREAM, file_cache=None, session=None):
         """
         Generate application digests in sha256, sha512 and whirlpool.
         Used to verify apps source integrity. Pycache is regenerated by AppManager.
         Idea comes from : http://devmanual.gentoo.org/general-concepts/manifest/index.html
         SHA uses keccak. See top comments about that.
+        Files are streamed into hashers by DigestEngine, see digestengine.py.
 
         :param path: application path
+        :param digest_format: DIGEST_FORMAT_STREAM per default. DIGEST_FORMAT_LEGACY gives digests of the
+        zip archive used before streaming (still found in old Manifest files and db)
+        :param file_cache: FileDigestCache. When given, only files changed since last call are read.
+        :param session: VerificationSession. When given, streamed digests are generated once per session.
         :return: dict {SHA256, SHA512, WHIRLPOOL} or None on error
         """
 
         digests = None
-        try:
-            if os.path.exists(path):
-                try:
-                    source_path = os.getenv("TMP") + "\\transition_app_source.zip"
-                    source_count = 0
-                    zipf_source = zipfile.ZipFile(source_path, 'w')
-
-                    #TODO : find a way to deal with pycache
-                    for root, dirs, files in os.walk(path):
-                        if "__pycache__" not in root:
-                            for file in files:
-                                if file not in ("Manifest",):
-                                    source_count += 1
-                                    zipf_source.write(os.path.join(root, file))
-
-                    zipf_source.close()
-
-                    if source_count > 0:
-                        source_to_check = open(source_path, 'rb')
-                        source_content = source_to_check.read()
-
-                        source_sha256 = hashlib.sha3_256()
-                        source_sha256.update(source_content)
-
-                        source_sha512 = hashlib.sha3_512()
-                        source_sha512.update(source_content)
-
-                        source_wp = whirlpool.new()
-                        source_wp.update(source_content)
-
-                        source_to_check.close()
-
-                        digests = {
-                            'SHA256': source_sha256.hexdigest(),
-                            'SHA512': source_sha512.hexdigest(),
-                            'WHIRLPOOL': source_wp.hexdigest()
-                        }
-                    else:
-                        print("_generate_app_digests() : no files found in path", path)
-
-                    #print(source_path)
-                    os.remove(source_path)
-                except Exception as e:
-                    print(repr(e))
-            else:
-                print("_generate_app_digests() : invalid path", path)
-        except ImportError as ie:
-            print("_generate_app_digests() : Import Error", repr(ie))
+        if os.path.exists(path):
+            try:
+                if session is not None and digest_format == DIGEST_FORMAT_STREAM:
+                    digests = session.get_digests(path)
+                else:
+                    digests = DigestEngine.generate(path, digest_format, file_cache=file_cache)
+                if digests is None:
+                    print("_generate_app_digests() : no files found in path", path)
+            except Exception as e:
+                print(repr(e))
+        else:
+            print("_generate_app_digests() : invalid path", path)
 
         return digests
 
     @staticmethod
     def write_app_manifest(path):
         """
-        write a new Manifest file containing digests for app.
+        write a new Manifest file containing per-file digests for app (see manifest.py).
         :param path:
-        :return: digests or None on error
+        :return: app digests or None on error
         :raise ConfigurationException if Manifest file can't be created
         """
 
         try:
-            digests = Configuration._generate_app_digests(path)
-            if digests is not None:
-                with open(path + '\\Manifest', 'wb') as f:
-                    pickle.dump(digests, f)
+            digests = None
+            if os.path.exists(path):
+                manifest = Manifest.from_path(path)
+                digests = manifest.digests
+                if digests is not None:
+                    manifest.write(path)
+                else:
+                    print("write_app_manifest() : no files found in path", path)
+            else:
+                print("write_app_manifest() : invalid path", path)
 
             return digests
         except IOError:
@@ -361,55 +586,146 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         """
         Read Manifest file in path
         :param path: application path
-        :return: digests dict
+        :return: app digests dict. FORMAT key tells in which format digests are (DIGEST_FORMAT_LEGACY for
+        Manifest files written before streamed digests)
         :raise: ConfigurationException on error
         """
-        manifest_file = path + '\\Manifest'
-        ret_val = None
-        if os.path.exists(manifest_file):
-            try:
-                with open(manifest_file, 'rb') as f:
-                    digests = pickle.load(f)
-
-                if isinstance(digests, dict):
-                    keys = digests.keys()
-                    if 'SHA256' in keys \
-                            and 'SHA512' in keys \
-                            and 'WHIRLPOOL' in keys:
-                        if len(digests['SHA256']) == 64 \
-                                and len(digests['SHA512']) == 128 \
-                                and len(digests['WHIRLPOOL']) == 128:
-                            ret_val = digests
-
-                #if loaded object is not a valid dict containing SHA256, SHA512, WHIRLPOOL keys of
-                #64, 128 and 128 bytes, raise exception
-                if ret_val is None:
-                    raise ConfigurationException("Invalid Manifest file in {}.".format(path))
-                else:
-                    return ret_val
-            except EOFError as eofe:
-                raise ConfigurationException("Manifest file seems empty {} : {}.".format(path, repr(eofe)))
-        else:
-            raise ConfigurationException("{} doesn't contain Manifest file.".format(path))
+        manifest = Manifest.read(path)
+        return dict(manifest.digests, FORMAT=manifest.digest_format)
+
+    @staticmethod
+    def verify_app_manifest(path, subtree=None, workers=None):
+        """
+        Verify app files against Manifest, file by file.
+        :param path: application path (must contain Manifest File)
+        :param subtree: only verify files in this relative ('/' separated) path
+        :param workers: number of top level subtrees hashed at the same time. Cpu count if None.
+        :return: list of (relative path, 'changed'|'missing'|'added'). Empty list when app matches Manifest.
+        Manifest files without per-file entries report the whole app as ('', 'changed').
+        :raise: ConfigurationException if Manifest can't be read
+        """
+        manifest = Manifest.read(path)
+        _, failure_list = manifest.verify(path, subtree, workers=workers)
+        return failure_list
+
+    def _get_app_package_list(self, app_list=None):
+        """
+        :param app_list: list of (app_type, app_name). All app packages of app type directories if None.
+        :return: list of (app_type, app_name, app_path)
+        :raise: ConfigurationException if an app_type doesn't exist
+        """
+        package_list = list()
+        if app_list is None:
+            for app_type in self.app_type_list:
+                app_type_path = self.get_app_type_path(app_type)
+                if app_type_path is not None:
+                    package_list.extend((app_type, app_name, app_type_path + "\\" + app_name)
+                                        for _, app_name, is_package in pkgutil.iter_modules((app_type_path, ))
+                                        if is_package)
+            return package_list
+
+        for app_type, app_name in app_list:
+            app_type_path = self.get_app_type_path(app_type)
+            if app_type_path is None:
+                mesg = "Configuration._get_app_package_list() : Given app_type {} doesn't exist !".format(app_type)
+                print(mesg)
+                raise ConfigurationException(mesg)
+            package_list.append((app_type, app_name, app_type_path + "\\" + app_name))
+
+        return package_list
+
+    def write_app_manifests(self, app_list=None, processes=None):
+        """
+        Write Manifest files of several apps. Apps are hashed in parallel worker processes, from disk (see
+        appscanner.write_manifest()).
+        :param app_list: list of (app_type, app_name). All app packages of app type directories if None.
+        :param processes: number of worker processes. Cpu count if None.
+        :return: generator of dict {app_type, app_name, path, digests, file_count, time, error}, as soon as each
+        app is done
+        :raise: ConfigurationException if an app_type doesn't exist
+        """
+        return AppScanner(processes).run(write_manifest, self._get_app_package_list(app_list))
+
+    def verify_app_manifests(self, app_list=None, processes=None):
+        """
+        Verify several apps against their Manifest files, file by file. Apps are hashed in parallel worker
+        processes, from disk (see appscanner.verify_manifest()).
+        :param app_list: list of (app_type, app_name). All app packages of app type directories if None.
+        :param processes: number of worker processes. Cpu count if None.
+        :return: generator of dict {app_type, app_name, path, failure_list, time, error}, as soon as each app is
+        done. failure_list is None for apps without Manifest.
+        :raise: ConfigurationException if an app_type doesn't exist
+        """
+        return AppScanner(processes).run(verify_manifest, self._get_app_package_list(app_list))
 
-    def _verify_db_digests(self, path):
+    @staticmethod
+    def print_manifest_results(result_iterator):
+        """
+        Print write_app_manifests() or verify_app_manifests() results as they come, with per-app timings, then a
+        summary.
+        :param result_iterator: write_app_manifests() or verify_app_manifests() result
+        :return: number of failed apps : Manifest not written, files mismatch or error
         """
-        Compare digests stored in db file and generated digests
+        start = time.perf_counter()
+        app_count = 0
+        failure_count = 0
+        hash_time = 0.0
+        for result in result_iterator:
+            app_count += 1
+            hash_time += result.get('time', 0.0)
+            if result['error'] is not None:
+                status = "ERROR : " + result['error']
+            elif 'digests' in result:
+                status = "Manifest written, {} file(s)".format(result['file_count'])
+            elif result['failure_list'] is None:
+                status = "no Manifest, not verified"
+            elif len(result['failure_list']) > 0:
+                status = "MISMATCH"
+            else:
+                status = "ok"
+
+            failed = result['error'] is not None or len(result.get('failure_list') or ()) > 0
+            if failed:
+                failure_count += 1
+            print("{:>9.3f}s {}.{} : {}".format(result.get('time', 0.0), result['app_type'], result['app_name'],
+                                               status), flush=True)
+            for rel_path, file_status in result.get('failure_list') or ():
+                print("           {} {}".format(file_status, rel_path or '(whole app)'), flush=True)
+
+        print("{} app(s) in {:.3f}s, {:.3f}s of hashing, {} failure(s)".format(app_count, time.perf_counter() - start,
+                                                                             hash_time, failure_count))
+        return failure_count
+
+    def _verify_db_digests(self, path, session=None):
+        """
+        Compare digests stored in db file and generated digests.
+        Digests stored in legacy format are still valid. They are silently replaced by streamed ones when they
+        match.
         :param path: app path (must contain Manifest File)
+        :param session: optional VerificationSession
         :return: True/False , generated app digest/None
         """
         ret_val = True
-        digests = Configuration._generate_app_digests(path)
+        digests = Configuration._generate_app_digests(path, file_cache=self._file_digest_cache, session=session)
         if digests is not None:
             db_digests = self.get_app_info_by_path(path)
             if db_digests is not None:
+                mismatch_list = list()
                 for key in digests.keys():
                     if digests[key] != db_digests[key]:
+                        mismatch_list.append(key)
+
+                if len(mismatch_list) > 0:
+                    # db may still contain legacy digests
+                    legacy_digests = Configuration._generate_app_digests(path, DIGEST_FORMAT_LEGACY)
+                    if legacy_digests is not None \
+                            and all(legacy_digests[key] == db_digests[key] for key in legacy_digests.keys()):
+                        self._update_app_digests(db_digests['rowid'], digests)
+                    else:
                         ret_val = False
-                        print("Configuration._verify_db_digests() : Stored", key, "in Manifest file", db_digests[key],
-                              "doesn't match with actual", key, "signature", digests[key])
-                    # else:
-                    #     print("Configuration._verify_db_digests() :", key, "match", digests[key])
+                        for key in mismatch_list:
+                            print("Configuration._verify_db_digests() : Stored", key, "in Manifest file",
+                                  db_digests[key], "doesn't match with actual", key, "signature", digests[key])
             else:
                 ret_val = False
         else:
@@ -418,108 +734,445 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         return ret_val, digests
 
     @staticmethod
-    def _verify_manifest_digests(path):
+    def _verify_manifest_digests(path, file_cache=None, session=None):
         """
-        Compare digests stored in Manifest file and generated digests
+        Compare digests stored in Manifest file and generated digests. Changed files are reported when
+        Manifest holds per-file entries.
         :param path: app path (must contain Manifest File)
+        :param file_cache: optional FileDigestCache
+        :param session: optional VerificationSession. Keeps generated digests for next verifications.
         :return: true/false, generated digests / None if digests can't be generated
         """
         ret_val = True
-        digests = Configuration._generate_app_digests(path)
-        if digests is not None:
-            try:
-                manifest = Configuration._read_app_manifest(path)
+        manifest = None
+        try:
+            manifest = Manifest.read(path)
+        except ConfigurationException as ce:
+            ret_val = False
+            print("Configuration._verify_manifest_digests() : Can't verify signatures : ", ce.value)
 
-                for key in digests.keys():
-                    if digests[key] != manifest[key]:
-                        ret_val = False
-                        print("Configuration._verify_manifest_digests() : Stored", key, "in Manifest file",
-                              manifest[key],
-                              "doesn't match with actual", key, "signature", digests[key])
-                    # else:
-                    #     print("Configuration._verify_manifest_digests() :", key, "matches", digests[key])
-            except ConfigurationException as ce:
-                ret_val = False
-                print("Configuration._verify_manifest_digests() : Can't verify signatures : ", ce.value)
+        if manifest is None:
+            return ret_val, Configuration._generate_app_digests(path, file_cache=file_cache, session=session)
+
+        digests = None
+        if os.path.exists(path):
+            try:
+                start = time.perf_counter()
+                actual, failure_list = manifest.verify(path, file_cache=file_cache)
+                digests = actual.digests
+                if session is not None and manifest.digest_format == DIGEST_FORMAT_STREAM:
+                    session.set_digests(path, digests, time.perf_counter() - start)
+                for rel_path, status in failure_list:
+                    print("Configuration._verify_manifest_digests() :", path, "file", repr(rel_path), status,
+                          "since Manifest was written")
+                if len(failure_list) > 0:
+                    ret_val = False
+            except Exception as e:
+                print(repr(e))
         else:
+            print("Configuration._verify_manifest_digests() : invalid path", path)
+
+        if digests is None:
             ret_val = False
 
+        if session is not None:
+            session.set_manifest_status(path, ret_val)
+
         return ret_val, digests
 
+    def _update_app_digests(self, app_id, digests):
+        """
+        Replace stored digests of an app without touching other fields nor firing events.
+        :param app_id: application id
+        :param digests: dict {SHA256, SHA512, WHIRLPOOL}
+        """
+        self._run_write(lambda cnx: cnx.execute(SQL_UPDATE_APP_DIGESTS, (digests["SHA256"],
+                                                                         digests["SHA512"],
+                                                                         digests["WHIRLPOOL"],
+                                                                         app_id)))
+        self._invalidate_model()
+
     def get_app_info_by_path(self, path):
         """
         Return app db record.
         :param path: application path
-        :return: row containing app fields, None if app doesn't exist
+        :return: AppRecord, None if app doesn't exist
         """
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP_BY_PATH, (path, ))
-        row = cursor.fetchone()
-        cursor.close()
-        self._close_sqlite()
-        return row
+        return self._select_record(AppRecord, SQL_SELECT_APP_BY_PATH, (path, ))
 
     def get_app_info(self, app_type, app_name):
         """
         Return app db record.
         :param app_type: application type
         :param app_name: application name
-        :return: row containing app fields, None if app doesn't exist
+        :return: AppRecord, None if app doesn't exist
+        """
+        return self._select_record(AppRecord, SQL_SELECT_APP, (app_type, app_name))
+
+    def _select_record(self, record_class, sql, params):
+        """
+        :param record_class: Record subclass. Its fields are sql columns, in the same order.
+        :return: first record, None if there is no row
         """
         cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP, (app_type, app_name))
+        # plain tuples, records are built from them
+        cursor.row_factory = None
+        cursor.execute(sql, params)
         row = cursor.fetchone()
         cursor.close()
-        self._close_sqlite()
-        return row
+        if row is None:
+            return None
+
+        return record_class(*row)
 
-    def update_inventory(self, app_type=None, fire_event=True):
+    def update_inventory(self, app_type=None, fire_event=True, parallel=False, processes=None, full=False):
         """
         Updates available app list. Fire on_app_add(self, addin_name) or on_app_del(self, addin_name)
-        on change
+        on change.
+
+        Inventory is incremental : apps whose directory fingerprint (see DigestEngine.fingerprint()) didn't change
+        since last inventory are skipped, their files are neither hashed nor read.
+
+        Each app type inventory is a set diff between known apps (one query) and app type directory (one listing).
+        Resulting add/update/disable/delete plan is applied in one transaction.
         :param app_type : update inventory for particular app_type (all types per default)
         :param fire_event : fire events per default. Set it to false to disable it.
+        :param parallel : hash apps and extract their metadata in a process pool first. db changes and events
+        are still applied by this process, in the same order as without parallel.
+        :param processes : process pool size. Cpu count if None.
+        :param full : verify all apps, whatever their fingerprint (audit)
         """
         if app_type is None:
-            for app_type in self.app_type_list:
-                self.update_inventory(app_type, fire_event)
+            app_type_list = self.app_type_list
         else:
-            #print("update_inventory()", app_type)
-            # get available app_type sub-packages watching for application
+            app_type_list = (app_type, )
+
+        plan_dict = {app_type: self._get_inventory_plan(app_type, full) for app_type in app_type_list}
+
+        # each app is hashed once per pass
+        with VerificationSession(self._file_digest_cache) as session:
+            if parallel:
+                self._scan_apps(plan_dict, session, processes)
+
+            for app_type in app_type_list:
+                self._apply_inventory_plan(plan_dict[app_type], fire_event, session)
+
+            session.print_timings()
+
+    @staticmethod
+    def _new_inventory_plan(app_type):
+        """
+        :return: empty inventory plan of app_type. See _get_inventory_plan().
+        """
+        return {'app_type': app_type, 'change_list': list(), 'del_list': list()}
+
+    def _get_inventory_plan(self, app_type, full=False):
+        """
+        Diff app type directory against known apps : one query for known apps, one directory listing.
+        :param app_type: app type
+        :param full: verify all apps
+        :return: dict {app_type,
+                       change_list : list of (app_name, app_id, fingerprint) of apps to add (app_id -1) or to
+                                     verify, in directory listing order. Known apps are verified when their
+                                     fingerprint changed or can't be trusted, and all of them when full is True.
+                       del_list : list of (app_name, app_id) of known apps which are not in directory anymore}
+        """
+        plan = Configuration._new_inventory_plan(app_type)
+        app_type_path = self.get_app_type_path(app_type)
+        if app_type_path is None:
+            return plan
+
+        known_dict = {row['name']: (row['rowid'], row['dir_fingerprint'])
+                      for row in self._sqlite.execute(SQL_SELECT_APP_DIR_FINGERPRINT, (app_type, ))}
+        module_set = set()
+        for _, app_name, is_package in pkgutil.iter_modules((app_type_path, )):
+            module_set.add(app_name)
+            if not is_package:
+                continue
+
+            fingerprint = DigestEngine.fingerprint(app_type_path + "\\" + app_name)
+            app_id, stored_fingerprint = known_dict.get(app_name, (-1, None))
+            if app_id < 0 or full or fingerprint is None or stored_fingerprint != fingerprint:
+                plan['change_list'].append((app_name, app_id, fingerprint))
+
+        plan['del_list'] = [(app_name, known_dict[app_name][0])
+                            for app_name in sorted(set(known_dict.keys()).difference(module_set))]
+        return plan
+
+    def _scan_apps(self, plan_dict, session, processes=None):
+        """
+        Hash apps and extract their metadata in a process pool. Results are stored in session.
+        :param plan_dict: dict {app_type: _get_inventory_plan() result}. Only changed apps are scanned.
+        :param session: VerificationSession of inventory pass
+        :param processes: process pool size. Cpu count if None.
+        """
+        app_list = list()
+        for app_type, plan in plan_dict.items():
             app_path = self.get_app_type_path(app_type)
-            app_list = list()
-            for _, app_name, is_package in pkgutil.iter_modules((app_path, )):
-                app_list.append(app_name)
-                if is_package and app_name not in self.get_available_app_list(app_type):
-                    self._app_add(app_type, app_name, fire_event)
-                elif is_package:
-                    # known app. Verify state.
-                    state = self.get_app_state(app_type, app_name)
-                    if state == -1:
-                        self.disable_app(app_type, app_name)
-                    elif state == 1:
-                        digests = self._generate_app_digests(app_path + "\\" + app_name)
-                        self._app_update(app_type, app_name, digests, fire_event)
-
-            # now we want to see app deletion
-            app_available_list = self.get_available_app_list(app_type)
-            for name in app_available_list:
-                if name not in app_list:
-                    self._app_del(app_type, name, fire_event)
+            for app_name, app_id, _ in plan['change_list']:
+                # metadata of apps unchanged since last inventory are not read
+                stored_digests = None
+                if app_id > 0:
+                    app_info = self.get_app_info(app_type, app_name)
+                    if app_info is not None:
+                        stored_digests = {key: app_info[key] for key in ('SHA256', 'SHA512', 'WHIRLPOOL')}
+                app_list.append((app_type, app_name, app_path + "\\" + app_name, stored_digests))
+
+        for scan in AppScanner(processes).scan(app_list, self._file_digest_cache):
+            session.set_digests(scan['path'], scan['digests'], scan['hash_time'])
+            if scan['manifest_status'] is not None:
+                session.set_manifest_status(scan['path'], scan['manifest_status'])
+            if scan['metadata'] is not None:
+                session.set_metadata(scan['path'], scan['metadata'])
+
+    def _apply_inventory_plan(self, plan, fire_event, session):
+        """
+        Verify apps of an inventory plan, then apply its db changes in one transaction : new apps are added,
+        changed apps updated, corrupted apps disabled and deleted apps removed. Apps are hashed and read before
+        the transaction begins. Events are fired once changes are committed, in plan order.
+        :param plan: _get_inventory_plan() result
+        :param fire_event: fire on_app_add, on_app_update and on_app_del if True. on_app_disable is always fired.
+        :param session: VerificationSession
+        :return: names of change_list apps processed by the plan : added, updated, disabled as corrupted or left
+        unchanged, so known after inventory. Apps which couldn't be added and deleted apps are not in it. Empty set
+        if no change_list app was processed.
+        """
+        app_type = plan['app_type']
+        action_list = list()
+        for app_name, app_id, fingerprint in plan['change_list']:
+            action = None
+            app_data = None
+            verified = True
+            if app_id < 0:
+                app_data = self._prepare_app_add(app_type, app_name, session)
+                if app_data is None:
+                    continue
+                action = "on_app_add"
+            else:
+                state = self.get_app_state(app_type, app_name, session)
+                if state == -1:
+                    action = "on_app_disable"
+                    # corrupted app : trust of its last verification is dropped, see write()
+                    verified = False
+                elif state == 1:
+                    app_data = self._prepare_app_update(app_type, app_name, session=session)
+                    if app_data is not None:
+                        action = "on_app_update"
+                    else:
+                        # stale db digests and metadata : app must be verified again on next pass
+                        verified = False
+            action_list.append((action, app_name, app_id, fingerprint, app_data, verified))
+
+        if len(action_list) == 0 and len(plan['del_list']) == 0:
+            return set()
+
+        app_type_path = self.get_app_type_path(app_type)
+        verified_at = time.time()
+
+        def write(cnx):
+            event_list = list()
+            verified_list = list()
+            for action, app_name, app_id, fingerprint, app_data, verified in action_list:
+                if action == "on_app_add":
+                    Configuration._write_app_add(cnx, app_data)
+                    event_list.append((action, (app_type, app_name)))
+                elif action == "on_app_update":
+                    Configuration._write_app_update(cnx, app_id, app_data)
+                    event_list.append((action, (app_type, app_name)))
+                elif action == "on_app_disable":
+                    for app_status in Configuration._write_apps_status(cnx, ((app_type, app_name, None), ), False):
+                        event_list.append((action, app_status))
+                # fingerprints taken before verification : files changed meanwhile are verified again on next pass
+                if verified:
+                    verified_list.append((fingerprint, verified_at, app_type, app_name))
+                elif action == "on_app_disable":
+                    # launched only once verified again, even if enabled meanwhile
+                    verified_list.append((None, None, app_type, app_name))
+            cnx.executemany(SQL_UPDATE_APP_VERIFIED, verified_list)
+
+            for app_name, app_id in plan['del_list']:
+                print("_app_del()", app_type, app_name)
+                Configuration._write_app_del(cnx, app_id)
+                self._file_digest_cache.forget(app_type_path + "\\" + app_name, cnx)
+                event_list.append(("on_app_del", (app_type, app_name)))
+            return event_list
+
+        event_list = self._run_write(write)
+        self._invalidate_model()
+
+        for event, args in event_list:
+            if event == "on_app_disable":
+                print("Disabled {} app for {}".format(args[1], args[2]))
+                self._fire_event(event, args)
+            elif fire_event:
+                self._fire_event(event, args)
+
+        return set(app_name for _, app_name, _, _, _, _ in action_list)
+
+    def refresh_app(self, app_type, app_name, fire_event=True):
+        """
+        Update inventory of one app after a change of its files : add, update, disable or delete it. Used by
+        AppWatcher (see appwatcher.py).
+        :param app_type: app type
+        :param app_name: app name
+        :param fire_event: fire events if True
+        :return: True if app is known after refresh
+        :raise: ConfigurationException if app_type doesn't exist
+        """
+        app_type_path = self.get_app_type_path(app_type)
+        if app_type_path is None:
+            mesg = "Configuration.refresh_app() : Given app_type {} doesn't exist !".format(app_type)
+            print(mesg)
+            raise ConfigurationException(mesg)
+
+        app_path = app_type_path + "\\" + app_name
+        app_id = self._get_app_id(app_type, app_name)
+        plan = Configuration._new_inventory_plan(app_type)
+        if not os.path.isfile(app_path + "\\__init__.py"):
+            # not a package (anymore)
+            if app_id > 0:
+                plan['del_list'].append((app_name, app_id))
+        else:
+            # taken before verification : files changed meanwhile are verified again
+            plan['change_list'].append((app_name, app_id, DigestEngine.fingerprint(app_path)))
+
+        with VerificationSession(self._file_digest_cache) as session:
+            known_set = self._apply_inventory_plan(plan, fire_event, session)
+
+        return app_name in known_set
+
+    def verify_app(self, app_type, app_name, com_app):
+        """
+        Verify one app now, whatever its fingerprint : corrupted app is disabled, changed app is updated (see
+        refresh_app()). Used by kernel before launching an app it doesn't trust, and in background for others (see
+        verificationscheduler.py).
+        :param app_type: app type
+        :param app_name: app name
+        :param com_app: com_app app is launched in
+        :return: True if app can be launched : it is still enabled for com_app after verification
+        :raise: ConfigurationException if app_type doesn't exist
+        """
+        self.refresh_app(app_type, app_name)
+        return com_app in self.get_app_com_app_list(app_type, app_name, True)
 
     def get_com_app_list(self):
         """Return com_app list from config
         :return: list() with com_app_name
         """
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_ALL_COM_APP)
-        com_apps_name = list()
-        for row in cursor:
-            com_apps_name.append(row['short_name'])
+        return list(self._model.com_app_list)
+
+    def _check_app_available(self, app_type, app_name, method_name, available_dict=None):
+        """
+        :param app_type: application type
+        :param app_name: application name
+        :param method_name: calling method name, for error message
+        :param available_dict: optional dict {app_type: available app list}, filled on demand
+        :raise: ConfigurationException if app_type or app doesn't exists
+        """
+        if available_dict is None:
+            available_dict = dict()
 
+        if app_type not in self.app_type_list:
+            mesg = "Configuration.{}() : Given app_type {} doesn't exist !\nAvailable app_type are {}.".format(
+                method_name, app_type, self.app_type_list)
+            print(mesg)
+            raise ConfigurationException(mesg)
+
+        if app_type not in available_dict:
+            available_dict[app_type] = self.get_available_app_list(app_type)
+        if app_name not in available_dict[app_type]:
+            mesg = "Configuration.{}() : Can't change unavailable {} app !\nAvailable apps are {}.".format(
+                method_name, app_name, repr(available_dict[app_type]))
+            print(mesg)
+            raise ConfigurationException(mesg)
+
+    @staticmethod
+    def _write_apps_status(cnx, change_list, enabled):
+        """
+        Change status of app/com_app links with one UPDATE, in caller write transaction.
+        :param cnx: connection holding write transaction
+        :param change_list: list of (app_type, app_name, com_app). com_app None stands for all app com_app.
+        :param enabled: new status
+        :return: tuple of (app_type, app_name, com_app_tuple) which status changed, in change_list order
+        """
+        # actual status is read once write lock is held
+        com_app_dict = dict()
+        app_list = list()
+        cursor = cnx.cursor()
+        cursor.execute(SQL_CREATE_TEMP_APP_STATUS_CHANGE)
+        for app_type, app_name, com_app in change_list:
+            sql, params = Configuration._get_app_list_query(SQL_SELECT_APP_STATUS_WHERE, app_type=app_type,
+                                                            app_name=app_name, com_app=com_app,
+                                                            enabled=not enabled)
+            for row in cnx.execute(sql, params).fetchall():
+                cursor.execute(SQL_INSERT_APP_STATUS_CHANGE, (row['id'], ))
+                if cursor.rowcount == 0:
+                    # already in change set
+                    continue
+                key = (app_type, app_name)
+                if key not in com_app_dict:
+                    com_app_dict[key] = list()
+                    app_list.append(key)
+                com_app_dict[key].append(row['com_app'])
+
+        cursor.execute(SQL_UPDATE_APP_WORKS_WITH_COM_APP, (enabled, ))
+        cursor.execute(SQL_DELETE_APP_STATUS_CHANGE)
         cursor.close()
-        self._close_sqlite()
-        return com_apps_name
+        return tuple((app_type, app_name, tuple(com_app_dict[(app_type, app_name)]))
+                     for app_type, app_name in app_list)
+
+    def _set_apps_status(self, change_list, enabled):
+        """
+        Change status of app/com_app links in one transaction, with one UPDATE.
+        :param change_list: list of (app_type, app_name, com_app). com_app None stands for all app com_app.
+        :param enabled: new status
+        :return: tuple of (app_type, app_name, com_app_tuple) which status changed, in change_list order
+        :raise: ConfigurationException if db can't be updated
+        """
+        try:
+            app_status_tuple = self._run_write(lambda cnx: Configuration._write_apps_status(cnx, change_list,
+                                                                                            enabled))
+        except sqlite3.Error as e:
+            mesg = "Configuration._set_apps_status() : can't change apps status : " + repr(e)
+            print(mesg)
+            raise ConfigurationException(mesg)
+
+        self._invalidate_model()
+        return app_status_tuple
+
+    def _set_apps_status_and_fire(self, change_list, enabled, method_name, event_method):
+        """
+        Check and apply a change set, then fire one event listing changes.
+        :return: tuple of (app_type, app_name, com_app_tuple) which status changed
+        """
+        change_list = list(change_list)
+        available_dict = dict()
+        for app_type, app_name, _ in change_list:
+            self._check_app_available(app_type, app_name, method_name, available_dict)
+
+        app_status_tuple = self._set_apps_status(change_list, enabled)
+        if len(app_status_tuple) > 0:
+            self._fire_event(event_method, (app_status_tuple, ))
+
+        return app_status_tuple
+
+    def enable_apps(self, change_list):
+        """
+        Enables a set of app/com_app in one transaction. Fires one on_apps_enable event.
+        :param change_list: iterable of (app_type, app_name, com_app). com_app None enables app for all its com_app.
+        :return: tuple of (app_type, app_name, com_app_tuple) which have been enabled. Empty if nothing changed.
+        :raise: ConfigurationException if an app_type or app doesn't exists. Nothing is changed then.
+        """
+        return self._set_apps_status_and_fire(change_list, True, "enable_apps", "on_apps_enable")
+
+    def disable_apps(self, change_list):
+        """
+        Disables a set of app/com_app in one transaction. Fires one on_apps_disable event.
+        :param change_list: iterable of (app_type, app_name, com_app). com_app None disables app for all its com_app.
+        :return: tuple of (app_type, app_name, com_app_tuple) which have been disabled. Empty if nothing changed.
+        :raise: ConfigurationException if an app_type or app doesn't exists. Nothing is changed then.
+        """
+        return self._set_apps_status_and_fire(change_list, False, "disable_apps", "on_apps_disable")
 
     def enable_app(self, app_type, app_name, com_app=None):
         """
@@ -531,44 +1184,18 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :return: True if enabling at least on app/com_app succeed, False instead
         :raise: ConfigurationException if app_type or app doesn't exists
         """
-
-        if app_type not in self.app_type_list:
-            mesg = "Configuration.enable_app() : Given app_type {} doesn't exist !\nAvailable app_type are {}.".format(
-                app_type, self.app_type_list)
-            print(mesg)
-            raise ConfigurationException(mesg)
-        elif app_name not in self.get_available_app_list(app_type):
-            mesg = "Configuration.enable_app() : Can't enable unavailable {} app !\nAvailable apps are {}.".format(
-                app_name, repr(self.get_available_app_list(app_type)))
-            print(mesg)
-            raise ConfigurationException(mesg)
+        self._check_app_available(app_type, app_name, "enable_app")
+
+        app_status_tuple = self._set_apps_status(((app_type, app_name, com_app), ), True)
+        if len(app_status_tuple) > 0:
+            print("Enabled {} app for {}".format(app_name, app_status_tuple[0][2]))
+            #fire on_addin_enable event
+            self._fire_event("on_app_enable", app_status_tuple[0])
+            ret_val = True
         else:
-            #get app/com_app status
-            app_status_list = self.get_app_list(app_type=app_type, app_name=app_name, com_app=com_app)
-
-            #iterate over app_status_list
-            enabled_com_app_tuple = list()
-            for item in app_status_list:
-                #skip enabled app/com_app
-                if item['enabled'] == 1:
-                    mesg = "Configuration.enable_app() : app {} is already enabled for {} !".format(app_name,
-                                                                                                    com_app)
-                    print(mesg)
-                else:
-                    print("Enabling {} app for {}...".format(app_name, item['com_app']))
-                    cnx = self._sqlite
-                    cursor = cnx.cursor()
-                    cursor.execute(SQL_UPDATE_APP_WORKS_WITH_COM_APP, (True, app_type, app_name, item['com_app']))
-                    cnx.commit()
-                    enabled_com_app_tuple.append(item['com_app'])
-                    cursor.close()
-                    self._close_sqlite()
-            if len(enabled_com_app_tuple) > 0:
-                #fire on_addin_enable event
-                self._fire_event("on_app_enable", (app_type, app_name, tuple(enabled_com_app_tuple)))
-                ret_val = True
-            else:
-                ret_val = False
+            mesg = "Configuration.enable_app() : app {} is already enabled for {} !".format(app_name, com_app)
+            print(mesg)
+            ret_val = False
 
         return ret_val
 
@@ -582,43 +1209,18 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :return: True if disabling at least on app/com_app succeed, False instead
         :raise: ConfigurationException if app_type/app doesn't exists
         """
-        if app_type not in self.app_type_list:
-            mesg = "Configuration.enable_app() : Given app_type {} doesn't exist !\nAvailable app_type are {}.".format(
-                app_type, self.app_type_list)
-            print(mesg)
-            raise ConfigurationException(mesg)
-        elif app_name not in self.get_available_app_list(app_type):
-            mesg = "Configuration.enable_app() : Can't enable unavailable {} app !\nAvailable apps are {}.".format(
-                app_name, repr(self.get_available_app_list(app_type)))
-            print(mesg)
-            raise ConfigurationException(mesg)
+        self._check_app_available(app_type, app_name, "disable_app")
+
+        app_status_tuple = self._set_apps_status(((app_type, app_name, com_app), ), False)
+        if len(app_status_tuple) > 0:
+            print("Disabled {} app for {}".format(app_name, app_status_tuple[0][2]))
+            #fire on_addin_disable event
+            self._fire_event("on_app_disable", app_status_tuple[0])
+            ret_val = True
         else:
-            #get app/com_app status
-            app_status_list = self.get_app_list(app_type=app_type, app_name=app_name, com_app=com_app)
-
-            #iterate over app_status_list
-            disabled_com_app_tuple = list()
-            for item in app_status_list:
-                #skip enabled app/com_app
-                if item['enabled'] == 0:
-                    mesg = "Configuration.disable_app() : app {} is already disabled for {} !".format(app_name,
-                                                                                                      com_app)
-                    print(mesg)
-                else:
-                    print("Disabling {} app for {}...".format(app_name, item['com_app']))
-                    cnx = self._sqlite
-                    cursor = cnx.cursor()
-                    cursor.execute(SQL_UPDATE_APP_WORKS_WITH_COM_APP, (False, app_type, app_name, item['com_app']))
-                    cnx.commit()
-                    disabled_com_app_tuple.append(item['com_app'])
-                    cursor.close()
-                    self._close_sqlite()
-            if len(disabled_com_app_tuple) > 0:
-                #fire on_addin_enable event
-                self._fire_event("on_app_disable", (app_type, app_name, tuple(disabled_com_app_tuple)))
-                ret_val = True
-            else:
-                ret_val = False
+            mesg = "Configuration.disable_app() : app {} is already disabled for {} !".format(app_name, com_app)
+            print(mesg)
+            ret_val = False
 
         return ret_val
 
@@ -630,19 +1232,13 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :return: disabled app list, None if app_type and/or com_app doesn't exist
         """
         disabled_app_list = None
-        if app_type in self.app_type_list and com_app in self.get_com_app_list():
-            app_list = self.get_app_list(app_type=app_type, com_app=com_app, enabled=False)
-            if app_list is None:
-                app_list = list()
-
-            disabled_app_list = list()
-            for row in app_list:
-                disabled_app_list.append(row["app_name"])
+        model = self._model
+        if app_type in self.app_type_list and model.get_com_app_id(com_app) != -1:
+            disabled_app_list = model.get_status_app_list(app_type, com_app, False)
 
         return disabled_app_list
 
     def get_enabled_app_list(self, app_type, com_app):
-        #TODO : replace with get_app_list()
         """
         Returns enabled app list for given app_type and com_app
         :param app_type: TransitionAppType
@@ -650,41 +1246,65 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :return: enabled app list, None if app_type and/or com_app doesn't exist
         """
         enabled_app_list = None
-        if app_type in self.app_type_list and com_app in self.get_com_app_list():
-            app_list = self.get_app_list(app_type=app_type, com_app=com_app, enabled=True)
-            if app_list is None:
-                app_list = list()
-
-            enabled_app_list = list()
-            for row in app_list:
-                enabled_app_list.append(row["app_name"])
+        model = self._model
+        if app_type in self.app_type_list and model.get_com_app_id(com_app) != -1:
+            enabled_app_list = model.get_status_app_list(app_type, com_app, True)
 
         return enabled_app_list
 
+    def get_app_com_app_list(self, app_type, app_name, enabled=None):
+        """
+        Returns com_app list of an app
+        :param app_type: application type
+        :param app_name: application name
+        :param enabled: None for all com_app app works with, True/False for com_app app is enabled/disabled for
+        :return: com_app list, empty if app doesn't exist
+        """
+        return self._model.get_app_com_app_list(app_type, app_name, enabled)
+
+    def get_app_status_matrix(self):
+        """
+        Returns status of all apps in all com_app, in one call. Bit i of masks stands for i-th com_app.
+
+            com_app_tuple, app_status_tuple = config.get_app_status_matrix()
+            for app_type, app_name, available_mask, enabled_mask in app_status_tuple:
+                excel_enabled = enabled_mask >> com_app_tuple.index('excel') & 1
+
+        :return: (com_app tuple, tuple of (app_type, app_name, available mask, enabled mask))
+        """
+        return self._model.get_status_matrix()
+
     def get_available_app_list(self, app_type, com_app=None):
         """
         Returns available app list for given app_type
         :param app_type: TransitionAppType
-        :param com_app: If specified, only return available apps for specified com_app
+        :param com_app: If specified, only return available apps for one of specified com_app (tuple or any
+        iterable of com_app names)
         :return: available app list
-        :raise: ConfigurationException() if com_app parameter is not None or Tuple()
+        :raise: ConfigurationException() if com_app parameter is not None or an iterable of com_app
         """
-        cursor = self._sqlite.cursor()
         if com_app is None:
-            cursor.execute(SQL_SELECT_APP_LIST_BY_TYPE, (app_type, ))
-        elif isinstance(com_app, tuple):
-            com_app_tuple = ''
-            for app in com_app:
-                if len(com_app_tuple) == 0:
-                    com_app_tuple += "'" + app + "'"
-                else:
-                    com_app_tuple += ", '" + app + "'"
-
-            cursor.execute(SQL_SELECT_APP_LIST_BY_TYPE_AND_COM_APP.format(com_app_tuple), (app_type,))
+            return self._model.get_available_app_list(app_type)
         else:
-            mesg = "get_available_app_list() : com_app parameter must be None or Tuple(). Get " + repr(com_app)
-            print(mesg)
-            raise ConfigurationException(mesg)
+            try:
+                if isinstance(com_app, str):
+                    raise TypeError()
+                com_app_list = list(com_app)
+            except TypeError:
+                mesg = "get_available_app_list() : com_app parameter must be None or Tuple(). Get " + repr(com_app)
+                print(mesg)
+                raise ConfigurationException(mesg)
+
+            # 1, 2, 4, 8... placeholders, padded with NULL which matches nothing
+            placeholder_count = 1
+            while placeholder_count < len(com_app_list):
+                placeholder_count *= 2
+            com_app_list += [None] * (placeholder_count - len(com_app_list))
+            sql = SQL_SELECT_APP_LIST_BY_TYPE_AND_COM_APP.format(", ".join("?" * placeholder_count))
+            params = [app_type] + com_app_list
+
+        cursor = self._sqlite.cursor()
+        cursor.execute(sql, params)
 
         available_app_list = list()
 
@@ -692,67 +1312,81 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
             available_app_list.append(row["name"])
 
         cursor.close()
-        self._close_sqlite()
         return available_app_list
 
     def get_app_list(self, app_type=None, app_name=None, com_app=None, enabled=None):
         """
-        Return a filtered row[] list() of available apps.
+        Return a filtered AppComAppStatus list() of available apps.
         :param app_type: filter list on given app_type. Default is None: don't filter
         :param app_name: filter list on given app_name. Default is None: don't filter
         :param com_app: filter list on given com_app. Default is None: don't filter
         :param enabled: filter list on enabled flag. Default is None: don't filter
-        :return: list of row. None if no records are found
+        :return: list of AppComAppStatus. None if no records are found
         """
+        sql, params = Configuration._get_app_list_query(app_type=app_type, app_name=app_name, com_app=com_app,
+                                                        enabled=enabled)
         cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP_WORKS_WITH_COM_APP)
-
-        app_list = list()
-        for row in cursor:
-            app_list.append(row)
-            if ((app_type is not None and app_type != row['app_type'])
-                or (app_name is not None and app_name != row['app_name'])
-                or (com_app is not None and com_app != row['com_app'])
-                    or (enabled is not None and enabled != row['enabled'])):
-                app_list.remove(row)
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        app_list = [AppComAppStatus(*row) for row in cursor]
 
         if len(app_list) == 0:
             app_list = None
 
         cursor.close()
-        self._close_sqlite()
         return app_list
 
+    @staticmethod
+    def _get_app_list_query(sql=SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE, **filters):
+        """
+        Build get_app_list() query. Filters set to None are left out.
+        There are 16 possible statements, so they stay in sqlite prepared statements cache.
+        :param sql: select statement, with a WHERE {} placeholder
+        :param filters: app_type, app_name, com_app, enabled values
+        :return: sql, params tuple
+        """
+        condition_list = list()
+        params = list()
+        for name, condition in SQL_APP_LIST_FILTER:
+            value = filters.get(name)
+            if value is not None:
+                condition_list.append(condition)
+                params.append(value)
+
+        if len(condition_list) == 0 and sql == SQL_SELECT_APP_WORKS_WITH_COM_APP_WHERE:
+            return SQL_SELECT_APP_WORKS_WITH_COM_APP, tuple()
+        elif len(condition_list) == 0:
+            condition_list.append("1 = 1")
+
+        return sql.format("\nAND ".join(condition_list)), tuple(params)
+
     def _get_app_type_id(self, app_type):
         """Return app_type_id from its name"""
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP_TYPE_ID, (app_type, ))
-        row = cursor.fetchone()
-        if row is not None:
-            app_id = row["rowid"]
-        else:
-            app_id = -1
-
-        cursor.close()
-        self._close_sqlite()
-        return app_id
+        return self._model.get_app_type_id(app_type)
 
     def _get_com_app_type_id(self, com_app):
         """Return com_app_id from its name
         :param com_app: com application name
         :return: com application id in db
         """
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_COM_APP, (com_app, ))
-        row = cursor.fetchone()
-        if row is not None:
-            app_id = row["rowid"]
-        else:
-            app_id = -1
+        return self._model.get_com_app_id(com_app)
 
-        cursor.close()
-        self._close_sqlite()
-        return app_id
+    def _get_com_app_id_list(self, com_app_list, method_name):
+        """
+        :param com_app_list: com_app names
+        :param method_name: calling method name, for warnings
+        :return: ids of known com_app. Unknown com_app are ignored with a warning.
+        """
+        com_app_id_list = list()
+        for com_app in com_app_list:
+            com_app_id = self._get_com_app_type_id(com_app)
+            if com_app_id > 0:
+                com_app_id_list.append(com_app_id)
+            else:
+                #display warning
+                print("{}() : WARNING : ignore com_app link. com_app '{}' is unknown !".format(method_name, com_app))
+
+        return com_app_id_list
 
     def _get_app_id(self, app_type, app_name):
         """Return app_id from its name and type
@@ -760,43 +1394,14 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         :param app_name: name of application
         :return: application id in db or -1 if app doesn't exist in db
         """
-        cursor = self._sqlite.cursor()
-        cursor.execute(SQL_SELECT_APP_ID, (app_type, app_name))
-        row = cursor.fetchone()
-        if row is None:
-            app_id = -1
-        else:
-            app_id = row["rowid"]
-
-        cursor.close()
-        self._close_sqlite()
-        return app_id
+        return self._model.get_app_id(app_type, app_name)
 
     @staticmethod
     def _get_app_info_from_desc(desc):
         """Extract author and version from app_description
         :param desc: application description
         """
-        import re
-
-        author = ''
-        version = ''
-
-        if isinstance(desc, str):
-            matches = re.finditer("Author:\s+(.+)+\n", desc, re.M)
-            print(repr(matches))
-            for m in matches:
-                if m is not None:
-                    if author == '':
-                        author = m.group(1)
-                    else:
-                        author += '\n' + m.group(1)
-
-            m = re.search("Version:\s+(.+)\n", desc)
-            if m is not None:
-                version = m.group(1)
-
-        return author, version
+        return AppMetadata.parse_description(desc)
 
     @staticmethod
     def _app_import(app_type, app_name):
@@ -823,70 +1428,147 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
 
         return module
 
-    def _app_add(self, app_type, app_name, fire_event=True):
+    def _get_app_metadata(self, app_type, app_name, session=None):
         """
-        add an application and its info to db. Status is disabled.
+        Read app metadata from app source, or from session if app was scanned before.
+        :param app_type: app type
+        :param app_name: app name
+        :param session: optional VerificationSession
+        :return: AppMetadata dict {description, author, version, com_app, app_type, app_class} or None if app
+        metadata can't be read
+        """
+        app_path = self.get_app_type_path(app_type) + "\\" + app_name
+        if session is not None:
+            metadata = session.get_metadata(app_path)
+            if metadata is not None:
+                return metadata
+
+        # app code is not executed, unless import_fallback is set
+        metadata = AppMetadata.extract(app_type, app_name, app_path, self.import_fallback)
+        if metadata is None or metadata['com_app'] is None:
+            print("_get_app_metadata() : ERROR : can't read com_app of {}.{}. {} is not registerable".format(
+                app_type, app_name, app_name))
+            return None
+
+        return metadata
+
+    def get_app_metadata(self, app_type, app_name, session=None):
+        """
+        Get app metadata. Metadata stored in db are valid as long as app digests match db digests : app source
+        is only read when app changed since last inventory. App code is never imported.
+        :param app_type: app type
+        :param app_name: app name
+        :param session: optional VerificationSession
+        :return: dict {description, author, version, com_app, app_class} or None if app isn't registered
+        """
+        app_info = self.get_app_info(app_type, app_name)
+        if app_info is None:
+            return None
+
+        digest_ok, _ = self._verify_db_digests(app_info['path'], session)
+        if not digest_ok:
+            return self._get_app_metadata(app_type, app_name, session)
+
+        cursor = self._sqlite.cursor()
+        cursor.execute(SQL_SELECT_COM_APP_BY_APP_ID, (app_info['rowid'], ))
+        com_app = tuple(row['short_name'] for row in cursor)
+        cursor.close()
+
+        return {'description': app_info['description'],
+                'author': app_info['author'],
+                'version': app_info['version'],
+                'com_app': com_app,
+                'app_class': app_info['app_class']}
+
+    def _prepare_app_add(self, app_type, app_name, session=None):
+        """
+        Read metadata and digests of a new app. db is not changed.
         :param app_type: app type (docapp, addin)
         :param app_name: app name
-        :param fire_event: Can be set to False to add app silently
-        :return: app_id or -1 on error
+        :param session: optional VerificationSession
+        :return: app data for _write_app_add() or None if app can't be added
         """
         print("_app_add()", app_type, app_name)
         app_path = self.get_app_type_path(app_type) + "\\" + app_name
-        ret_val = -1
+        app_data = None
 
         if self._get_app_id(app_type, app_name) < 0:
 
-            module = self._app_import(app_type, app_name)
-            if module is not None:
-                app_desc = self._get_app_desc(app_type, app_name)
-                author, version = Configuration._get_app_info_from_desc(app_desc)
-                digest = self._generate_app_digests(app_path)
+            metadata = self._get_app_metadata(app_type, app_name, session)
+            if metadata is not None:
+                works_with = metadata['com_app']
+                digest = self._generate_app_digests(app_path, file_cache=self._file_digest_cache, session=session)
 
-                works_with = module.com_app
                 app_type_id = self._get_app_type_id(app_type)
                 if app_type_id > 0:
-                    cnx = self._sqlite
-                    cursor = cnx.cursor()
-                    print(SQL_INSERT_APP)
-                    cursor.execute(SQL_INSERT_APP, (app_name,
-                                                    author,
-                                                    version,
-                                                    app_desc,
-                                                    app_path,
-                                                    app_type_id,
-                                                    digest["SHA256"],
-                                                    digest["SHA512"],
-                                                    digest["WHIRLPOOL"]))
-
-                    #Insert links with com_app
-                    cnx.commit()
-                    app_id = self._get_app_id(app_type, app_name)
-                    for com_app in works_with:
-                        com_app_id = self._get_com_app_type_id(com_app)
-                        if com_app_id > 0:
-                            cursor.execute(SQL_INSERT_APP_WORKS_WITH_COM_APP, (app_id, com_app_id, False))
-                        else:
-                            #display warning
-                            print("_app_add() : WARNING : ignore com_app link. com_app '{}' is unknown !"
-                                  .format(com_app))
-
-                    cnx.commit()
-
-                    if fire_event:
-                        self._fire_event("on_app_add", (app_type, app_name))
-
-                    cursor.close()
-                    self._close_sqlite()
-                    ret_val = self._get_app_id(app_type, app_name)
+                    com_app_id_list = self._get_com_app_id_list(works_with, "_app_add")
+                    app_data = ((app_name,
+                                 metadata['author'],
+                                 metadata['version'],
+                                 metadata['description'],
+                                 app_path,
+                                 app_type_id,
+                                 digest["SHA256"],
+                                 digest["SHA512"],
+                                 digest["WHIRLPOOL"],
+                                 metadata['app_class']),
+                                com_app_id_list)
             else:
-                print("_app_add() : module is not importable ! see previous messages.")
+                print("_app_add() : app metadata can't be read ! see previous messages.")
         else:
             print("_app_add() : ERROR : app_type {} is unknown !".format(app_type))
             print("_app_add() : ERROR : {} is not registerable".format(app_name))
 
+        return app_data
+
+    @staticmethod
+    def _write_app_add(cnx, app_data):
+        """
+        Insert an app and its links with com_app, in caller write transaction. Status is disabled.
+        :param cnx: connection holding write transaction
+        :param app_data: _prepare_app_add() result
+        :return: app_id
+        """
+        app_values, com_app_id_list = app_data
+        print(SQL_INSERT_APP)
+        app_id = cnx.execute(SQL_INSERT_APP, app_values).lastrowid
+
+        #Insert links with com_app
+        cnx.executemany(SQL_INSERT_APP_WORKS_WITH_COM_APP,
+                        [(app_id, com_app_id, False) for com_app_id in com_app_id_list])
+        return app_id
+
+    def _app_add(self, app_type, app_name, fire_event=True, session=None):
+        """
+        add an application and its info to db. Status is disabled.
+        :param app_type: app type (docapp, addin)
+        :param app_name: app name
+        :param fire_event: Can be set to False to add app silently
+        :param session: optional VerificationSession
+        :return: app_id or -1 on error
+        """
+        app_data = self._prepare_app_add(app_type, app_name, session)
+        if app_data is None:
+            return -1
+
+        ret_val = self._run_write(lambda cnx: Configuration._write_app_add(cnx, app_data))
+        self._invalidate_model()
+
+        if fire_event:
+            self._fire_event("on_app_add", (app_type, app_name))
+
         return ret_val
 
+    @staticmethod
+    def _write_app_del(cnx, app_id):
+        """
+        Delete an app and its links with com_app, in caller write transaction.
+        :param cnx: connection holding write transaction
+        :param app_id: application id
+        """
+        cnx.execute(SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID, (app_id, ))
+        cnx.execute(SQL_DELETE_APP_BY_ID, (app_id, ))
+
     def _app_del(self, app_type, app_name, fire_event=True):
         """
         Remove application from db
@@ -899,13 +1581,14 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         print("_app_del()", app_type, app_name)
         app_id = self._get_app_id(app_type, app_name)
         if app_id > 0:
-            cnx = self._sqlite
-            cursor = cnx.cursor()
-            cursor.execute(SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID, (app_id, ))
-            cursor.execute(SQL_DELETE_APP_BY_ID, (app_id, ))
-            cnx.commit()
-            cursor.close()
-            self._close_sqlite()
+            app_path = self.get_app_type_path(app_type) + "\\" + app_name
+
+            def write(cnx):
+                Configuration._write_app_del(cnx, app_id)
+                self._file_digest_cache.forget(app_path, cnx)
+
+            self._run_write(write)
+            self._invalidate_model()
             if fire_event:
                 self._fire_event("on_app_del", (app_type, app_name))
         else:
@@ -913,7 +1596,51 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
 
         return app_id
 
-    def _app_update(self, app_type, app_name, digests, fire_event=True):
+    def _prepare_app_update(self, app_type, app_name, digests=None, session=None):
+        """
+        Read metadata and digests of a changed app. db is not changed.
+        :param app_type: app type
+        :param app_name: app name
+        :param digests: app digests. Generated (once per session) if None.
+        :param session: optional VerificationSession
+        :return: app data for _write_app_update() or None if app metadata can't be read
+        """
+        metadata = self._get_app_metadata(app_type, app_name, session)
+        if digests is None:
+            digests = self._generate_app_digests(self.get_app_type_path(app_type) + "\\" + app_name,
+                                                 file_cache=self._file_digest_cache, session=session)
+        if metadata is None or digests is None:
+            print("_app_update() : app metadata can't be read ! see previous messages.")
+            return None
+
+        com_app_id_list = self._get_com_app_id_list(metadata['com_app'], "_app_update")
+        return ((metadata['author'],
+                 metadata['version'],
+                 metadata['description'],
+                 digests["SHA256"],
+                 digests["SHA512"],
+                 digests["WHIRLPOOL"],
+                 metadata['app_class']),
+                com_app_id_list)
+
+    @staticmethod
+    def _write_app_update(cnx, app_id, app_data):
+        """
+        Update app fields and its links with com_app, in caller write transaction.
+        :param cnx: connection holding write transaction
+        :param app_id: application id
+        :param app_data: _prepare_app_update() result
+        """
+        app_values, com_app_id_list = app_data
+        print(SQL_UPDATE_APP)
+        cnx.execute(SQL_UPDATE_APP, app_values + (app_id, ))
+
+        #Insert relations with com_app
+        cnx.execute(SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID, (app_id, ))
+        cnx.executemany(SQL_INSERT_APP_WORKS_WITH_COM_APP,
+                        [(app_id, com_app_id, False) for com_app_id in com_app_id_list])
+
+    def _app_update(self, app_type, app_name, digests=None, fire_event=True, session=None):
         """
         Update app info fields and work_with association.
 
@@ -927,48 +1654,20 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
 
         :param app_type
         :param app_name
-        :param digests
+        :param digests: app digests. Generated (once per session) if None.
         :param fire_event
+        :param session: optional VerificationSession
         :return app_id or -1 if app doesn't exists
         """
 
         app_id = self._get_app_id(app_type, app_name)
         if app_id > 0:
-            module = self._app_import(app_type, app_name)
-            if module is not None:
-                app_desc = self._get_app_desc(app_type, app_name)
-                author, version = Configuration._get_app_info_from_desc(app_desc)
-                works_with = module.com_app
-                cnx = self._sqlite
-                cursor = cnx.cursor()
-                print(SQL_INSERT_APP)
-                cursor.execute(SQL_UPDATE_APP, (author,
-                                                version,
-                                                app_desc,
-                                                digests["SHA256"],
-                                                digests["SHA512"],
-                                                digests["WHIRLPOOL"],
-                                                app_id))
-
-                #Insert relations with com_app
-                cursor.execute(SQL_DELETE_APP_WORKS_WITH_COM_APP_BY_ID, (app_id, ))
-
-                for com_app in works_with:
-                    com_app_id = self._get_com_app_type_id(com_app)
-                    if com_app_id > 0:
-                        cursor.execute(SQL_INSERT_APP_WORKS_WITH_COM_APP, (app_id, com_app_id, False))
-                    else:
-                        #display warning
-                        print("_app_update() : WARNING : ignore com_app link. com_app '{}' is unknown !"
-                              .format(com_app))
-
-                cnx.commit()
-                cursor.close()
-                self._close_sqlite()
+            app_data = self._prepare_app_update(app_type, app_name, digests, session)
+            if app_data is not None:
+                self._run_write(lambda cnx: Configuration._write_app_update(cnx, app_id, app_data))
+                self._invalidate_model()
                 if fire_event:
                     self._fire_event("on_app_update", (app_type, app_name))
-            else:
-                print("_app_update() : module is not importable ! see previous messages.")
         return app_id
 
     def get_app_mode(self, app_type, app_name):
@@ -988,11 +1687,12 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
 
         return mode
 
-    def get_app_state(self, app_type, app_name):
+    def get_app_state(self, app_type, app_name, session=None):
         """
         get registered app state (from digests)
         :param app_type:
         :param app_name:
+        :param session: optional VerificationSession. App is hashed once per session.
         :return: 0 : unchanged, 1 : updated, -1 corrupted, None if app_type and/or app_name doesn't exist
         """
         app_info = self.get_app_info(app_type, app_name)
@@ -1001,16 +1701,20 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         else:
             ret_val = 0
             if self.get_app_mode(app_type, app_name) == 'usermode':
-                # check Manifest against generated digests
-                digest_ok, _ = self._verify_manifest_digests(app_info['path'])
+                # check Manifest against generated digests, unless already done in session
+                digest_ok = None
+                if session is not None:
+                    digest_ok = session.get_manifest_status(app_info['path'])
+                if digest_ok is None:
+                    digest_ok, _ = self._verify_manifest_digests(app_info['path'], self._file_digest_cache, session)
                 if not digest_ok:
                     ret_val = -1
                 else:
-                    digest_ok, _ = self._verify_db_digests(app_info['path'])
+                    digest_ok, _ = self._verify_db_digests(app_info['path'], session)
                     if not digest_ok:
                         ret_val = 1
             else:
-                digest_ok, _ = self._verify_db_digests(app_info['path'])
+                digest_ok, _ = self._verify_db_digests(app_info['path'], session)
                 if not digest_ok:
                     ret_val = 1
 
@@ -1019,7 +1723,7 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
     def print_app_list(self, app_type=None):
         """
         Displays names, state (loaded or not) and descriptions of the available
-        docapp.
+        docapp. Everything comes from db, app code is not imported.
         :param app_type: application type. Default None for all registered app_type
         """
 
@@ -1058,19 +1762,22 @@ class Configuration(IConfiguration, TransitionEventDispatcher):
         """
         desc = ""
 
-        # Dynamic import of the package - to be able to load comments
-        module = Configuration._app_import(app_type, app_name)
+        # top comments of the package, read without importing it
+        metadata = AppMetadata.extract(app_type, app_name, allow_import=Configuration.import_fallback)
 
-        if module is not None:
-            # return top comments of the package
-            desc = inspect.getcomments(module)
+        if metadata is not None:
+            desc = metadata['description']
 
         return desc
 
 
+# records public methods calls while stats are enabled
+ConfigurationStats.instrument(Configuration, IConfiguration)
+
+
 if __name__ == "__main__":
     config = Configuration()
     config.reset()
     cnx = config._sqlite
     # for app_type in config.app_type_list:
-    #     print(config.get_available_app_list(app_type))
\ No newline at end of file
+    #     print(config.get_available_app_list(app_type))
@@ -0,0 +1,280 @@
+# ------------------------------------------------------------------------------
+# Name:        connectionmanager
+# Purpose:     Long-lived SQLite connections, one per thread
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import os
+import sqlite3
+import threading
+import time
+
+from transitioncore.configstats import StatsConnection
+
+# applied once, when a connection is opened.
+# WAL : readers don't block the writer and the writer doesn't block readers. Db is shared by ConfigService,
+# transition.py command line, config dialog and Office instances. synchronous = NORMAL is safe with WAL.
+DEFAULT_PRAGMA_LIST = ("PRAGMA journal_mode = WAL",
+                       "PRAGMA synchronous = NORMAL",
+                       "PRAGMA foreign_keys = ON",
+                       "PRAGMA temp_store = MEMORY")
+
+# prepared statements kept by each connection. Covers all configsql.py statements.
+CACHED_STATEMENTS = 256
+
+# seconds to wait for a lock held by another connection
+TIMEOUT = 5.0
+
+# run_write() attempts once busy timeout expired, and first delay between them (doubled each time)
+RETRY_COUNT = 5
+RETRY_DELAY = 0.05
+
+
+class ConnectionManager():
+    """
+    Keeps one SQLite connection per thread, opened on first use and kept until close_all().
+
+    Each thread gets its own connection (sqlite3 objects must not be shared between threads), so
+    Configuration can be used from RPyC ThreadedServer worker threads. Each connection caches its prepared
+    statements (sqlite3 cached_statements) and gets pragmas once, when opened. Connections of finished threads
+    are closed when a new connection is opened.
+
+    Writes go through run_write() : one short BEGIN IMMEDIATE transaction, retried while db is locked by another
+    process.
+
+        manager = ConnectionManager(db_path, on_open)
+        cnx = manager.get()
+        ...
+        manager.run_write(lambda cnx: cnx.execute(sql, params))
+        ...
+        manager.close_all()
+    """
+
+    # writes are refused when True
+    read_only = False
+
+    def __init__(self, db_path, on_open=None, pragma_list=DEFAULT_PRAGMA_LIST, cached_statements=CACHED_STATEMENTS,
+                 timeout=TIMEOUT, retry_count=RETRY_COUNT, retry_delay=RETRY_DELAY):
+        """
+        :param db_path: SQLite db file
+        :param on_open: optional callable(cnx, created). Called once per connection, created is True if db file
+        didn't exist before connection.
+        :param pragma_list: statements executed on each new connection
+        :param cached_statements: prepared statements cache size of each connection
+        :param timeout: seconds to wait for a lock (busy timeout)
+        :param retry_count: run_write() retries when db is still locked after timeout
+        :param retry_delay: first delay between run_write() retries, in seconds
+        """
+        self.db_path = db_path
+        self._on_open = on_open
+        self._pragma_list = pragma_list
+        self._cached_statements = cached_statements
+        self._timeout = timeout
+        self._retry_count = retry_count
+        self._retry_delay = retry_delay
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # thread ident : (thread, connection)
+        self._cnx_dict = dict()
+        # incremented by close_all(), invalidates connections remembered by threads
+        self._generation = 0
+
+        self.open_count = 0
+        self.retry_count = 0
+
+        # ConfigurationStats of new connections, see set_stats()
+        self.stats = None
+        self._factory = sqlite3.Connection
+
+    def set_on_open(self, on_open):
+        """
+        :param on_open: callable(cnx, created) called once per new connection
+        """
+        self._on_open = on_open
+
+    def set_stats(self, stats):
+        """
+        Record statements and connection opens. Opened connections are outdated : each thread opens its
+        connection again on next get(), instrumented or not, and the outdated one is closed then. Connections in
+        use by other threads are left alone.
+        :param stats: ConfigurationStats, None to stop recording
+        """
+        with self._lock:
+            self.stats = stats
+            self._factory = sqlite3.Connection if stats is None else StatsConnection
+            self._generation += 1
+
+    def exists(self):
+        """
+        :return: True if db exists
+        """
+        return os.path.exists(self.db_path)
+
+    def connect(self):
+        """
+        Open a new connection, not managed by this instance.
+        :return: sqlite3 connection
+        """
+        # only used by one thread. Not checked so that close_all() can close it from another one.
+        return sqlite3.connect(self.db_path, timeout=self._timeout, cached_statements=self._cached_statements,
+                               check_same_thread=False, factory=self._factory)
+
+    def remove(self):
+        """
+        Close all connections and delete db
+        """
+        self.close_all()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def peek(self):
+        """
+        :return: connection of current thread, None if not opened
+        """
+        generation, cnx = getattr(self._local, 'cnx', (None, None))
+        if generation != self._generation:
+            return None
+
+        return cnx
+
+    def get(self):
+        """
+        Get connection of current thread, opens it if needed.
+        :return: sqlite3 connection. Rows are sqlite3.Row.
+        """
+        cnx = self.peek()
+        if cnx is not None:
+            return cnx
+
+        created = not self.exists()
+        cnx = self.connect()
+        stats = self.stats
+        if stats is not None and isinstance(cnx, StatsConnection):
+            cnx.stats = stats
+            stats.count_open()
+        cnx.row_factory = sqlite3.Row
+        for pragma in self._pragma_list:
+            cnx.execute(pragma)
+
+        thread = threading.current_thread()
+        with self._lock:
+            self._close_finished()
+            self._cnx_dict[threading.get_ident()] = (thread, cnx)
+            self._local.cnx = (self._generation, cnx)
+            self.open_count += 1
+
+        if self._on_open is not None:
+            self._on_open(cnx, created)
+
+        return cnx
+
+    @staticmethod
+    def is_locked(error):
+        """
+        :param error: sqlite3 exception
+        :return: True if error is a busy / locked db error, worth a retry
+        """
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+    def run_write(self, write):
+        """
+        Run write(cnx) in its own BEGIN IMMEDIATE transaction and commit. The write lock is taken first, so a
+        transaction never has to upgrade from read to write (which fails at once in WAL mode when another
+        connection committed meanwhile). On a locked db, transaction is rolled back and write(cnx) is run again :
+        it must only change db, compute anything long before. Transaction is handled here (sqlite3 would commit
+        it before a CREATE statement), write(cnx) must not commit.
+        :param write: callable(cnx)
+        :return: write(cnx) result
+        :raise: sqlite3.Error if db is still locked after retries. Any write(cnx) exception, once rolled back.
+        """
+        cnx = self.get()
+        if cnx.in_transaction:
+            # pending implicit transaction of this connection
+            cnx.commit()
+
+        isolation_level = cnx.isolation_level
+        cnx.isolation_level = None
+        delay = self._retry_delay
+        attempt = 0
+        try:
+            while True:
+                try:
+                    cnx.execute("BEGIN IMMEDIATE")
+                    result = write(cnx)
+                    cnx.execute("COMMIT")
+                    return result
+                except BaseException as e:
+                    # any failure : write lock must be released, and half done write never committed
+                    if cnx.in_transaction:
+                        cnx.execute("ROLLBACK")
+                    if not ConnectionManager.is_locked(e) or attempt >= self._retry_count:
+                        raise
+
+                attempt += 1
+                with self._lock:
+                    self.retry_count += 1
+                time.sleep(delay)
+                delay *= 2
+        finally:
+            cnx.isolation_level = isolation_level
+
+    def _close_finished(self):
+        """
+        Close connections of finished threads. Lock must be held.
+        """
+        current_ident = threading.get_ident()
+        for ident, (thread, cnx) in list(self._cnx_dict.items()):
+            if ident == current_ident or not thread.is_alive():
+                cnx.close()
+                del self._cnx_dict[ident]
+
+    def close(self):
+        """
+        Close connection of current thread
+        """
+        with self._lock:
+            entry = self._cnx_dict.pop(threading.get_ident(), None)
+            self._local.cnx = (None, None)
+
+        if entry is not None:
+            entry[1].close()
+
+    def close_all(self):
+        """
+        Close connections of all threads. They are opened again on next get().
+        """
+        with self._lock:
+            cnx_list = [cnx for _, cnx in self._cnx_dict.values()]
+            self._cnx_dict = dict()
+            self._generation += 1
+
+        for cnx in cnx_list:
+            cnx.close()
+
+    def get_connection_count(self):
+        """
+        :return: number of opened connections
+        """
+        with self._lock:
+            return len(self._cnx_dict)
@@ -0,0 +1,579 @@
+# ------------------------------------------------------------------------------
+# Name:        digestengine
+# Purpose:     Streaming application digests generation
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+"""
+Streaming application digests generation.
+
+Application files are walked in a fixed order and read by fixed-size chunks
+which are fed straight into SHA3-256, SHA3-512 and Whirlpool hashers. Nothing
+is written on disk and memory usage doesn't depend on application size.
+
+Hashers can run on their own worker thread (see ParallelMultiHasher) : each
+chunk is read once and handed to all algorithms at the same time. hashlib
+releases the GIL on large updates, so verifying a large app takes about as long
+as the slowest algorithm.
+"""
+
+import os
+import queue
+import threading
+import time
+import zipfile
+import zlib
+import hashlib
+import sha3
+import whirlpool
+
+# digests formats.
+# DIGEST_FORMAT_LEGACY : digests of a zip archive of app sources (Transition <= 0.1 Manifest and db rows)
+# DIGEST_FORMAT_STREAM : digests of the sorted (relative path, file digest) list
+DIGEST_FORMAT_LEGACY = 1
+DIGEST_FORMAT_STREAM = 2
+
+DIGEST_ALGORITHMS = ('SHA256', 'SHA512', 'WHIRLPOOL')
+
+# read size used to feed hashers
+CHUNK_SIZE = 64 * 1024
+
+# max chunks waiting for each hash worker. Bounds ParallelMultiHasher memory usage.
+QUEUE_SIZE = 16
+
+# under this app size (bytes), threads cost more than they give
+PARALLEL_MIN_SIZE = 1024 * 1024
+
+# files and directories which are not part of app sources
+EXCLUDED_FILES = ("Manifest",)
+EXCLUDED_DIRS = ("__pycache__",)
+
+# a file written less than this many seconds before fingerprint may be written again with the same mtime
+FINGERPRINT_RACY_DELAY = 2.0
+
+
+def new_hasher(algorithm):
+    """
+    Return a new hash object for given algorithm
+    :param algorithm: one of DIGEST_ALGORITHMS
+    :return: hash object
+    """
+    if algorithm == 'SHA256':
+        return hashlib.sha3_256()
+    elif algorithm == 'SHA512':
+        return hashlib.sha3_512()
+    elif algorithm == 'WHIRLPOOL':
+        return whirlpool.new()
+    else:
+        raise ValueError("Unknown digest algorithm {}".format(algorithm))
+
+
+class MultiHasher():
+    """
+    Feeds data into all algorithms hashers, one after another, in caller thread.
+    Digests are collected file by file : call next_file() at the end of each file
+    and close() to get the digests list.
+    """
+
+    def __init__(self, algorithms=DIGEST_ALGORITHMS):
+        self.algorithms = algorithms
+        self._hashers = {algorithm: new_hasher(algorithm) for algorithm in algorithms}
+        self._digest_list = list()
+
+    def update(self, data):
+        for hasher in self._hashers.values():
+            hasher.update(data)
+
+    def next_file(self):
+        self._digest_list.append({algorithm: hasher.hexdigest() for algorithm, hasher in self._hashers.items()})
+        self._hashers = {algorithm: new_hasher(algorithm) for algorithm in self.algorithms}
+
+    def close(self):
+        """
+        :return: list of digests dict {SHA256, SHA512, WHIRLPOOL}, one per file
+        """
+        return self._digest_list
+
+
+# marks end of file in hash workers queues
+_NEXT_FILE = object()
+
+
+class _HashWorker(threading.Thread):
+    """
+    Runs one algorithm hasher on chunks received from its queue.
+    Queue items are chunks (bytes), _NEXT_FILE or None to stop.
+    """
+
+    def __init__(self, algorithm):
+        super(_HashWorker, self).__init__(name="HashWorker-{}".format(algorithm), daemon=True)
+        self.algorithm = algorithm
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.hexdigest_list = list()
+        self.error = None
+
+    def run(self):
+        hasher = new_hasher(self.algorithm)
+        item = self.queue.get()
+        while item is not None:
+            # on error, keep on draining queue so producer is never blocked
+            if self.error is None:
+                try:
+                    if item is _NEXT_FILE:
+                        self.hexdigest_list.append(hasher.hexdigest())
+                        hasher = new_hasher(self.algorithm)
+                    else:
+                        hasher.update(item)
+                except Exception as e:
+                    self.error = e
+            item = self.queue.get()
+
+
+class ParallelMultiHasher():
+    """
+    Same interface as MultiHasher, but each algorithm runs on its own worker thread.
+    Chunks given to update() must not be modified afterwards (they are shared between workers).
+    """
+
+    def __init__(self, algorithms=DIGEST_ALGORITHMS):
+        self.algorithms = algorithms
+        self._workers = [_HashWorker(algorithm) for algorithm in algorithms]
+        for worker in self._workers:
+            worker.start()
+
+    def update(self, data):
+        for worker in self._workers:
+            worker.queue.put(data)
+
+    def next_file(self):
+        for worker in self._workers:
+            worker.queue.put(_NEXT_FILE)
+
+    def close(self):
+        """
+        Stops workers.
+        :return: list of digests dict {SHA256, SHA512, WHIRLPOOL}, one per file
+        :raise: first error met by a worker
+        """
+        for worker in self._workers:
+            worker.queue.put(None)
+
+        for worker in self._workers:
+            worker.join()
+
+        for worker in self._workers:
+            if worker.error is not None:
+                raise worker.error
+
+        digest_list = list()
+        for hexdigests in zip(*(worker.hexdigest_list for worker in self._workers)):
+            digest_list.append(dict(zip(self.algorithms, hexdigests)))
+
+        return digest_list
+
+
+class _HashSink():
+    """
+    Write-only, forward-only file object feeding a multi hasher. Used to let zipfile
+    write its records straight into hashers in legacy mode.
+    """
+
+    def __init__(self, hasher):
+        self._hasher = hasher
+        self._position = 0
+
+    def write(self, data):
+        self._hasher.update(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position, whence=0):
+        # zipfile only seeks to the current position when records are written in order
+        if whence != 0 or position != self._position:
+            raise OSError("_HashSink can't seek backward")
+        return self._position
+
+    def flush(self):
+        pass
+
+
+class DigestEngine():
+    """
+    Generates application digests in SHA3-256, SHA3-512 and Whirlpool.
+
+    Stream format (DIGEST_FORMAT_STREAM, default) :
+        * app files are sorted on their path relative to app path ('/' separated)
+        * each file content is hashed by chunks of CHUNK_SIZE bytes
+        * app digest is the hash of the "<relative path>\\0<file hexdigest>\\n" lines
+
+    Legacy format (DIGEST_FORMAT_LEGACY) :
+        Gives the digests of the zip archive formerly written in %TMP% by
+        Configuration._generate_app_digests(). The archive is generated on the
+        fly into hashers. Each file is read twice (CRC32 first, then content),
+        but nothing is written on disk and memory usage stays bounded.
+    """
+
+    @staticmethod
+    def list_app_files(path):
+        """
+        List app source files in a fixed order.
+        :param path: application path
+        :return: sorted list of (relative path, absolute path) tuples
+        """
+        file_list = list()
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+            for file in files:
+                if file not in EXCLUDED_FILES:
+                    full_path = os.path.join(root, file)
+                    rel_path = os.path.relpath(full_path, path).replace(os.sep, '/')
+                    file_list.append((rel_path, full_path))
+
+        file_list.sort()
+        return file_list
+
+    @staticmethod
+    def _legacy_app_files(path):
+        """
+        List app source files as the zip based implementation did.
+        :param path: application path
+        :return: list of absolute paths in os.walk() order
+        """
+        file_list = list()
+        for root, dirs, files in os.walk(path):
+            if "__pycache__" not in root:
+                for file in files:
+                    if file not in EXCLUDED_FILES:
+                        file_list.append(os.path.join(root, file))
+
+        return file_list
+
+    @staticmethod
+    def _legacy_zip_info(full_path):
+        """
+        Build ZipInfo of a file as ZipFile.write(full_path) does (ZipInfo.from_file() needs Python 3.6)
+        :param full_path: file path, also used as archive name
+        :return: zipfile.ZipInfo
+        """
+        st = os.stat(full_path)
+        arcname = os.path.normpath(os.path.splitdrive(full_path)[1])
+        while arcname[0] in (os.sep, os.altsep):
+            arcname = arcname[1:]
+        zinfo = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[0:6])
+        zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+        zinfo.file_size = st.st_size
+        return zinfo
+
+    @staticmethod
+    def hash_file(full_path, hasher):
+        """
+        Feed file content into hasher by chunks of CHUNK_SIZE bytes. Each chunk is read once.
+        :param full_path: file path
+        :param hasher: MultiHasher or ParallelMultiHasher
+        :return: file size
+        """
+        size = 0
+        with open(full_path, 'rb') as f:
+            chunk = f.read(CHUNK_SIZE)
+            while chunk:
+                size += len(chunk)
+                hasher.update(chunk)
+                chunk = f.read(CHUNK_SIZE)
+
+        return size
+
+    @staticmethod
+    def new_multi_hasher(parallel=False):
+        """
+        :param parallel: True to run each algorithm on its own worker thread
+        :return: MultiHasher or ParallelMultiHasher
+        """
+        if parallel:
+            return ParallelMultiHasher()
+        else:
+            return MultiHasher()
+
+    @staticmethod
+    def use_parallel(full_path_list):
+        """
+        Tells if parallel hashing is worth it for given files
+        :param full_path_list: files to hash
+        :return: True on multi-core machines when files are large enough
+        """
+        if (os.cpu_count() or 1) < 2:
+            return False
+
+        size = 0
+        for full_path in full_path_list:
+            size += os.path.getsize(full_path)
+            if size >= PARALLEL_MIN_SIZE:
+                return True
+
+        return False
+
+    @staticmethod
+    def hash_files(full_path_list, parallel=None):
+        """
+        Generate digests of each given file
+        :param full_path_list: files to hash
+        :param parallel: True/False to force parallel hashing. None (default) decides upon files size.
+        :return: list of digests dict {SHA256, SHA512, WHIRLPOOL}, in full_path_list order
+        """
+        if parallel is None:
+            parallel = DigestEngine.use_parallel(full_path_list)
+
+        hasher = DigestEngine.new_multi_hasher(parallel)
+        try:
+            for full_path in full_path_list:
+                DigestEngine.hash_file(full_path, hasher)
+                hasher.next_file()
+        except:
+            # stop workers before leaving
+            hasher.close()
+            raise
+
+        return hasher.close()
+
+    @staticmethod
+    def file_digests(full_path):
+        """
+        Generate digests of one file
+        :param full_path: file path
+        :return: dict {SHA256, SHA512, WHIRLPOOL}
+        """
+        return DigestEngine.hash_files((full_path, ))[0]
+
+    @staticmethod
+    def fingerprint(path, racy_delay=None):
+        """
+        Stat fingerprint of app directory : changes when a file is added, removed, renamed or written (size or
+        mtime). Files are not read. Manifest is part of it.
+        :param path: application path
+        :param racy_delay: FINGERPRINT_RACY_DELAY if None
+        :return: fingerprint string, None if path can't be read or if a file was written too recently to be
+        trusted (see FINGERPRINT_RACY_DELAY)
+        """
+        if racy_delay is None:
+            racy_delay = FINGERPRINT_RACY_DELAY
+
+        def raise_error(error):
+            raise error
+
+        line_list = list()
+        max_mtime_ns = 0
+        try:
+            # unreadable directories raise instead of being skipped
+            for root, dirs, files in os.walk(path, onerror=raise_error):
+                dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+                rel_dir = os.path.relpath(root, path).replace(os.sep, '/') + '/'
+                if rel_dir == './':
+                    rel_dir = ''
+                for file in files:
+                    stat_result = os.stat(os.path.join(root, file))
+                    max_mtime_ns = max(max_mtime_ns, stat_result.st_mtime_ns)
+                    line_list.append("{}\0{}\0{}\n".format(rel_dir + file, stat_result.st_size,
+                                                           stat_result.st_mtime_ns))
+        except OSError:
+            return None
+
+        if racy_delay > 0 and max_mtime_ns >= (time.time() - racy_delay) * 1e9:
+            return None
+
+        line_list.sort()
+        hasher = hashlib.sha1("".join(line_list).encode('utf-8', 'surrogateescape'))
+        return "{}:{}".format(len(line_list), hasher.hexdigest())
+
+    @staticmethod
+    def combine(file_digest_list):
+        """
+        Build app digests from per-file digests
+        :param file_digest_list: iterable of (relative path, digests dict), sorted on relative path
+        :return: dict {SHA256, SHA512, WHIRLPOOL}
+        """
+        hashers = {algorithm: new_hasher(algorithm) for algorithm in DIGEST_ALGORITHMS}
+        for rel_path, digests in file_digest_list:
+            for algorithm, hasher in hashers.items():
+                hasher.update("{}\0{}\n".format(rel_path, digests[algorithm]).encode('utf-8'))
+
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+    @staticmethod
+    def app_file_digests(path, parallel=None, file_cache=None, subtree=None, workers=1):
+        """
+        Generate digests of each app file.
+        :param path: application path
+        :param parallel: True/False to force parallel hashing. None (default) decides upon files size.
+        :param file_cache: optional per-file digests cache (see FileDigestCache). Only files whose stat
+        signature changed are read.
+        :param subtree: optional relative directory ('/' separated). Restricts files to this subtree.
+        :param workers: number of top level subtrees hashed at the same time
+        :return: sorted list of (relative path, size, digests dict)
+        """
+        file_list = DigestEngine.list_app_files(path)
+        if subtree is not None:
+            subtree = subtree.strip('/')
+            file_list = [(rel_path, full_path) for rel_path, full_path in file_list
+                         if rel_path == subtree or rel_path.startswith(subtree + '/')]
+
+        if file_cache is not None:
+            file_cache.load(path)
+
+        size_list = list()
+        digest_list = list()
+        to_hash_list = list()
+        for index, (_, full_path) in enumerate(file_list):
+            stat_result = os.stat(full_path)
+            size_list.append(stat_result.st_size)
+            digests = None
+            if file_cache is not None:
+                digests = file_cache.lookup(full_path, stat_result)
+            if digests is None:
+                to_hash_list.append((index, full_path, stat_result))
+            digest_list.append(digests)
+
+        hashed_list = DigestEngine._hash_subtrees(file_list, to_hash_list, parallel, workers)
+        for (index, full_path, stat_result), digests in zip(to_hash_list, hashed_list):
+            digest_list[index] = digests
+            if file_cache is not None:
+                file_cache.store(full_path, stat_result, digests)
+
+        if file_cache is not None:
+            # a subtree doesn't tell which files were removed elsewhere
+            file_cache.save([full_path for _, full_path in file_list], purge=subtree is None)
+
+        return [(rel_path, size, digests)
+                for (rel_path, _), size, digests in zip(file_list, size_list, digest_list)]
+
+    @staticmethod
+    def _hash_subtrees(file_list, to_hash_list, parallel, workers):
+        """
+        Hash files, grouped by top level subtree when more than one worker is requested.
+        :return: digests list in to_hash_list order
+        """
+        full_path_list = [full_path for _, full_path, _ in to_hash_list]
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1 or len(to_hash_list) < 2:
+            return DigestEngine.hash_files(full_path_list, parallel)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        group_dict = dict()
+        for position, (index, full_path, _) in enumerate(to_hash_list):
+            rel_path = file_list[index][0]
+            top = rel_path.split('/', 1)[0] if '/' in rel_path else ''
+            group_dict.setdefault(top, list()).append(position)
+
+        group_list = list(group_dict.values())
+        digest_list = [None] * len(to_hash_list)
+        with ThreadPoolExecutor(max_workers=min(workers, len(group_list))) as executor:
+            result_list = executor.map(
+                lambda group: DigestEngine.hash_files([full_path_list[position] for position in group], parallel),
+                group_list)
+            for group, group_digest_list in zip(group_list, result_list):
+                for position, digests in zip(group, group_digest_list):
+                    digest_list[position] = digests
+
+        return digest_list
+
+    @staticmethod
+    def _generate_stream(path, parallel=None, file_cache=None):
+        file_list = DigestEngine.app_file_digests(path, parallel, file_cache)
+        if len(file_list) == 0:
+            return None
+
+        return DigestEngine.combine((rel_path, digests) for rel_path, _, digests in file_list)
+
+    @staticmethod
+    def _generate_legacy(path, parallel=None):
+        file_list = DigestEngine._legacy_app_files(path)
+        if len(file_list) == 0:
+            return None
+
+        if parallel is None:
+            parallel = DigestEngine.use_parallel(file_list)
+
+        hasher = DigestEngine.new_multi_hasher(parallel)
+        sink = _HashSink(hasher)
+        try:
+            zipf_source = zipfile.ZipFile(sink, 'w')
+            for full_path in file_list:
+                # same ZipInfo as ZipFile.write(full_path) would have built
+                zinfo = DigestEngine._legacy_zip_info(full_path)
+                zinfo.compress_type = zipf_source.compression
+                zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+
+                # first pass : CRC32 and size, needed by the local header preceding data
+                crc = 0
+                size = 0
+                with open(full_path, 'rb') as f:
+                    chunk = f.read(CHUNK_SIZE)
+                    while chunk:
+                        crc = zlib.crc32(chunk, crc)
+                        size += len(chunk)
+                        chunk = f.read(CHUNK_SIZE)
+
+                zinfo.flag_bits = 0x00
+                zinfo.CRC = crc
+                zinfo.file_size = size
+                zinfo.compress_size = size
+                zinfo.header_offset = sink.tell()
+                sink.write(zinfo.FileHeader(zip64))
+
+                # second pass : stored content
+                with open(full_path, 'rb') as f:
+                    chunk = f.read(CHUNK_SIZE)
+                    while chunk:
+                        sink.write(chunk)
+                        chunk = f.read(CHUNK_SIZE)
+
+                zipf_source.filelist.append(zinfo)
+                zipf_source.NameToInfo[zinfo.filename] = zinfo
+                zipf_source.start_dir = sink.tell()
+
+            # writes central directory
+            zipf_source.close()
+            hasher.next_file()
+        except:
+            hasher.close()
+            raise
+
+        return hasher.close()[0]
+
+    @staticmethod
+    def generate(path, digest_format=DIGEST_FORMAT_STREAM, parallel=None, file_cache=None):
+        """
+        Generate application digests.
+        :param path: application path
+        :param digest_format: DIGEST_FORMAT_STREAM (default) or DIGEST_FORMAT_LEGACY
+        :param parallel: True/False to force parallel hashing. None (default) decides upon app size.
+        :param file_cache: optional per-file digests cache (see FileDigestCache). Stream format only.
+        :return: dict {SHA256, SHA512, WHIRLPOOL} or None if path contains no files
+        """
+        if digest_format == DIGEST_FORMAT_LEGACY:
+            return DigestEngine._generate_legacy(path, parallel)
+        else:
+            return DigestEngine._generate_stream(path, parallel, file_cache)
@@ -48,6 +48,20 @@ class ConfigEventsInterface():
         """
         pass
 
+    def on_apps_enable(self, app_status_tuple):
+        """
+        Fired once when a set of apps is enabled by Configuration.enable_apps()
+        :param app_status_tuple: tuple of (app_type, app_name, com_app_tuple)
+        """
+        pass
+
+    def on_apps_disable(self, app_status_tuple):
+        """
+        Fired once when a set of apps is disabled by Configuration.disable_apps()
+        :param app_status_tuple: tuple of (app_type, app_name, com_app_tuple)
+        """
+        pass
+
     def on_app_add(self, app_type, app_name):
         """Fired when an app is added to available app list
         :param app_type:
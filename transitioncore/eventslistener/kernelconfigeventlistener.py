@@ -34,10 +34,18 @@ class KernelConfigurationEventListener(ConfigEventsInterface):
         self.kernel = kernel
         #declare interesting kernel event. on_app_add and on_app_del are not kernel
         #stuff by now (more configuration GUI oriented)
-        self.event_list = ("on_app_enable", "on_app_disable")
+        self.event_list = ("on_app_enable", "on_app_disable", "on_apps_enable", "on_apps_disable")
 
     def on_app_disable(self, app_type, app_name, com_app_tuple):
         print("KernelConfigurationEventListener.on_app_disable", app_type, app_name, com_app_tuple)
 
     def on_app_enable(self, app_type, app_name, com_app_tuple):
-        print("KernelConfigurationEventListener.on_app_enable", app_type, app_name, com_app_tuple)
\ No newline at end of file
+        print("KernelConfigurationEventListener.on_app_enable", app_type, app_name, com_app_tuple)
+
+    def on_apps_disable(self, app_status_tuple):
+        for app_type, app_name, com_app_tuple in app_status_tuple:
+            self.on_app_disable(app_type, app_name, com_app_tuple)
+
+    def on_apps_enable(self, app_status_tuple):
+        for app_type, app_name, com_app_tuple in app_status_tuple:
+            self.on_app_enable(app_type, app_name, com_app_tuple)
\ No newline at end of file
@@ -0,0 +1,196 @@
+# ------------------------------------------------------------------------------
+# Name:        filedigestcache
+# Purpose:     Per-file digests cache stored in configuration db
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import os
+
+from transitioncore.configsql import SQL_SELECT_FILE_DIGEST_BY_PATH_RANGE, SQL_REPLACE_FILE_DIGEST, \
+    SQL_DELETE_FILE_DIGEST, SQL_DELETE_FILE_DIGEST_BY_PATH_RANGE
+
+
+class FileDigestCache():
+    """
+    Per-file digests cache, stored in file_digest table of configuration db.
+
+    Files are keyed by path, size, mtime_ns and inode. A file whose stat signature
+    didn't change since it was hashed reuses its stored digests. Used by
+    DigestEngine.generate() on one app at a time :
+        * load(app_path) reads app entries in one query
+        * lookup()/store() are called for each app file
+        * save() writes new entries and forgets deleted files in one transaction
+
+    A cache can be detached for one app, to be used in another process without db access. Changes made
+    by detached cache are written when it is attached back.
+    """
+
+    def __init__(self, config):
+        """
+        :param config: Configuration instance giving db access
+        """
+        self._config = config
+        self._app_path = None
+        self._entries = dict()
+        self._updated = dict()
+        self._pending = None
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def _path_range(app_path):
+        """
+        :return: (lower, upper) bounds of app files paths
+        """
+        return app_path + os.sep, app_path + chr(ord(os.sep) + 1)
+
+    @staticmethod
+    def _signature(stat_result):
+        return stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino
+
+    def load(self, app_path):
+        """
+        Load cached entries of app files
+        :param app_path: application path
+        """
+        if self._config is None:
+            # detached : entries were loaded by detach()
+            if app_path != self._app_path:
+                self._app_path = app_path
+                self._entries = dict()
+            self._updated = dict()
+            return
+
+        self._app_path = app_path
+        self._entries = dict()
+        self._updated = dict()
+
+        cursor = self._config._sqlite.cursor()
+        cursor.execute(SQL_SELECT_FILE_DIGEST_BY_PATH_RANGE, self._path_range(app_path))
+        for row in cursor:
+            self._entries[row['path']] = ((row['size'], row['mtime_ns'], row['inode']),
+                                          {'SHA256': row['SHA256'],
+                                           'SHA512': row['SHA512'],
+                                           'WHIRLPOOL': row['WHIRLPOOL']})
+        cursor.close()
+
+    def lookup(self, full_path, stat_result):
+        """
+        :param full_path: file path
+        :param stat_result: actual os.stat() of the file
+        :return: stored digests dict if file is unchanged, None instead
+        """
+        entry = self._entries.get(full_path)
+        if entry is not None and entry[0] == self._signature(stat_result):
+            self.hit_count += 1
+            return entry[1]
+
+        self.miss_count += 1
+        return None
+
+    def store(self, full_path, stat_result, digests):
+        """
+        Remember digests of a (re)hashed file. Written on save().
+        :param full_path: file path
+        :param stat_result: os.stat() of the file taken before hashing
+        :param digests: file digests dict
+        """
+        self._updated[full_path] = (self._signature(stat_result), digests)
+
+    def save(self, full_path_list, purge=True):
+        """
+        Write stored entries and remove entries of files which are not in app anymore
+        :param full_path_list: actual app files
+        :param purge: set it to False when full_path_list only holds a part of app files
+        """
+        removed_path_set = set()
+        if purge:
+            removed_path_set = set(self._entries.keys()).difference(full_path_list)
+        if self._config is None:
+            # detached : entries are kept up to date, changes are written on attach()
+            updated, removed = self._pending or (dict(), set())
+            updated.update(self._updated)
+            removed = removed.union(removed_path_set).difference(self._updated.keys())
+            self._pending = (updated, removed)
+            for full_path in removed_path_set:
+                self._entries.pop(full_path, None)
+            self._entries.update(self._updated)
+            self._updated = dict()
+            return
+
+        self._write(self._updated, removed_path_set)
+        self._entries = dict()
+        self._updated = dict()
+
+    def _write(self, updated, removed_path_set):
+        """
+        Write entries in one transaction
+        :param updated: dict {full path: (signature, digests)} to insert or replace
+        :param removed_path_set: paths to delete
+        """
+        def write(cnx):
+            cnx.executemany(SQL_REPLACE_FILE_DIGEST, [(full_path, size, mtime_ns, inode,
+                                                       digests['SHA256'],
+                                                       digests['SHA512'],
+                                                       digests['WHIRLPOOL'])
+                                                      for full_path, ((size, mtime_ns, inode), digests)
+                                                      in updated.items()])
+            cnx.executemany(SQL_DELETE_FILE_DIGEST, [(full_path, ) for full_path in removed_path_set])
+
+        if len(updated) > 0 or len(removed_path_set) > 0:
+            self._config._run_write(write)
+
+    def detach(self, app_path):
+        """
+        Build a cache holding entries of one app, which doesn't need db access. It can be pickled.
+        :param app_path: application path
+        :return: detached FileDigestCache
+        """
+        self.load(app_path)
+        detached = FileDigestCache(None)
+        detached._app_path = app_path
+        detached._entries = self._entries
+        self._entries = dict()
+        return detached
+
+    def attach(self, detached):
+        """
+        Write changes made by a detached cache
+        :param detached: FileDigestCache returned by detach()
+        """
+        self.hit_count += detached.hit_count
+        self.miss_count += detached.miss_count
+        if detached._pending is not None:
+            self._write(*detached._pending)
+
+    def forget(self, app_path, cnx=None):
+        """
+        Remove all entries of an app
+        :param app_path: application path
+        :param cnx: connection holding a write transaction. Entries are removed in their own transaction if None.
+        """
+        if cnx is not None:
+            cnx.execute(SQL_DELETE_FILE_DIGEST_BY_PATH_RANGE, self._path_range(app_path))
+        else:
+            self._config._run_write(lambda cnx: cnx.execute(SQL_DELETE_FILE_DIGEST_BY_PATH_RANGE,
+                                                            self._path_range(app_path)))
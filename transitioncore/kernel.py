@@ -31,6 +31,7 @@
 """
 import sys
 import os
+import threading
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 sys.executable = os.path.join(sys.exec_prefix, 'pythonw.exe')
 import rpyc
@@ -40,6 +41,8 @@ from transitioncore.eventslistener.kernelconfigeventlistener import KernelConfig
 from transitioncore.exceptions.kernelexception import KernelException
 from transitioncore.configuration import Configuration
 from transitioncore.appmanager import AppManager
+from transitioncore.startupsnapshot import StartupSnapshot
+from transitioncore.verificationscheduler import VerificationScheduler
 
 
 class TransitionKernel():
@@ -60,18 +63,17 @@ class TransitionKernel():
 
         #self._config = Configuration()
 
-        # TODO : learn more... idea seems clear but I make something wrong.
-        # get config like ConfigService is already launched
-        try:
-            self._conn = rpyc.connect("localhost", port=22)
-            self._config = self._conn.root
-        except ConnectionRefusedError:
-            # Not launched, must do it
-            from subprocess import Popen
-            config_service_path = "{}{}".format(os.path.abspath(os.path.dirname(__file__)), "\\configservice.py")
-            print("TransitionKernel : launch", config_service_path)
-            Popen([sys.executable, config_service_path])
-            self._config = rpyc.connect("localhost", port=22).root
+        # boot from startup snapshot : no db connection nor ConfigService round trip. ConfigService is connected
+        # on first config access, or by snapshot check once kernel runs.
+        self._snapshot = StartupSnapshot.open(Configuration.snapshot_path)
+        self._config = None
+        self._config_lock = threading.Lock()
+        self._snapshot_check_thread = None
+        # apps are verified before launch, unless they are provisionally trusted. See verificationscheduler.py
+        self._scheduler = None
+        if self._snapshot is None:
+            print("TransitionKernel : no startup snapshot, booting from ConfigService")
+            self._connect_config()
 
         # register to configuration events. See KernelConfigurationEventListener
         # for further info on events and kernel actions.
@@ -83,10 +85,124 @@ class TransitionKernel():
         # App Manager
         self._app_manager = None
 
+    def _connect_config(self):
+        """
+        Connect ConfigService, launch it if needed
+        :return: ConfigService root
+        """
+        with self._config_lock:
+            if self._config is None:
+                # TODO : learn more... idea seems clear but I make something wrong.
+                # get config like ConfigService is already launched
+                try:
+                    self._conn = rpyc.connect("localhost", port=22)
+                    self._config = self._conn.root
+                except ConnectionRefusedError:
+                    # Not launched, must do it
+                    from subprocess import Popen
+                    config_service_path = "{}{}".format(os.path.abspath(os.path.dirname(__file__)),
+                                                        "\\configservice.py")
+                    print("TransitionKernel : launch", config_service_path)
+                    Popen([sys.executable, config_service_path])
+                    self._config = rpyc.connect("localhost", port=22).root
+
+        return self._config
+
     @property
     def config(self):
         """Get Configuration instance"""
-        return self._config
+        return self._connect_config()
+
+    @property
+    def snapshot(self):
+        """
+        :return: StartupSnapshot kernel booted from, None if booted from ConfigService
+        """
+        return self._snapshot
+
+    def get_enabled_app_list(self, app_type):
+        """
+        Enabled apps of current COM App, read from startup snapshot when available
+        :param app_type: application type
+        :return: enabled app names
+        """
+        if self._snapshot is not None:
+            return self._snapshot.get_enabled_app_list(app_type, self.com_app_type)
+
+        return self.config.get_enabled_app_list(app_type, self.com_app_type)
+
+    def _verify_app(self, app_type, app_name):
+        """
+        Verify app through ConfigService. Corrupted app is disabled there.
+        :return: True if app can be launched in current COM App
+        """
+        return self.config.verify_app(app_type, app_name, self.com_app_type)
+
+    def _on_app_corrupted(self, app_type, app_name):
+        print("TransitionKernel : WARNING : {}.{} is corrupted and has been disabled. "
+              "Restart {} to unload it.".format(app_type, app_name, self.com_app_type))
+
+    def _start_scheduler(self):
+        """
+        Schedule verification of enabled apps. Provisionally trusted apps are known from startup snapshot.
+        """
+        self._scheduler = VerificationScheduler(self._verify_app, self._on_app_corrupted)
+        for app_type in AppManager.app_type_dict.values():
+            for app_name in self.get_enabled_app_list(app_type):
+                verification = None
+                if self._snapshot is not None:
+                    verification = self._snapshot.get_app_verification(app_type, app_name)
+                self._scheduler.add_app(app_type, app_name, *(verification or ()))
+        self._scheduler.start()
+
+    def wait_app_verified(self, app_type, app_name):
+        """
+        Gate app launch : wait for verification of this app only, unless it is provisionally trusted.
+        :param app_type: application type
+        :param app_name: application name
+        :return: True if app can be launched
+        """
+        if self._scheduler is None:
+            return self._verify_app(app_type, app_name)
+
+        return self._scheduler.wait(app_type, app_name)
+
+    def _check_snapshot(self):
+        """
+        Compare startup snapshot to db through ConfigService. An outdated snapshot is written again and used on
+        next startup.
+        :return: True if snapshot is up to date
+        """
+        try:
+            data = self.config.get_startup_snapshot()
+        except Exception as e:
+            print("TransitionKernel : can't check startup snapshot :", repr(e))
+            return False
+
+        ret_val = data == self._snapshot.data
+        # readers always see an open snapshot. Old one is closed then : mapped file is released so ConfigService
+        # can replace it.
+        snapshot = self._snapshot
+        self._snapshot = StartupSnapshot(data)
+        snapshot.close()
+        if not ret_val:
+            print("TransitionKernel : startup snapshot was outdated, changes apply on next startup")
+            self.config.write_startup_snapshot()
+
+        return ret_val
+
+    def check_snapshot_async(self):
+        """
+        Launch startup snapshot check in background
+        :return: checking Thread, None if kernel didn't boot from snapshot
+        """
+        if self._snapshot is None or self._snapshot_check_thread is not None:
+            return self._snapshot_check_thread
+
+        self._snapshot_check_thread = threading.Thread(target=self._check_snapshot, name="snapshot check",
+                                                       daemon=True)
+        self._snapshot_check_thread.start()
+        return self._snapshot_check_thread
 
     def set_com_app(self, com_app):
         """Set COM App and determine its type"""
@@ -94,7 +210,11 @@ class TransitionKernel():
         app_description = repr(com_app)
 
         #looks for known com app
-        for app_type in self._config.com_apps:
+        if self._snapshot is not None:
+            com_app_list = self._snapshot.get_com_app_list()
+        else:
+            com_app_list = [com_app.lower() for com_app in Configuration.com_app_list]
+        for app_type in com_app_list:
             if app_type.lower() in app_description:
                 self._com_app_type = app_type
 
@@ -147,17 +267,23 @@ class TransitionKernel():
         """
         print('TransitionKernel launched !')
 
-        for app_type in TransitionAppType:
-            print('TransitionKernel enabled {} : {}'.format(app_type.value, ' '.join(
-                x for x in self._config.get_enabled_app_list(app_type) if x)))
+        for app_type in Configuration.app_type_list:
+            print('TransitionKernel enabled {} : {}'.format(app_type, ' '.join(
+                x for x in self.get_enabled_app_list(app_type) if x)))
 
         if self._com_app.EnableEvents is False:
             print("TransitionKernel : Enabling Events !")
             self._com_app.EnableEvents = True
 
+        # apps are verified in background, or before their launch when they aren't trusted
+        self._start_scheduler()
+
         self._app_manager = AppManager(self)
         self._app_manager.run()
 
+        # apps are launched, time to look at db
+        self.check_snapshot_async()
+
     def terminate(self):
         """
         Kernel shutdown
@@ -165,6 +291,10 @@ class TransitionKernel():
         """
         print("TransitionKernel is terminating...")
         self._app_manager.terminate()
+        if self._scheduler is not None:
+            self._scheduler.stop()
+        if self._snapshot is not None:
+            self._snapshot.close()
         print("TransitionKernel terminated")
 
     @staticmethod
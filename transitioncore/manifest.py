@@ -0,0 +1,353 @@
+# ------------------------------------------------------------------------------
+# Name:        manifest
+# Purpose:     App Manifest file : per-file digests and Merkle tree
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import os
+import pickle
+
+from transitioncore.digestengine import DigestEngine, new_hasher, DIGEST_ALGORITHMS, \
+    DIGEST_FORMAT_LEGACY, DIGEST_FORMAT_STREAM
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+# Manifest file versions :
+# 1 : pickled dict of zip archive digests
+# 2 : pickled dict of streamed digests, with FORMAT key
+# 3 : text file with per-file digests and Merkle root
+MANIFEST_VERSION_LEGACY = 1
+MANIFEST_VERSION_STREAM = 2
+MANIFEST_VERSION_MERKLE = 3
+
+MANIFEST_MAGIC = 'TRANSITION-MANIFEST'
+MANIFEST_FILE = 'Manifest'
+
+# algorithm of Merkle tree nodes
+MERKLE_ALGORITHM = 'SHA256'
+
+DIGEST_LENGTHS = {'SHA256': 64, 'SHA512': 128, 'WHIRLPOOL': 128}
+
+FILE_CHANGED = 'changed'
+FILE_MISSING = 'missing'
+FILE_ADDED = 'added'
+
+
+class Manifest():
+    """
+    App Manifest.
+
+    Version 3 Manifest file is an utf-8 text file :
+        TRANSITION-MANIFEST 3
+        FILE <size> <SHA256> <SHA512> <WHIRLPOOL> <relative path>
+        ...
+        ROOT <Merkle root>
+
+    Relative paths are '/' separated, FILE lines are sorted on path. Merkle tree follows app directories :
+        * file node hash is computed from file size and digests
+        * directory node hash is computed from sorted "<name>\\0<node hash>\\n" lines of its children.
+          Directory names end with '/'.
+    The root is checked when file is read. On verification, only mismatching nodes are walked down, which
+    gives the exact files that changed. App digests (stored in db) are DigestEngine stream digests of entries.
+
+    Versions 1 and 2 (pickled dict of app digests) are still read. They can only verify the whole app.
+    """
+
+    def __init__(self, entries=None, digests=None, version=MANIFEST_VERSION_MERKLE):
+        """
+        :param entries: dict {relative path: (size, digests dict)}. None for pickled Manifest.
+        :param digests: app digests of pickled Manifest. Computed from entries if None.
+        :param version: Manifest file version
+        """
+        self.version = version
+        self.entries = entries
+        self._digests = digests
+        self._tree = None
+
+    @property
+    def digest_format(self):
+        """
+        :return: format of app digests, DIGEST_FORMAT_LEGACY or DIGEST_FORMAT_STREAM
+        """
+        if self.version == MANIFEST_VERSION_LEGACY:
+            return DIGEST_FORMAT_LEGACY
+
+        return DIGEST_FORMAT_STREAM
+
+    @property
+    def digests(self):
+        """
+        :return: app digests dict {SHA256, SHA512, WHIRLPOOL} or None if Manifest has no entries
+        """
+        if self._digests is None and self.entries:
+            self._digests = DigestEngine.combine((rel_path, self.entries[rel_path][1])
+                                                 for rel_path in sorted(self.entries.keys()))
+
+        return self._digests
+
+    @property
+    def merkle_root(self):
+        """
+        :return: Merkle root hex digest, None for pickled Manifest
+        """
+        if self.entries is None:
+            return None
+
+        return self._get_tree()[0]
+
+    @staticmethod
+    def _file_node_hash(size, digests):
+        hasher = new_hasher(MERKLE_ALGORITHM)
+        hasher.update("{}\0{}\0{}\0{}".format(size, digests['SHA256'], digests['SHA512'],
+                                              digests['WHIRLPOOL']).encode('utf-8'))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _hash_dir_node(children):
+        """
+        :param children: dict {name: child dict (directory) or file node hash}
+        :return: node (hash, {name: node}). File nodes are (hash, None).
+        """
+        node_dict = dict()
+        hasher = new_hasher(MERKLE_ALGORITHM)
+        for name in sorted(children.keys()):
+            child = children[name]
+            if isinstance(child, dict):
+                node = Manifest._hash_dir_node(child)
+            else:
+                node = (child, None)
+            node_dict[name] = node
+            hasher.update("{}\0{}\n".format(name, node[0]).encode('utf-8'))
+
+        return hasher.hexdigest(), node_dict
+
+    def _get_tree(self):
+        if self._tree is None:
+            root = dict()
+            for rel_path, (size, digests) in self.entries.items():
+                name_list = rel_path.split('/')
+                children = root
+                for name in name_list[:-1]:
+                    children = children.setdefault(name + '/', dict())
+                children[name_list[-1]] = Manifest._file_node_hash(size, digests)
+            self._tree = Manifest._hash_dir_node(root)
+
+        return self._tree
+
+    def _get_node(self, subtree=None):
+        """
+        :param subtree: relative path of a directory or a file. Whole tree if None.
+        :return: (node, path prefix of node children) or (None, prefix) if subtree doesn't exist
+        """
+        node = self._get_tree()
+        if subtree is None or subtree.strip('/') == '':
+            return node, ''
+
+        name_list = subtree.strip('/').split('/')
+        for index, name in enumerate(name_list):
+            children = node[1]
+            if children is None:
+                return None, ''
+            if index == len(name_list) - 1 and name in children:
+                # file
+                return children[name], '/'.join(name_list)
+            node = children.get(name + '/')
+            if node is None:
+                break
+
+        return node, '/'.join(name_list) + '/'
+
+    @staticmethod
+    def _node_files(node, rel_path):
+        if node[1] is None:
+            return [rel_path]
+
+        file_list = list()
+        for name in sorted(node[1].keys()):
+            file_list.extend(Manifest._node_files(node[1][name], rel_path + name))
+
+        return file_list
+
+    @staticmethod
+    def _diff_nodes(expected, actual, rel_path, failure_list):
+        if expected is None and actual is None:
+            return
+        elif expected is None:
+            failure_list.extend((path, FILE_ADDED) for path in Manifest._node_files(actual, rel_path))
+        elif actual is None:
+            failure_list.extend((path, FILE_MISSING) for path in Manifest._node_files(expected, rel_path))
+        elif expected[0] != actual[0]:
+            if expected[1] is None or actual[1] is None:
+                failure_list.append((rel_path, FILE_CHANGED))
+            else:
+                # directory names end with '/', a name can't be a file on one side and a directory on the other
+                for name in sorted(set(expected[1].keys()).union(actual[1].keys())):
+                    Manifest._diff_nodes(expected[1].get(name), actual[1].get(name), rel_path + name, failure_list)
+
+    def diff(self, other, subtree=None):
+        """
+        Compare Manifests. Only mismatching subtrees are walked down.
+        :param other: actual Manifest (self is the expected one)
+        :param subtree: restrict comparison to this relative path
+        :return: sorted list of (relative path, FILE_CHANGED|FILE_MISSING|FILE_ADDED)
+        """
+        expected, rel_path = self._get_node(subtree)
+        actual, _ = other._get_node(subtree)
+
+        failure_list = list()
+        Manifest._diff_nodes(expected, actual, rel_path, failure_list)
+        return sorted(failure_list)
+
+    @staticmethod
+    def from_path(path, subtree=None, file_cache=None, parallel=None, workers=None):
+        """
+        Build Manifest of app files
+        :param path: application path
+        :param subtree: restrict Manifest to this relative path
+        :param file_cache: optional FileDigestCache
+        :param parallel: see DigestEngine.hash_files()
+        :param workers: number of top level subtrees hashed at the same time. Cpu count if None.
+        :return: Manifest
+        """
+        file_list = DigestEngine.app_file_digests(path, parallel, file_cache, subtree, workers)
+        return Manifest({rel_path: (size, digests) for rel_path, size, digests in file_list})
+
+    def verify(self, path, subtree=None, file_cache=None, workers=None):
+        """
+        Verify app files against this Manifest
+        :param path: application path
+        :param subtree: only verify files in this relative path
+        :param file_cache: optional FileDigestCache
+        :param workers: number of top level subtrees hashed at the same time. Cpu count if None.
+        :return: (actual Manifest, list of (relative path, status)). Empty list when app files match.
+        :raise: ConfigurationException if Manifest doesn't hold per-file entries and subtree is given
+        """
+        if self.entries is None:
+            if subtree is not None:
+                raise ConfigurationException("Manifest version {} in {} can't verify a subtree.".format(
+                    self.version, path))
+            digests = DigestEngine.generate(path, self.digest_format, file_cache=file_cache)
+            actual = Manifest(digests=digests, version=self.version)
+            failure_list = list()
+            if digests is None or any(digests[key] != self._digests[key] for key in DIGEST_ALGORITHMS):
+                # whole app is all we can tell
+                failure_list.append(('', FILE_CHANGED))
+            return actual, failure_list
+
+        actual = Manifest.from_path(path, subtree, file_cache, workers=workers)
+        return actual, self.diff(actual, subtree)
+
+    def write(self, path):
+        """
+        Write Manifest file in app path
+        :param path: application path
+        """
+        with open(path + '\\' + MANIFEST_FILE, 'w', encoding='utf-8', newline='\n') as f:
+            f.write("{} {}\n".format(MANIFEST_MAGIC, MANIFEST_VERSION_MERKLE))
+            for rel_path in sorted(self.entries.keys()):
+                size, digests = self.entries[rel_path]
+                f.write("FILE {} {} {} {} {}\n".format(size, digests['SHA256'], digests['SHA512'],
+                                                      digests['WHIRLPOOL'], rel_path))
+            f.write("ROOT {}\n".format(self.merkle_root))
+
+    @staticmethod
+    def _valid_digests(digests):
+        return isinstance(digests, dict) \
+            and all(isinstance(digests.get(key), str) and len(digests[key]) == length
+                    for key, length in DIGEST_LENGTHS.items())
+
+    @staticmethod
+    def _parse_pickle(data, path):
+        try:
+            digests = pickle.loads(data)
+        except Exception as e:
+            raise ConfigurationException("Invalid Manifest file in {} : {}.".format(path, repr(e)))
+
+        if Manifest._valid_digests(digests):
+            # Manifest written before streamed digests doesn't have FORMAT key
+            digest_format = digests.get('FORMAT', DIGEST_FORMAT_LEGACY)
+            if digest_format == DIGEST_FORMAT_LEGACY:
+                version = MANIFEST_VERSION_LEGACY
+            elif digest_format == DIGEST_FORMAT_STREAM:
+                version = MANIFEST_VERSION_STREAM
+            else:
+                version = None
+
+            if version is not None:
+                return Manifest(digests={key: digests[key] for key in DIGEST_ALGORITHMS}, version=version)
+
+        #if loaded object is not a valid dict containing SHA256, SHA512, WHIRLPOOL keys of
+        #64, 128 and 128 bytes, raise exception
+        raise ConfigurationException("Invalid Manifest file in {}.".format(path))
+
+    @staticmethod
+    def _parse_text(data, path):
+        try:
+            line_list = data.decode('utf-8').split('\n')
+        except UnicodeDecodeError as ude:
+            raise ConfigurationException("Invalid Manifest file in {} : {}.".format(path, repr(ude)))
+
+        if line_list[-1] == '':
+            line_list.pop()
+
+        if len(line_list) < 2 or line_list[0] != "{} {}".format(MANIFEST_MAGIC, MANIFEST_VERSION_MERKLE) \
+                or not line_list[-1].startswith('ROOT '):
+            raise ConfigurationException("Invalid Manifest file in {}.".format(path))
+
+        entries = dict()
+        for line in line_list[1:-1]:
+            field_list = line.split(' ', 5)
+            if len(field_list) != 6 or field_list[0] != 'FILE' or not field_list[1].isdigit():
+                raise ConfigurationException("Invalid Manifest line in {} : {}.".format(path, line))
+            digests = dict(zip(DIGEST_ALGORITHMS, field_list[2:5]))
+            if not Manifest._valid_digests(digests):
+                raise ConfigurationException("Invalid Manifest line in {} : {}.".format(path, line))
+            entries[field_list[5]] = (int(field_list[1]), digests)
+
+        manifest = Manifest(entries)
+        if len(entries) == 0 or manifest.merkle_root != line_list[-1][len('ROOT '):]:
+            raise ConfigurationException("Manifest file in {} is corrupted, Merkle root mismatch.".format(path))
+
+        return manifest
+
+    @staticmethod
+    def read(path):
+        """
+        Read Manifest file in path
+        :param path: application path
+        :return: Manifest
+        :raise: ConfigurationException on error
+        """
+        manifest_file = path + '\\' + MANIFEST_FILE
+        if not os.path.exists(manifest_file):
+            raise ConfigurationException("{} doesn't contain Manifest file.".format(path))
+
+        with open(manifest_file, 'rb') as f:
+            data = f.read()
+
+        if len(data) == 0:
+            raise ConfigurationException("Manifest file seems empty {}.".format(path))
+
+        if data.startswith(MANIFEST_MAGIC.encode('utf-8')):
+            return Manifest._parse_text(data, path)
+
+        return Manifest._parse_pickle(data, path)
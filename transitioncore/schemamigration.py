@@ -0,0 +1,188 @@
+# ------------------------------------------------------------------------------
+# Name:        schemamigration
+# Purpose:     Upgrade configuration db schema in place
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import sqlite3
+
+from transitioncore.exceptions.configurationexception import ConfigurationException
+from transitioncore.configsql import *
+
+
+def _migrate_v1(cnx):
+    """
+    Version 0 to 1 : db created before file digests cache and app_class column
+    """
+    cnx.execute(SQL_CREATE_FILE_DIGEST)
+    column_list = [row[1] for row in cnx.execute(SQL_PRAGMA_APP_COLUMNS)]
+    if 'app_class' not in column_list:
+        cnx.execute(SQL_ALTER_APP_ADD_APP_CLASS)
+
+
+def _migrate_v2(cnx):
+    """
+    Version 1 to 2 : ids, foreign keys, unique constraints and indexes
+    """
+    table_list = ('app_type', 'com_app', 'app', 'app_works_with_com_app')
+    for table in table_list:
+        cnx.execute(SQL_MIGRATE_V2_RENAME_TABLE.format(table))
+
+    for sql in (SQL_CREATE_APP_TYPE, SQL_CREATE_COM_APP, SQL_CREATE_APP, SQL_CREATE_APP_WORKS_WITH_COM_APP):
+        cnx.execute(sql)
+
+    for sql in (SQL_MIGRATE_V2_COPY_APP_TYPE, SQL_MIGRATE_V2_COPY_COM_APP, SQL_MIGRATE_V2_COPY_APP,
+                SQL_MIGRATE_V2_COPY_APP_WORKS_WITH_COM_APP):
+        cnx.execute(sql)
+
+    for table in reversed(table_list):
+        cnx.execute(SQL_MIGRATE_V2_DROP_TABLE.format(table))
+
+    for sql in SchemaMigration.create_indexes:
+        cnx.execute(sql)
+
+
+def _migrate_v3(cnx):
+    """
+    Version 2 to 3 : app directory fingerprint, used by incremental inventory
+    """
+    column_list = [row[1] for row in cnx.execute(SQL_PRAGMA_APP_COLUMNS)]
+    if 'dir_fingerprint' not in column_list:
+        cnx.execute(SQL_ALTER_APP_ADD_DIR_FINGERPRINT)
+
+
+def _migrate_v4(cnx):
+    """
+    Version 3 to 4 : time of last app verification, used by kernel verification scheduler
+    """
+    column_list = [row[1] for row in cnx.execute(SQL_PRAGMA_APP_COLUMNS)]
+    if 'verified_at' not in column_list:
+        cnx.execute(SQL_ALTER_APP_ADD_VERIFIED_AT)
+
+
+class SchemaMigration():
+    """
+    Configuration db schema versions.
+
+    Schema version is stored in db with PRAGMA user_version. upgrade() runs each missing migration step in its own
+    transaction, so that an interrupted upgrade restarts from last completed step :
+
+        SchemaMigration.upgrade(cnx)
+
+    A migration step is a function(cnx) added to migration_list with the version it upgrades to.
+    """
+
+    migration_list = ((1, _migrate_v1),
+                      (2, _migrate_v2),
+                      (3, _migrate_v3),
+                      (4, _migrate_v4))
+
+    create_indexes = (SQL_CREATE_INDEX_APP_PATH, SQL_CREATE_INDEX_APP_WORKS_WITH_COM_APP_STATUS)
+
+    @staticmethod
+    def get_schema_version():
+        """
+        :return: schema version created by this release
+        """
+        return SchemaMigration.migration_list[-1][0]
+
+    @staticmethod
+    def get_version(cnx):
+        """
+        :param cnx: sqlite3 connection
+        :return: schema version of db
+        """
+        return cnx.execute(SQL_GET_USER_VERSION).fetchone()[0]
+
+    @staticmethod
+    def set_version(cnx, version):
+        """
+        :param cnx: sqlite3 connection
+        :param version: schema version of db
+        """
+        cnx.execute(SQL_SET_USER_VERSION.format(version))
+
+    @staticmethod
+    def is_empty(cnx):
+        """
+        :param cnx: sqlite3 connection
+        :return: True if db has no schema yet
+        """
+        return SchemaMigration.get_version(cnx) == 0 and cnx.execute(SQL_SELECT_ANY_TABLE).fetchone() is None
+
+    @staticmethod
+    def upgrade(cnx):
+        """
+        Upgrade db schema to last version
+        :param cnx: sqlite3 connection
+        :return: list of applied versions
+        :raise: ConfigurationException if db is newer than this release or if a migration step fails
+        """
+        version = SchemaMigration.get_version(cnx)
+        if version == SchemaMigration.get_schema_version():
+            return list()
+
+        if version > SchemaMigration.get_schema_version():
+            print("SchemaMigration.upgrade() : ERROR : db schema version {} is newer than {}".format(
+                version, SchemaMigration.get_schema_version()))
+            raise ConfigurationException("Configuration db was created by a newer release")
+
+        applied_list = list()
+        cnx.commit()
+        isolation_level = cnx.isolation_level
+        # transactions are handled here. Foreign keys can't be switched inside a transaction.
+        cnx.isolation_level = None
+        foreign_keys = cnx.execute("PRAGMA foreign_keys").fetchone()[0]
+        cnx.execute("PRAGMA foreign_keys = OFF")
+        try:
+            for step_version, migrate in SchemaMigration.migration_list:
+                if step_version <= version:
+                    continue
+
+                # another process may upgrade db at the same time. Version is read again once write lock is held.
+                cnx.execute("BEGIN IMMEDIATE")
+                if SchemaMigration.get_version(cnx) >= step_version:
+                    cnx.execute("COMMIT")
+                    continue
+
+                print("SchemaMigration.upgrade() : upgrading db schema to version {}".format(step_version))
+                try:
+                    migrate(cnx)
+                    if cnx.execute(SQL_PRAGMA_FOREIGN_KEY_CHECK).fetchone() is not None:
+                        raise ConfigurationException(
+                            "Schema version {} breaks foreign keys".format(step_version))
+                    SchemaMigration.set_version(cnx, step_version)
+                    cnx.execute("COMMIT")
+                except (sqlite3.Error, ConfigurationException) as e:
+                    cnx.execute("ROLLBACK")
+                    print("SchemaMigration.upgrade() : ERROR : version {} : {}".format(step_version, repr(e)))
+                    if isinstance(e, ConfigurationException):
+                        raise
+                    raise ConfigurationException("Can't upgrade db schema to version {}".format(step_version))
+
+                applied_list.append(step_version)
+        finally:
+            cnx.execute("PRAGMA foreign_keys = {:d}".format(foreign_keys))
+            cnx.isolation_level = isolation_level
+
+        return applied_list
@@ -0,0 +1,314 @@
+# ------------------------------------------------------------------------------
+# Name:        startupsnapshot
+# Purpose:     Binary snapshot of enabled apps read at kernel startup
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+SNAPSHOT_MAGIC = b'TRSNAP\r\n'
+SNAPSHOT_VERSION = 2
+
+# magic, version, app_type count, com_app count, reserved, app count, crc32 of what follows header
+HEADER = struct.Struct('<8sHHHHII')
+# string reference : offset in string area, length
+# app_type : name, path
+APP_TYPE_RECORD = struct.Struct('<IHIH')
+# com_app : short name
+COM_APP_RECORD = struct.Struct('<IH')
+# app : app_type index, available mask, enabled mask, name, path, SHA256, SHA512, WHIRLPOOL, dir_fingerprint,
+# verified_at (NaN if never verified)
+APP_RECORD = struct.Struct('<BII' + 'IH' * 6 + 'd')
+
+DIGEST_NAME_LIST = ('SHA256', 'SHA512', 'WHIRLPOOL')
+
+# bits of app masks
+MAX_COM_APP = 32
+
+
+class StartupSnapshot():
+    """
+    Read-only startup snapshot of configuration, written by Configuration after each write.
+
+    Kernel boots from it at COM application startup : enabled app lists per com_app, app paths and digests are
+    read without db connection nor ConfigService round trip. App fingerprints and last verification times tell
+    kernel which apps it can launch before verifying them (see verificationscheduler.py).
+
+    Snapshot file layout (little-endian) :
+        * header : magic, version, table sizes, crc32 of the rest of the file
+        * app_type table, com_app table, app table : fixed size records, see struct definitions above. Bit i of
+          app masks stands for i-th com_app of com_app table.
+        * string area : utf-8 strings referenced by (offset, length) from records
+
+    Records have a fixed size, so lookups unpack them in place from the memory-mapped file. Nothing else is
+    parsed at open.
+    """
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, buffer, file=None):
+        """
+        :param buffer: snapshot bytes or mmap
+        :param file: opened snapshot file, closed by close()
+        :raise: ConfigurationException if buffer isn't a valid snapshot
+        """
+        self._buffer = buffer
+        self._file = file
+
+        if len(buffer) < HEADER.size:
+            raise ConfigurationException("StartupSnapshot : truncated snapshot")
+        magic, version, self._app_type_count, self._com_app_count, _, self._app_count, crc = \
+            HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ConfigurationException("StartupSnapshot : not a startup snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ConfigurationException("StartupSnapshot : unsupported version {}".format(version))
+        if zlib.crc32(buffer[HEADER.size:]) != crc:
+            raise ConfigurationException("StartupSnapshot : corrupted snapshot")
+
+        self._com_app_offset = HEADER.size + self._app_type_count * APP_TYPE_RECORD.size
+        self._app_offset = self._com_app_offset + self._com_app_count * COM_APP_RECORD.size
+        self._string_offset = self._app_offset + self._app_count * APP_RECORD.size
+
+    @staticmethod
+    def build(app_type_list, com_app_list, app_list):
+        """
+        Encode a snapshot
+        :param app_type_list: list of (app_type, path)
+        :param com_app_list: com_app names. Bit i of masks stands for i-th com_app.
+        :param app_list: list of (app_type, app_name, path, digests dict, available mask, enabled mask,
+        dir_fingerprint, verified_at). dir_fingerprint and verified_at are None if app was never verified.
+        :return: snapshot bytes
+        :raise: ConfigurationException if there are too many com_app for masks
+        """
+        if len(com_app_list) > MAX_COM_APP:
+            raise ConfigurationException("StartupSnapshot.build() : more than {} com_app".format(MAX_COM_APP))
+
+        strings = bytearray()
+        string_dict = dict()
+
+        def ref(value):
+            if value not in string_dict:
+                data = (value or '').encode('utf-8')
+                string_dict[value] = (len(strings), len(data))
+                strings.extend(data)
+            return string_dict[value]
+
+        app_type_index = dict()
+        records = bytearray()
+        for app_type, path in app_type_list:
+            app_type_index[app_type] = len(app_type_index)
+            records.extend(APP_TYPE_RECORD.pack(*(ref(app_type) + ref(path))))
+
+        for com_app in com_app_list:
+            records.extend(COM_APP_RECORD.pack(*ref(com_app)))
+
+        for app_type, app_name, path, digests, available, enabled, fingerprint, verified_at in app_list:
+            string_refs = ref(app_name) + ref(path)
+            for digest_name in DIGEST_NAME_LIST:
+                string_refs += ref(digests.get(digest_name))
+            string_refs += ref(fingerprint)
+            if verified_at is None:
+                verified_at = float('nan')
+            records.extend(APP_RECORD.pack(*((app_type_index[app_type], available, enabled) + string_refs +
+                                             (verified_at, ))))
+
+        body = bytes(records + strings)
+        return HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(app_type_list), len(com_app_list), 0,
+                           len(app_list), zlib.crc32(body)) + body
+
+    @staticmethod
+    def write(path, data):
+        """
+        Replace snapshot file. Readers see either the former or the new file.
+        :param path: snapshot file path
+        :param data: snapshot bytes, see build()
+        :raise: OSError if file can't be written (eg. mapped by a running kernel on Windows)
+        """
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with StartupSnapshot._write_lock:
+            try:
+                with open(tmp_path, 'wb') as snapshot_file:
+                    snapshot_file.write(data)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    @staticmethod
+    def open(path):
+        """
+        Map a snapshot file
+        :param path: snapshot file path
+        :return: StartupSnapshot, None if file is missing or invalid
+        """
+        try:
+            snapshot_file = open(path, 'rb')
+        except OSError:
+            return None
+
+        try:
+            buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            # empty file can't be mapped
+            print("StartupSnapshot.open() : can't map {} : {}".format(path, repr(e)))
+            snapshot_file.close()
+            return None
+
+        try:
+            return StartupSnapshot(buffer, snapshot_file)
+        except ConfigurationException as ce:
+            print("StartupSnapshot.open() : {} is ignored : {}".format(path, ce.args[0] if ce.args else ''))
+            buffer.close()
+            snapshot_file.close()
+            return None
+
+    def close(self):
+        """
+        Unmap snapshot file
+        """
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+        self._buffer = b''
+
+    @property
+    def data(self):
+        """
+        :return: snapshot bytes
+        """
+        return bytes(self._buffer)
+
+    def _string(self, offset, length):
+        start = self._string_offset + offset
+        return bytes(self._buffer[start:start + length]).decode('utf-8')
+
+    def _app_type_index(self, app_type):
+        """
+        :return: app_type index, -1 if unknown
+        """
+        for i in range(self._app_type_count):
+            record = APP_TYPE_RECORD.unpack_from(self._buffer, HEADER.size + i * APP_TYPE_RECORD.size)
+            if self._string(*record[0:2]) == app_type:
+                return i
+
+        return -1
+
+    def _com_app_bit(self, com_app):
+        """
+        :return: com_app bit, 0 if unknown
+        """
+        for i in range(self._com_app_count):
+            record = COM_APP_RECORD.unpack_from(self._buffer, self._com_app_offset + i * COM_APP_RECORD.size)
+            if self._string(*record) == com_app:
+                return 1 << i
+
+        return 0
+
+    def _app_records(self, app_type):
+        """
+        :return: generator of app records of app_type
+        """
+        index = self._app_type_index(app_type)
+        for i in range(self._app_count):
+            record = APP_RECORD.unpack_from(self._buffer, self._app_offset + i * APP_RECORD.size)
+            if record[0] == index:
+                yield record
+
+    def _find_app(self, app_type, app_name):
+        """
+        :return: app record, None if app doesn't exist
+        """
+        for record in self._app_records(app_type):
+            if self._string(*record[3:5]) == app_name:
+                return record
+
+        return None
+
+    def get_com_app_list(self):
+        """
+        :return: com_app names
+        """
+        return [self._string(*COM_APP_RECORD.unpack_from(self._buffer, self._com_app_offset + i * COM_APP_RECORD.size))
+                for i in range(self._com_app_count)]
+
+    def get_app_type_path(self, app_type):
+        """
+        :return: app_type path, None if app_type doesn't exist
+        """
+        index = self._app_type_index(app_type)
+        if index < 0:
+            return None
+
+        record = APP_TYPE_RECORD.unpack_from(self._buffer, HEADER.size + index * APP_TYPE_RECORD.size)
+        return self._string(*record[2:4])
+
+    def get_enabled_app_list(self, app_type, com_app):
+        """
+        :return: names of app_type apps enabled for com_app
+        """
+        bit = self._com_app_bit(com_app)
+        return [self._string(*record[3:5]) for record in self._app_records(app_type) if record[1] & record[2] & bit]
+
+    def get_app_path(self, app_type, app_name):
+        """
+        :return: app path, None if app doesn't exist
+        """
+        record = self._find_app(app_type, app_name)
+        if record is None:
+            return None
+
+        return self._string(*record[5:7])
+
+    def get_app_digests(self, app_type, app_name):
+        """
+        :return: app digests dict {SHA256, SHA512, WHIRLPOOL}, None if app doesn't exist
+        """
+        record = self._find_app(app_type, app_name)
+        if record is None:
+            return None
+
+        return {digest_name: self._string(*record[7 + 2 * i:9 + 2 * i]) or None
+                for i, digest_name in enumerate(DIGEST_NAME_LIST)}
+
+    def get_app_verification(self, app_type, app_name):
+        """
+        :return: (app path, dir_fingerprint, verified_at) stored when app was last verified. dir_fingerprint and
+        verified_at are None if app was never verified. None if app doesn't exist.
+        """
+        record = self._find_app(app_type, app_name)
+        if record is None:
+            return None
+
+        verified_at = record[15]
+        if math.isnan(verified_at):
+            verified_at = None
+        return self._string(*record[5:7]), self._string(*record[13:15]) or None, verified_at
@@ -0,0 +1,187 @@
+# ------------------------------------------------------------------------------
+# Name:        storagebackend
+# Purpose:     Configuration storage backends
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import itertools
+import os
+import sqlite3
+
+from transitioncore.configsql import SQL_GET_USER_VERSION, SQL_SET_USER_VERSION
+from transitioncore.connectionmanager import ConnectionManager, CACHED_STATEMENTS, TIMEOUT
+from transitioncore.exceptions.configurationexception import ConfigurationException
+
+# shared cache connections lock tables instead of db file. Readers don't wait for table locks.
+MEMORY_PRAGMA_LIST = ("PRAGMA foreign_keys = ON",
+                      "PRAGMA temp_store = MEMORY",
+                      "PRAGMA read_uncommitted = ON")
+
+SNAPSHOT_PRAGMA_LIST = MEMORY_PRAGMA_LIST + ("PRAGMA query_only = ON", )
+
+
+class IStorageBackend:
+    """
+    Configuration storage. Gives one db connection per thread and runs write transactions.
+    """
+
+    read_only = False
+
+    def close(self):
+        pass
+
+    def close_all(self):
+        pass
+
+    def connect(self):
+        pass
+
+    def exists(self):
+        pass
+
+    def get(self):
+        pass
+
+    def get_connection_count(self):
+        pass
+
+    def peek(self):
+        pass
+
+    def remove(self):
+        pass
+
+    def run_write(self, write):
+        pass
+
+    def set_on_open(self, on_open):
+        pass
+
+    def set_stats(self, stats):
+        pass
+
+
+class SQLiteBackend(ConnectionManager, IStorageBackend):
+    """
+    SQLite db file, shared with other processes. Configuration default backend.
+    """
+    pass
+
+
+class MemoryBackend(ConnectionManager, IStorageBackend):
+    """
+    SQLite in-memory db, shared by threads of this process and dropped by remove() or when backend is collected.
+    No file is written : made for tests and short-lived kernels.
+    """
+
+    _db_counter = itertools.count()
+
+    def __init__(self, on_open=None, pragma_list=MEMORY_PRAGMA_LIST, cached_statements=CACHED_STATEMENTS,
+                 timeout=TIMEOUT, **kwargs):
+        super(MemoryBackend, self).__init__(None, on_open, pragma_list, cached_statements, timeout, **kwargs)
+        # keeps db alive while connections come and go
+        self._keeper = None
+        self._new_db()
+
+    def _new_db(self):
+        self.db_path = "file:transition-{}-{}?mode=memory&cache=shared".format(os.getpid(),
+                                                                                next(MemoryBackend._db_counter))
+
+    def _open(self):
+        return sqlite3.connect(self.db_path, timeout=self._timeout, cached_statements=self._cached_statements,
+                               check_same_thread=False, uri=True, factory=self._factory)
+
+    def _fill(self, keeper):
+        """
+        Called when db is created, before any other connection is opened
+        :param keeper: connection to new db
+        """
+        pass
+
+    def exists(self):
+        return self._keeper is not None
+
+    def connect(self):
+        with self._lock:
+            if self._keeper is None:
+                keeper = self._open()
+                self._fill(keeper)
+                self._keeper = keeper
+
+        return self._open()
+
+    def remove(self):
+        self.close_all()
+        with self._lock:
+            if self._keeper is not None:
+                self._keeper.close()
+                self._keeper = None
+            self._new_db()
+
+
+class SnapshotBackend(MemoryBackend):
+    """
+    Read-only in-memory copy of a db, taken on first connection. Later changes of source are not seen.
+    Writes raise ConfigurationException. Source must have been opened by this release (no schema upgrade).
+    """
+
+    read_only = True
+
+    def __init__(self, source, on_open=None, pragma_list=SNAPSHOT_PRAGMA_LIST, **kwargs):
+        """
+        :param source: db file path or IStorageBackend to copy
+        :param on_open: see ConnectionManager
+        :param pragma_list: see ConnectionManager
+        """
+        self._source = source
+        super(SnapshotBackend, self).__init__(on_open, pragma_list, **kwargs)
+
+    def _fill(self, keeper):
+        if isinstance(self._source, str):
+            if not os.path.exists(self._source):
+                mesg = "SnapshotBackend : ERROR : {} doesn't exist".format(self._source)
+                print(mesg)
+                raise ConfigurationException(mesg)
+            source_cnx = sqlite3.connect(self._source)
+        else:
+            source_cnx = self._source.connect()
+
+        # Connection.backup() needs Python 3.7. Copied with a dump, read in one transaction.
+        try:
+            source_cnx.isolation_level = None
+            source_cnx.execute("BEGIN")
+            version = source_cnx.execute(SQL_GET_USER_VERSION).fetchone()[0]
+            keeper.executescript("\n".join(source_cnx.iterdump()))
+            keeper.execute(SQL_SET_USER_VERSION.format(version))
+            source_cnx.execute("ROLLBACK")
+        finally:
+            source_cnx.close()
+
+    def exists(self):
+        # nothing to create, even before snapshot is taken
+        return True
+
+    def run_write(self, write):
+        mesg = "SnapshotBackend : ERROR : configuration snapshot is read-only"
+        print(mesg)
+        raise ConfigurationException(mesg)
@@ -0,0 +1,259 @@
+# ------------------------------------------------------------------------------
+# Name:        verificationscheduler
+# Purpose:     Deferred app verification with provisional trust, run by kernel
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+
+import threading
+import time
+
+from transitioncore.digestengine import DigestEngine
+
+# seconds an app verification is trusted for, as long as app directory fingerprint didn't change
+TRUST_DELAY = 7 * 24 * 3600.0
+# seconds after start background verification begins : COM application startup comes first
+START_DELAY = 10.0
+# seconds between two background verifications
+VERIFY_INTERVAL = 1.0
+
+
+class VerificationScheduler():
+    """
+    Verify apps without putting hashing on COM application startup. Run by kernel.
+
+        * an app verified less than trust_delay seconds ago, whose directory fingerprint (see
+          DigestEngine.fingerprint()) didn't change since, is provisionally trusted : it is launched at once.
+          Checking it costs a stat() walk of app directory, whatever app size.
+        * other apps are verified before launch. wait() only waits for the app about to be launched, which is
+          verified before any background verification.
+        * all apps are verified by a low priority background thread, one every interval seconds, once start_delay
+          is over.
+
+    verify callable does the actual verification, eg. Configuration.verify_app() through ConfigService : corrupted
+    apps are disabled there. A provisionally trusted app which fails verification is reported to corrupted callable.
+
+        scheduler = VerificationScheduler(verify)
+        scheduler.add_app(app_type, app_name, path, fingerprint, verified_at)
+        scheduler.start()
+        if scheduler.wait(app_type, app_name):
+            # launch app
+        ...
+        scheduler.stop()
+    """
+
+    def __init__(self, verify, corrupted=None, trust_delay=TRUST_DELAY, start_delay=START_DELAY,
+                 interval=VERIFY_INTERVAL):
+        """
+        :param verify: callable(app_type, app_name) returning True if app can be launched
+        :param corrupted: optional callable(app_type, app_name) called when a provisionally trusted app fails
+        verification
+        :param trust_delay: seconds an app verification is trusted for
+        :param start_delay: seconds after start() background verification begins
+        :param interval: seconds between two background verifications
+        """
+        self._verify = verify
+        self._corrupted = corrupted
+        self._trust_delay = trust_delay
+        self._start_delay = start_delay
+        self._interval = interval
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._next_time = 0.0
+        # (app_type, app_name) : (path, dir_fingerprint, verified_at)
+        self._app_dict = dict()
+        # apps waiting for background verification, in add order
+        self._queue = list()
+        # apps waited for by wait()
+        self._priority_list = list()
+        # (app_type, app_name) : True if app can be launched
+        self._result_dict = dict()
+        self._trusted_set = set()
+        self.verify_count = 0
+
+    def add_app(self, app_type, app_name, path=None, fingerprint=None, verified_at=None):
+        """
+        Schedule background verification of an app
+        :param app_type: app type
+        :param app_name: app name
+        :param path: app path
+        :param fingerprint: app directory fingerprint stored when app was last verified
+        :param verified_at: time of last verification (see time.time()), None if app was never verified
+        """
+        key = (app_type, app_name)
+        with self._condition:
+            if key not in self._app_dict:
+                self._app_dict[key] = (path, fingerprint, verified_at)
+                self._queue.append(key)
+                self._condition.notify_all()
+
+    def is_trusted(self, app_type, app_name):
+        """
+        :return: True if app is provisionally trusted : verified less than trust_delay seconds ago and its directory
+        fingerprint didn't change since
+        """
+        path, fingerprint, verified_at = self._app_dict.get((app_type, app_name), (None, None, None))
+        if path is None or fingerprint is None or verified_at is None:
+            return False
+
+        if not 0 <= time.time() - verified_at <= self._trust_delay:
+            return False
+
+        return DigestEngine.fingerprint(path) == fingerprint
+
+    def get_result(self, app_type, app_name):
+        """
+        :return: True/False if app was verified and can/can't be launched, None if it wasn't verified yet
+        """
+        with self._condition:
+            return self._result_dict.get((app_type, app_name))
+
+    def wait(self, app_type, app_name, timeout=None):
+        """
+        Gate app launch. Returns at once for a provisionally trusted app, otherwise app is verified first. Apps not
+        added before are verified too.
+        :param app_type: app type
+        :param app_name: app name
+        :param timeout: seconds to wait for verification, no limit if None
+        :return: True if app can be launched, False if it failed verification or wasn't verified in time
+        """
+        key = (app_type, app_name)
+        with self._condition:
+            result = self._result_dict.get(key)
+        if result is not None:
+            return result
+
+        if self.is_trusted(app_type, app_name):
+            with self._condition:
+                self._trusted_set.add(key)
+            return True
+
+        with self._condition:
+            running = self._thread is not None
+            if running and key not in self._result_dict and key not in self._priority_list:
+                self._priority_list.append(key)
+                self._condition.notify_all()
+        if not running:
+            # not started : verified by caller
+            self._verify_app(key, True)
+
+        with self._condition:
+            self._condition.wait_for(lambda: key in self._result_dict or self._stop, timeout)
+            return self._result_dict.get(key, False)
+
+    def start(self):
+        """
+        Launch background verification thread
+        """
+        with self._condition:
+            self._stop = False
+            self._next_time = time.monotonic() + self._start_delay
+            self._thread = threading.Thread(target=self._run, name="VerificationScheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop background verification thread. Pending verifications are dropped, waiting callers return False.
+        """
+        with self._condition:
+            thread = self._thread
+            self._stop = True
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._thread = None
+
+    def _verify_app(self, key, requested):
+        """
+        Verify an app and store result. Called without lock held.
+        :param key: (app_type, app_name)
+        :param requested: True if a caller waits for it. An app which can't be verified is blocked then, otherwise it
+        is verified again on next kernel startup.
+        """
+        try:
+            result = bool(self._verify(*key))
+        except Exception as e:
+            print("VerificationScheduler : ERROR : can't verify {}.{} : {}".format(key[0], key[1], repr(e)))
+            result = None
+            if requested:
+                result = False
+
+        with self._condition:
+            self.verify_count += 1
+            if result is not None:
+                self._result_dict[key] = result
+            if key in self._queue:
+                self._queue.remove(key)
+            self._condition.notify_all()
+            corrupted = result is False and key in self._trusted_set
+
+        if corrupted:
+            print("VerificationScheduler : {}.{} was launched on trust and failed verification".format(*key))
+            if self._corrupted is not None:
+                self._corrupted(*key)
+
+    def _get_next(self, now):
+        """
+        Called with lock held
+        :return: (app to verify or None, True if a caller waits for it, seconds to wait for next app or None)
+        """
+        while len(self._priority_list) > 0:
+            key = self._priority_list.pop(0)
+            if key not in self._result_dict:
+                return key, True, None
+
+        if len(self._queue) == 0:
+            return None, False, None
+        if now < self._next_time:
+            return None, False, self._next_time - now
+
+        return self._queue.pop(0), False, None
+
+    @staticmethod
+    def _lower_priority():
+        """
+        Lower background thread priority, where it is possible
+        """
+        try:
+            import win32api
+            import win32process
+            win32process.SetThreadPriority(win32api.GetCurrentThread(), win32process.THREAD_PRIORITY_LOWEST)
+        except ImportError:
+            pass
+
+    def _run(self):
+        self._lower_priority()
+        while True:
+            with self._condition:
+                key, requested, timeout = self._get_next(time.monotonic())
+                while key is None and not self._stop:
+                    self._condition.wait(timeout)
+                    key, requested, timeout = self._get_next(time.monotonic())
+                if self._stop:
+                    return
+
+            self._verify_app(key, requested)
+            if not requested:
+                with self._condition:
+                    self._next_time = time.monotonic() + self._interval
@@ -0,0 +1,143 @@
+# ------------------------------------------------------------------------------
+# Name:        verificationsession
+# Purpose:     Memoize app digests during one inventory pass
+#
+# Author:      Jonathan Besanceney <jonathan.besanceney@gmail.com>
+#
+# Created:     18/10/26
+# Copyright:   (c) 2014 Jonathan Besanceney
+#
+# This file is a part of Transition
+#
+#    Transition is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    Transition is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with Transition.  If not, see <http://www.gnu.org/licenses/>.
+# ------------------------------------------------------------------------------
+# -*- coding: utf8 -*-
+
+import time
+
+from transitioncore.digestengine import DigestEngine
+
+
+class VerificationSession():
+    """
+    Holds app digests computed during one inventory pass, so each app is hashed at most once.
+
+    Shared by Configuration.update_inventory(), get_app_state(), _app_add() and _app_update() :
+        with VerificationSession(file_cache) as session:
+            state = config.get_app_state(app_type, app_name, session)
+            ...
+
+    Digests are the streamed ones (DIGEST_FORMAT_STREAM). Time spent hashing each app is kept for
+    reporting. Digests are forgotten when the session ends : files may change between two passes.
+
+    A session can also hold Manifest verification status and app metadata (see appmetadata.py) computed
+    beforehand, e.g. by a parallel inventory scan (see appscanner.py).
+    """
+
+    def __init__(self, file_cache=None):
+        """
+        :param file_cache: optional FileDigestCache used when app digests are generated
+        """
+        self._file_cache = file_cache
+        self._digests = dict()
+        self._timings = dict()
+        self._manifest_status = dict()
+        self._metadata = dict()
+        self.hit_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Forget memoized digests
+        """
+        self._digests = dict()
+        self._manifest_status = dict()
+        self._metadata = dict()
+
+    def get_digests(self, path):
+        """
+        Get app digests, generating them on first call for path
+        :param path: application path
+        :return: dict {SHA256, SHA512, WHIRLPOOL} or None if path contains no files
+        :raise: Exception raised by DigestEngine.generate()
+        """
+        if path in self._digests:
+            self.hit_count += 1
+            return self._digests[path]
+
+        start = time.perf_counter()
+        digests = DigestEngine.generate(path, file_cache=self._file_cache)
+        self.set_digests(path, digests, time.perf_counter() - start)
+        return digests
+
+    def set_digests(self, path, digests, elapsed):
+        """
+        Remember app digests generated outside of session (e.g. on Manifest verification)
+        :param path: application path
+        :param digests: streamed app digests
+        :param elapsed: time spent generating digests, in seconds
+        """
+        self._digests[path] = digests
+        self._timings[path] = self._timings.get(path, 0.0) + elapsed
+
+    def get_manifest_status(self, path):
+        """
+        :param path: application path
+        :return: True/False if Manifest of app was verified during session, None instead
+        """
+        return self._manifest_status.get(path)
+
+    def set_manifest_status(self, path, status):
+        """
+        :param path: application path
+        :param status: True if app matches its Manifest
+        """
+        self._manifest_status[path] = status
+
+    def get_metadata(self, path):
+        """
+        :param path: application path
+        :return: AppMetadata dict or None if unknown
+        """
+        return self._metadata.get(path)
+
+    def set_metadata(self, path, metadata):
+        """
+        :param path: application path
+        :param metadata: AppMetadata dict (see AppMetadata.extract())
+        """
+        self._metadata[path] = metadata
+
+    def get_timings(self):
+        """
+        :return: list of (app path, seconds spent hashing), slowest first
+        """
+        return sorted(self._timings.items(), key=lambda item: item[1], reverse=True)
+
+    def print_timings(self):
+        """
+        Print time spent hashing each app on std out
+        """
+        total = 0.0
+        for path, elapsed in self.get_timings():
+            total += elapsed
+            print("VerificationSession : {:8.3f}s {}".format(elapsed, path))
+
+        print("VerificationSession : {:8.3f}s to hash {} app(s), {} digests reused".format(
+            total, len(self._timings), self.hit_count))